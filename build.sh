@@ -5,5 +5,5 @@ set -o errexit
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
-python reassemble.py
+python manage.py model_artifacts restore
 python manage.py migrate
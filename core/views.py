@@ -1,4 +1,20 @@
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from ml_engine import config as ml_config
+from ml_engine import instrumentation
+
 def home(request):
     return render(request, 'core/home.html')
+
+def metrics(request):
+    """Prometheus scrape endpoint for the per-view and per-stage histograms."""
+    if not instrumentation.ENABLED:
+        raise Http404
+    token = ml_config.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(
+        instrumentation.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
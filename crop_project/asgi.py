@@ -2,6 +2,8 @@
 ASGI config for crop_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; the live-capture WebSocket is served by
+``crops.live.live_capture``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,29 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crop_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from crops.live import LIVE_CAPTURE_PATH, live_capture  # noqa: E402
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        return await django_application(scope, receive, send)
+    if scope['type'] == 'websocket':
+        if scope['path'] == LIVE_CAPTURE_PATH:
+            return await live_capture(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
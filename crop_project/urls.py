@@ -3,11 +3,12 @@ URL configuration for crop_project project.
 """
 from django.contrib import admin
 from django.urls import path, include
-from core.views import home
+from core.views import home, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', home, name='home'),
+    path('metrics', metrics, name='metrics'),
     path('crops/', include('crops.urls')),
     path('users/', include('users.urls')),
     path('accounts/', include('users.urls')), # Map accounts/ to users/ for default redirects if needed, or just rely on settings
@@ -27,7 +27,7 @@ class YieldLogAdmin(admin.ModelAdmin):
 
 @admin.register(DiseaseLog)
 class DiseaseLogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'predicted_disease', 'confidence', 'created_at')
-    list_filter = ('predicted_disease', 'created_at')
+    list_display = ('user', 'predicted_disease', 'confidence', 'model_version', 'created_at')
+    list_filter = ('predicted_disease', 'model_version', 'created_at')
     search_fields = ('user__username', 'predicted_disease')
     readonly_fields = ('created_at',)
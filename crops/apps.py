@@ -1,6 +1,17 @@
+import os
+
 from django.apps import AppConfig
 
 
 class CropsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crops'
+
+    def ready(self):
+        # Under `runserver`, start loading the disease model in the serving
+        # process (RUN_MAIN is only set in the autoreloader's child). Gunicorn
+        # workers do the same from gunicorn.conf.py's post_fork hook.
+        from ml_engine import config
+        if os.environ.get('RUN_MAIN') == 'true' and not config.DISEASE_INFERENCE_SOCKET:
+            from ml_engine.disease_prediction import predictor
+            predictor.start()
@@ -0,0 +1,93 @@
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ml_engine.preprocessing import decode_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def iter_uploaded_images(files, archive=None):
+    """
+    Yield (name, bytes) for every uploaded image, one at a time.
+
+    Zip members are read lazily from the upload (Django spools large uploads
+    to a temporary file), so the archive is never held in memory as a whole.
+    """
+    for f in files:
+        yield f.name, f.read()
+
+    if archive is not None:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if os.path.basename(info.filename).startswith('.'):
+                    continue  # macOS resource forks and other hidden files
+                yield info.filename, zf.read(info)
+
+
+def _decode(name, data, target_size):
+    try:
+        return name, decode_image(data, target_size), None
+    except Exception as e:
+        return name, None, str(e)
+
+
+def screen_images(images, predictor, crop_name=None, batch_size=32, workers=4, stats=None):
+    """
+    Decode `images` on a thread pool and run them through the predictor in
+    batches, yielding a list of (name, bytes, result) per batch as soon as
+    it finishes. An image that fails to decode is yielded on its own, with
+    an "error" result.
+
+    At most `batch_size * 2` images are in flight at any time, so memory
+    stays flat regardless of how many images are submitted. `stats` (a
+    dict) receives the processed/error counts.
+    """
+    stats = {} if stats is None else stats
+    stats.update(processed=0, errors=0)
+    window = batch_size * 2
+    target_size = tuple(predictor.input_size)
+    pending = deque()
+    batch = []      # [(name, bytes, array)]
+
+    def flush():
+        results = predictor.predict_batch(np.concatenate([array for _, _, array in batch]), crop_name)
+        stats['processed'] += len(batch)
+        done = [(name, data, result) for (name, data, _), result in zip(batch, results)]
+        batch.clear()
+        return done
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-decode") as pool:
+        source = iter(images)
+        exhausted = False
+        while pending or not exhausted:
+            # Keep the decode window full
+            while not exhausted and len(pending) < window:
+                try:
+                    name, data = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((data, pool.submit(_decode, name, data, target_size)))
+
+            if not pending:
+                break
+
+            data, future = pending.popleft()
+            name, array, error = future.result()
+            if error is not None:
+                stats['errors'] += 1
+                yield [(name, data, {"error": f"Invalid image: {error}"})]
+                continue
+
+            batch.append((name, data, array))
+            if len(batch) >= batch_size:
+                yield flush()
+
+        if batch:
+            yield flush()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+
+from ml_engine import config as ml_config
+
+
+class InferenceBusy(Exception):
+    """Raised when the inference executor already has its maximum backlog."""
+
+    def __init__(self, message="The server is busy. Please try again in a few seconds."):
+        super().__init__(message)
+
+
+class InferenceExecutor:
+    """
+    Dedicated thread pool for the CPU-bound predictor calls of async views.
+
+    `workers` bounds how many predictions run at once; `max_pending` bounds
+    how many may be running or waiting, beyond which `run` raises
+    InferenceBusy so views can answer 503 instead of queueing without limit.
+    The event loop itself never runs model code, so the worker keeps
+    serving pages while inference is in progress.
+    """
+
+    def __init__(self, workers=2, max_pending=16):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise InferenceBusy()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @property
+    def pending(self):
+        return self._pending
+
+
+inference_executor = InferenceExecutor(
+    workers=ml_config.INFERENCE_EXECUTOR_WORKERS,
+    max_pending=ml_config.INFERENCE_EXECUTOR_MAX_PENDING,
+)
+
+
+def async_login_required(view):
+    """
+    `login_required` for async views. Django 4.2's decorator only wraps sync
+    views, and the lazy `request.user` must be resolved off the event loop.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+# Templates read the session (messages) and user, so render off the loop
+arender = sync_to_async(render)
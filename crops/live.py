@@ -0,0 +1,191 @@
+import asyncio
+import json
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http.cookie import parse_cookie
+
+from ml_engine import config as ml_config
+from ml_engine.preprocessing import decode_image
+
+from .executor import InferenceBusy, inference_executor
+
+LIVE_CAPTURE_PATH = '/ws/live-capture/'
+
+# Close codes sent before accepting the connection
+CLOSE_FORBIDDEN = 4403
+CLOSE_UNAUTHENTICATED = 4401
+
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _same_origin(headers):
+    """Browsers always send Origin on WebSocket handshakes; reject cross-site ones."""
+    origin = headers.get('origin')
+    return bool(origin) and urlparse(origin).netloc == headers.get('host')
+
+
+@sync_to_async
+def _session_user(headers):
+    """The user of the Django session named in the handshake cookies."""
+    cookies = parse_cookie(headers.get('cookie', ''))
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(session_key=cookies.get(settings.SESSION_COOKIE_NAME))
+    return get_user(SimpleNamespace(session=session))
+
+
+class LiveCaptureSession:
+    """
+    One open camera stream.
+
+    Frames (binary messages holding a small JPEG) only ever replace a single
+    "latest frame" slot; the inference loop always takes the newest one, so
+    frames that arrive while a prediction is running are dropped instead of
+    queuing up. Nothing is logged until the client sends {"type": "confirm"},
+    which stores the last analysed frame and its result as a DiseaseLog.
+    """
+
+    def __init__(self, send, user, predictor):
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.user = user
+        self.predictor = predictor
+        self.crop_name = None
+
+        self.received = 0
+        self.dropped = 0
+        self._latest = None            # (seq, frame bytes)
+        self._frame_ready = asyncio.Event()
+        self._last_analysed = None     # (frame bytes, crop name, result, embedding)
+
+    async def send_json(self, payload):
+        async with self._send_lock:
+            await self._send({'type': 'websocket.send', 'text': json.dumps(payload, default=float)})
+
+    def offer(self, frame):
+        self.received += 1
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = (self.received, frame)
+        self._frame_ready.set()
+
+    async def receive_loop(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if message.get('bytes') is not None:
+                frame = message['bytes']
+                if len(frame) > ml_config.LIVE_CAPTURE_MAX_FRAME_BYTES:
+                    await self.send_json({'type': 'error', 'message': 'Frame too large.'})
+                    continue
+                self.offer(frame)
+            elif message.get('text'):
+                await self.handle_control(message['text'])
+
+    async def handle_control(self, text):
+        try:
+            command = json.loads(text)
+        except ValueError:
+            await self.send_json({'type': 'error', 'message': 'Invalid message.'})
+            return
+
+        if command.get('type') == 'config':
+            self.crop_name = (command.get('crop_name') or '').strip() or None
+        elif command.get('type') == 'confirm':
+            await self.confirm()
+
+    def _predict(self, frame, crop_name):
+        try:
+            img_array = decode_image(frame, self.predictor.input_size)
+        except Exception as e:
+            return {'error': f'Invalid frame: {e}'}
+        # Straight to the array path: live frames never repeat, so they
+        # would only push useful entries out of the prediction cache
+        return self.predictor.predict_from_array(img_array, crop_name)
+
+    async def inference_loop(self):
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            seq, frame = self._latest
+            self._latest = None
+
+            if not self.predictor.is_ready():
+                self.predictor.start()
+                await self.send_json({'type': 'status', 'status': 'warming_up',
+                                      'message': 'The disease model is warming up.'})
+                continue
+
+            crop_name = self.crop_name
+            try:
+                result = await inference_executor.run(self._predict, frame, crop_name)
+            except InferenceBusy as e:
+                await self.send_json({'type': 'status', 'status': 'busy', 'message': str(e)})
+                continue
+            except Exception as e:
+                # Keep the stream alive; the next frame may well succeed
+                print(f"Live capture inference failed: {e}")
+                await self.send_json({'type': 'error', 'message': 'Could not analyse this frame.'})
+                continue
+            embedding = result.pop('embedding', None)
+            if 'error' not in result:
+                self._last_analysed = (frame, crop_name, result, embedding)
+            await self.send_json({'type': 'result', 'seq': seq, 'dropped': self.dropped, 'result': result})
+
+    async def confirm(self):
+        if self._last_analysed is None:
+            await self.send_json({'type': 'error', 'message': 'No frame has been analysed yet.'})
+            return
+
+        from .models import DiseaseLog
+        from .similarity import similar_cases_for_new_log
+        from .uploads import persist_upload
+
+        frame, crop_name, result, embedding = self._last_analysed
+        filename = persist_upload(frame)
+        log = await DiseaseLog.objects.acreate(
+            user=self.user,
+            crop_name=crop_name,
+            image_name=filename,
+            symptoms="Live Capture",
+            predicted_disease=result.get('disease', 'Unknown'),
+            confidence=result.get('confidence', 0.0),
+            model_version=result.get('model_version')
+        )
+        result = dict(result, crop_name=crop_name)
+        if embedding:
+            result['similar_cases'] = await similar_cases_for_new_log(log, embedding, self.user)
+        await self.send_json({'type': 'confirmed', 'result': result})
+
+
+async def live_capture(scope, receive, send):
+    """ASGI WebSocket endpoint for continuous scanning from the camera."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    headers = _headers(scope)
+    if not _same_origin(headers):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    user = await _session_user(headers)
+    if not user.is_authenticated:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHENTICATED})
+        return
+
+    from .views import disease_predictor
+
+    await send({'type': 'websocket.accept'})
+    session = LiveCaptureSession(send, user, disease_predictor)
+    worker = asyncio.create_task(session.inference_loop())
+    try:
+        await session.receive_loop(receive)
+    finally:
+        worker.cancel()
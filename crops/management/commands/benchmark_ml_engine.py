@@ -0,0 +1,92 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import benchmark, config
+
+
+def _parse_thresholds(values):
+    thresholds = {}
+    for value in values:
+        metric, _, limit = value.partition('=')
+        if metric not in benchmark.DEFAULT_THRESHOLDS or not limit:
+            raise CommandError(
+                f"Bad --threshold {value!r}; expected metric=fraction with metric one of "
+                f"{', '.join(benchmark.DEFAULT_THRESHOLDS)}"
+            )
+        thresholds[metric] = float(limit)
+    return thresholds
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the ml_engine entry points and optionally compares against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', action='append', default=[], help='Run only cases whose name contains this')
+        parser.add_argument('--crop', default='Tomato')
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail if results regress against this JSON file')
+        parser.add_argument(
+            '--threshold', action='append', default=[], metavar='METRIC=FRACTION',
+            help='Override an allowed regression, e.g. p95_ms=0.1 (repeatable)',
+        )
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the prediction cache on (repeated images would then only measure cache hits)',
+        )
+
+    def handle(self, *args, **options):
+        thresholds = _parse_thresholds(options['threshold'])
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        # Imported here so that TensorFlow is only loaded when benchmarking
+        from ml_engine.disease_prediction import EnsembleDiseasePredictor
+        from ml_engine.recommendation import CropRecommender
+        from ml_engine.yield_prediction import YieldPredictor
+
+        config.DISEASE_CACHE = options['with_cache']
+        disease_predictor = EnsembleDiseasePredictor()
+        disease_predictor.warm_up()
+
+        cases = benchmark.build_cases(disease_predictor, CropRecommender(), YieldPredictor(), options['crop'])
+
+        self.stdout.write(f"{'case':<28} {'p50':>9} {'p95':>9} {'p99':>9} {'items/s':>10} {'rss MB':>8} {'+rss MB':>8}")
+
+        def progress(name, r):
+            self.stdout.write(
+                f"{name:<28} {r['p50_ms']:8.2f}ms {r['p95_ms']:8.2f}ms {r['p99_ms']:8.2f}ms "
+                f"{r['throughput_per_s']:10.1f} {r['peak_rss_mb']:8.1f} {r['rss_delta_mb']:8.1f}"
+            )
+
+        results = benchmark.run_suite(
+            cases, options['iterations'], options['warmup'], options['only'], progress
+        )
+        results['meta']['backend'] = config.DISEASE_MODEL_BACKEND
+        results['meta']['cache'] = options['with_cache']
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is None:
+            return
+
+        rows = benchmark.compare(results, baseline, thresholds)
+        regressions = [row for row in rows if row[5]]
+        self.stdout.write(f"\nCompared with {options['compare']} (positive change = worse):")
+        for case, metric, base, now, change, regressed in rows:
+            line = f"  {case:<28} {metric:<17} {base:>12.4g} -> {now:>12.4g} ({change:+.1%})"
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed past their threshold")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,60 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine.backends import KerasBackend, parse_buckets
+
+
+def _time_calls(fn, batch, iterations):
+    fn(batch)  # exclude the first call (tracing / adapter setup)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return np.array(samples)
+
+
+class Command(BaseCommand):
+    help = 'Compares Keras Model.predict against the traced fixed-signature call on the disease model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            default=os.path.join(settings.BASE_DIR, 'ml_engine', 'models', 'plant_disease_model.h5'),
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--batch-sizes', default='1,8')
+        parser.add_argument('--buckets', default='', help='Optional batch buckets, e.g. 1,8,16,32')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['model']):
+            raise CommandError(f"Model not found: {options['model']}")
+
+        backend = KerasBackend(
+            options['model'], compiled=True, batch_buckets=parse_buckets(options['buckets'])
+        )
+        backend.warm_up()
+
+        rng = np.random.default_rng(0)
+        for batch_size in parse_buckets(options['batch_sizes']):
+            batch = rng.random((batch_size, *backend.input_shape), dtype=np.float32)
+
+            # Both paths must agree before their speed matters
+            diff = float(np.max(np.abs(backend.predict_keras(batch) - backend.predict(batch))))
+
+            self.stdout.write(f"\nBatch size {batch_size} (max abs output diff {diff:.2e}):")
+            results = {}
+            for label, fn in (("Model.predict", backend.predict_keras), ("compiled call", backend.predict)):
+                samples = _time_calls(fn, batch, options['iterations'])
+                results[label] = samples
+                self.stdout.write(
+                    f"  {label:<14} mean {samples.mean():8.2f}ms  p50 {np.percentile(samples, 50):8.2f}ms  "
+                    f"p95 {np.percentile(samples, 95):8.2f}ms"
+                )
+
+            speedup = np.median(results["Model.predict"]) / np.median(results["compiled call"])
+            self.stdout.write(self.style.SUCCESS(f"  speedup (p50): {speedup:.2f}x"))
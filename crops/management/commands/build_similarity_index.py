@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.models import DiseaseLog
+from crops.similarity import similarity_index
+from crops.storage import media_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Trains the IVF "similar cases" index over the stored disease-image embeddings. '
+        'With --backfill, first embeds logged images that are not indexed yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, help='Number of IVF lists (default: sqrt of rows)')
+        parser.add_argument('--sample', type=int, default=100_000, help='Rows used to fit the centroids')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--backfill', action='store_true', help='Embed logged images missing from the index')
+        parser.add_argument('--batch-size', type=int, default=32)
+
+    def handle(self, *args, **options):
+        if similarity_index is None:
+            raise CommandError("DISEASE_EMBEDDINGS is off")
+
+        if options['backfill']:
+            self._backfill(options['batch_size'])
+
+        if not similarity_index.store.count:
+            self.stdout.write("No embeddings stored yet; nothing to train.")
+            return
+
+        start = time.perf_counter()
+        n_lists = similarity_index.train(
+            n_lists=options['lists'], sample=options['sample'], iterations=options['iterations']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {n_lists} lists over {similarity_index.store.count} embeddings "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
+
+    def _backfill(self, batch_size):
+        from ml_engine.disease_prediction import predictor
+
+        store = similarity_index.store
+        store.refresh()
+        indexed = set(np.asarray(store.ids[:store.count]).tolist()) if store.count else set()
+        pending = (
+            DiseaseLog.objects.exclude(image_name__isnull=True).exclude(image_name='')
+            .values_list('pk', 'image_name').order_by('pk')
+        )
+
+        added = skipped = 0
+        batch_ids, batch_arrays = [], []
+
+        def flush():
+            nonlocal added
+            if not batch_arrays:
+                return
+            embeddings = predictor.embed_batch(np.concatenate(batch_arrays))
+            if embeddings is None:
+                raise CommandError("The disease model backend does not provide embeddings")
+            for log_id, embedding in zip(batch_ids, embeddings):
+                similarity_index.add(log_id, embedding)
+                added += 1
+            batch_ids.clear()
+            batch_arrays.clear()
+
+        for log_id, image_name in pending.iterator():
+            if log_id in indexed:
+                continue
+            if not media_storage.exists(image_name):
+                skipped += 1
+                continue
+            try:
+                batch_arrays.append(media_storage.load_preprocessed(image_name, predictor.input_size))
+            except Exception as e:
+                self.stdout.write(f"  skipping log {log_id}: {e}")
+                skipped += 1
+                continue
+            batch_ids.append(log_id)
+            if len(batch_arrays) >= batch_size:
+                flush()
+        flush()
+        self.stdout.write(f"Backfilled {added} embeddings ({skipped} logs without a usable image)")
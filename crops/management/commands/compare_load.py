@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine.benchmark import sample_jpeg
+
+LOGIN_PATH = '/users/login/'
+DISEASE_PATH = '/crops/disease/'
+PAGE_PATH = '/crops/recommend/'
+
+
+def _login(requests, base_url, username, password):
+    session = requests.Session()
+    session.get(base_url + LOGIN_PATH, timeout=30)
+    response = session.post(
+        base_url + LOGIN_PATH,
+        data={
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+        },
+        headers={'Referer': base_url + LOGIN_PATH},
+        timeout=30,
+    )
+    if 'sessionid' not in session.cookies:
+        raise CommandError(f"Login to {base_url} failed (HTTP {response.status_code})")
+    return session.cookies
+
+
+def _percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires a mix of disease-image uploads and form-page loads at one or more running '
+        'servers and compares throughput and latency. Typical use: start '
+        '"gunicorn crop_project.wsgi -w 2 -b :8001" and '
+        '"gunicorn crop_project.asgi -k uvicorn.workers.UvicornWorker -w 2 -b :8002", then '
+        'run with --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--inference-share', type=float, default=0.5,
+            help='Fraction of requests that are image uploads; the rest load a form page',
+        )
+        parser.add_argument('--crop', default='Tomato')
+
+    def handle(self, *args, **options):
+        try:
+            import requests
+        except ImportError:
+            raise CommandError("compare_load needs the 'requests' package")
+
+        targets = []
+        for value in options['target']:
+            name, _, url = value.partition('=')
+            if not url:
+                raise CommandError(f"Bad --target {value!r}; expected NAME=URL")
+            targets.append((name, url.rstrip('/')))
+
+        # Distinct images so the prediction cache can't answer for the model
+        n_uploads = int(options['requests'] * options['inference_share'])
+        self.stdout.write(f"Generating {n_uploads} test images...")
+        images = [sample_jpeg(seed=i) for i in range(n_uploads)]
+        plan = ['upload' if i < n_uploads else 'page' for i in range(options['requests'])]
+        # Interleave uploads and page loads
+        plan = [plan[i] for i in np.random.default_rng(0).permutation(len(plan))]
+
+        summaries = []
+        for name, base_url in targets:
+            cookies = _login(requests, base_url, options['username'], options['password'])
+            summary = self._run(requests, base_url, cookies, plan, images, options)
+            summaries.append((name, summary))
+            self._report(name, summary)
+
+        if len(summaries) > 1:
+            base_name, base = summaries[0]
+            self.stdout.write(f"\nRelative to {base_name}:")
+            for name, summary in summaries[1:]:
+                self.stdout.write(
+                    f"  {name}: throughput x{summary['throughput'] / max(base['throughput'], 1e-9):.2f}, "
+                    f"page p95 x{summary['page']['p95'] / max(base['page']['p95'], 1e-9):.2f}, "
+                    f"upload p95 x{summary['upload']['p95'] / max(base['upload']['p95'], 1e-9):.2f}"
+                )
+
+    def _run(self, requests, base_url, cookies, plan, images, options):
+        latencies = {'upload': [], 'page': []}
+        errors = {'upload': 0, 'page': 0}
+        upload_index = iter(range(len(images)))
+
+        def one(kind, image_index):
+            with requests.Session() as session:
+                session.cookies.update(cookies)
+                start = time.perf_counter()
+                try:
+                    if kind == 'upload':
+                        response = session.post(
+                            base_url + DISEASE_PATH,
+                            data={'crop_name': options['crop'], 'csrfmiddlewaretoken': cookies.get('csrftoken', '')},
+                            files={'image': (f'load_{image_index}.jpg', images[image_index], 'image/jpeg')},
+                            headers={'X-Requested-With': 'XMLHttpRequest', 'Referer': base_url + DISEASE_PATH},
+                            timeout=120,
+                        )
+                    else:
+                        response = session.get(base_url + PAGE_PATH, timeout=120)
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                return kind, (time.perf_counter() - start) * 1000.0, ok
+
+        jobs = [(kind, next(upload_index) if kind == 'upload' else None) for kind in plan]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for kind, ms, ok in pool.map(lambda job: one(*job), jobs):
+                if ok:
+                    latencies[kind].append(ms)
+                else:
+                    errors[kind] += 1
+        wall = time.perf_counter() - start
+
+        completed = sum(len(v) for v in latencies.values())
+        return {
+            'wall_s': wall,
+            'throughput': completed / wall if wall else 0.0,
+            **{
+                kind: {
+                    'ok': len(samples),
+                    'errors': errors[kind],
+                    'p50': _percentile(samples, 50),
+                    'p95': _percentile(samples, 95),
+                }
+                for kind, samples in latencies.items()
+            },
+        }
+
+    def _report(self, name, summary):
+        self.stdout.write(
+            f"\n{name}: {summary['throughput']:.1f} req/s over {summary['wall_s']:.1f}s"
+        )
+        for kind in ('page', 'upload'):
+            s = summary[kind]
+            self.stdout.write(
+                f"  {kind:<7} ok {s['ok']:>5}  errors {s['errors']:>4}  "
+                f"p50 {s['p50']:8.1f}ms  p95 {s['p95']:8.1f}ms"
+            )
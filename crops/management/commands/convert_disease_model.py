@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.storage import UPLOAD_DIR
+from ml_engine.backends import (
+    KerasBackend, TFLiteBackend, TFLITE_FP16, TFLITE_INT8,
+    artifact_path, report_path, load_calibration_set, top1_agreement,
+)
+
+
+class Command(BaseCommand):
+    help = 'Converts the Keras disease model to float16 and int8 TFLite and reports top-1 agreement'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            default=os.path.join(settings.BASE_DIR, 'ml_engine', 'models', 'plant_disease_model.h5'),
+            help='Path to the Keras .h5 model',
+        )
+        parser.add_argument(
+            '--calibration-dir',
+            default=os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR),
+            help='Directory tree of leaf images (default: the stored uploads), split into int8 '
+                 'calibration and agreement-check subsets',
+        )
+        parser.add_argument('--max-images', type=int, default=200)
+        parser.add_argument(
+            '--eval-fraction', type=float, default=0.3,
+            help='Share of the images held out of calibration to measure agreement on',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--formats', nargs='+', default=[TFLITE_FP16, TFLITE_INT8],
+            choices=[TFLITE_FP16, TFLITE_INT8],
+        )
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        model_path = options['model']
+        if not os.path.exists(model_path):
+            raise CommandError(f"Model not found: {model_path}")
+        if not 0.0 < options['eval_fraction'] < 1.0:
+            raise CommandError("--eval-fraction must be between 0 and 1")
+
+        baseline = KerasBackend(model_path)
+        target_size = baseline.input_shape[:2]
+        images = load_calibration_set(
+            options['calibration_dir'], target_size=target_size, limit=options['max_images']
+        )
+        # Agreement measured on the calibration images themselves would
+        # flatter int8, so the two subsets are disjoint
+        order = np.random.default_rng(options['seed']).permutation(len(images))
+        n_eval = 0
+        if len(images) > 1:
+            n_eval = min(len(images) - 1, max(1, int(len(images) * options['eval_fraction'])))
+        evaluation, calibration = images[order[:n_eval]], images[order[n_eval:]]
+        self.stdout.write(
+            f"Loaded {len(images)} images from {options['calibration_dir']}: "
+            f"{len(calibration)} for calibration, {len(evaluation)} for the agreement check"
+        )
+        if options['formats'] != [TFLITE_FP16] and len(calibration) == 0:
+            raise CommandError("int8 quantization needs at least one calibration image")
+
+        def representative_dataset():
+            for img in calibration:
+                yield [img[None, ...]]
+
+        for fmt in options['formats']:
+            converter = tf.lite.TFLiteConverter.from_keras_model(baseline.model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if fmt == TFLITE_FP16:
+                converter.target_spec.supported_types = [tf.float16]
+            else:
+                converter.representative_dataset = representative_dataset
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+                converter.inference_input_type = tf.int8
+                converter.inference_output_type = tf.int8
+
+            out_path = artifact_path(model_path, fmt)
+            with open(out_path, 'wb') as f:
+                f.write(converter.convert())
+
+            agreement = None
+            if len(evaluation):
+                agreement = top1_agreement(baseline, TFLiteBackend(out_path, fmt), evaluation)
+            report = {
+                "backend": fmt,
+                "source": os.path.basename(model_path),
+                "calibration_images": int(len(calibration)) if fmt == TFLITE_INT8 else 0,
+                "evaluation_images": int(len(evaluation)),
+                "top1_agreement": agreement,
+                "size_bytes": os.path.getsize(out_path),
+                "keras_size_bytes": os.path.getsize(model_path),
+            }
+            with open(report_path(out_path), 'w') as f:
+                json.dump(report, f, indent=2)
+
+            checked = (
+                f"top-1 agreement {agreement:.2%} on {len(evaluation)} held-out images"
+                if agreement is not None else "agreement not measured (needs at least two images)"
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{fmt}: {out_path} ({report['size_bytes'] / 1024 / 1024:.2f}MB), {checked}"
+            ))
@@ -0,0 +1,188 @@
+import json
+import os
+import statistics
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine.backends import KerasBackend, report_path
+
+MODELS_DIR = os.path.join(settings.BASE_DIR, 'ml_engine', 'models')
+
+
+class Command(BaseCommand):
+    help = (
+        'Distills the PlantVillage disease model into a smaller student network (optionally '
+        'magnitude-pruned) and exports it as .h5, by default as the cascade first-stage model. '
+        'Reports student vs teacher top-1 agreement, parameters, file size and per-image latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir', required=True,
+            help='Training images: one sub-directory per class (as in classes.json) and/or unlabelled images',
+        )
+        parser.add_argument('--teacher', default=os.path.join(MODELS_DIR, 'plant_disease_model.h5'))
+        parser.add_argument('--classes', default=os.path.join(settings.BASE_DIR, 'ml_engine', 'classes.json'))
+        parser.add_argument('--output', default=os.path.join(MODELS_DIR, 'plant_disease_model_small.h5'))
+        parser.add_argument('--input-size', type=int, nargs=2, default=[128, 128], metavar=('H', 'W'))
+        parser.add_argument('--width', type=float, default=1.0, help='Channel width multiplier of the student')
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--learning-rate', type=float, default=1e-3)
+        parser.add_argument('--temperature', type=float, default=4.0)
+        parser.add_argument('--alpha', type=float, default=0.3, help='Weight of the true-label loss')
+        parser.add_argument('--val-fraction', type=float, default=0.1)
+        parser.add_argument(
+            '--prune-sparsity', type=float, default=0.0,
+            help='Fraction of conv/dense weights to zero by magnitude after distillation (0 = no pruning)',
+        )
+        parser.add_argument('--prune-epochs', type=int, default=2, help='Fine-tuning epochs after pruning')
+        parser.add_argument('--cache', default='', help='File prefix for the tf.data cache (default: in memory)')
+        parser.add_argument('--latency-runs', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['teacher']):
+            raise CommandError(f"Teacher model not found: {options['teacher']}")
+        if not 0.0 <= options['prune_sparsity'] < 1.0:
+            raise CommandError("--prune-sparsity must be in [0, 1)")
+        try:
+            with open(options['classes'], 'r') as f:
+                mapping = json.load(f).get('plant_village', {})
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['classes']}: {e}")
+
+        import tensorflow as tf
+        from ml_engine import distillation
+
+        tf.random.set_seed(options['seed'])
+        teacher = tf.keras.models.load_model(options['teacher'])
+        teacher_size = tuple(teacher.input_shape[1:3])
+        student_size = tuple(options['input_size'])
+        n_classes = int(teacher.output_shape[-1])
+
+        paths, labels = distillation.list_images(options['data_dir'], mapping, seed=options['seed'])
+        if len(paths) < 2:
+            raise CommandError(f"Need at least two images in {options['data_dir']}")
+        n_val = max(1, int(len(paths) * options['val_fraction']))
+        self.stdout.write(
+            f"{len(paths)} images ({sum(l >= 0 for l in labels)} labelled); "
+            f"{len(paths) - n_val} for training, {n_val} held out"
+        )
+
+        def dataset(part_paths, part_labels, cache, shuffle):
+            return distillation.make_dataset(
+                part_paths, part_labels, teacher, teacher_size, student_size, options['batch_size'],
+                cache=cache, shuffle=shuffle, seed=options['seed'],
+            )
+
+        cache = options['cache']
+        train = dataset(paths[n_val:], labels[n_val:], cache and cache + '.train', True)
+        val = dataset(paths[:n_val], labels[:n_val], cache and cache + '.val', False)
+
+        student = distillation.build_student(student_size, n_classes, width=options['width'])
+        distiller = distillation.Distiller(
+            student, learning_rate=options['learning_rate'],
+            temperature=options['temperature'], alpha=options['alpha'],
+        )
+        self.stdout.write(
+            f"Distilling {os.path.basename(options['teacher'])} ({teacher.count_params():,} params, "
+            f"{'x'.join(map(str, teacher_size))}) into a {student.count_params():,}-param student "
+            f"at {'x'.join(map(str, student_size))}"
+        )
+        start = time.perf_counter()
+        distiller.fit(train, options['epochs'], log=self.stdout.write)
+
+        sparsity = 0.0
+        if options['prune_sparsity'] > 0:
+            sparsity = distiller.prune(options['prune_sparsity'])
+            self.stdout.write(f"Pruned to {sparsity:.1%} sparsity; fine-tuning")
+            distiller.fit(train, options['prune_epochs'], log=self.stdout.write)
+            sparsity = distiller.sparsity()
+        train_s = time.perf_counter() - start
+
+        quality = distillation.evaluate(student, val)
+
+        # Save next to the target and rename, so a running worker never loads a partial file
+        output = options['output']
+        tmp = output + '.tmp.h5'
+        student.save(tmp)
+        os.replace(tmp, output)
+
+        report = {
+            "teacher": os.path.basename(options['teacher']),
+            "student": os.path.basename(output),
+            "train_seconds": round(train_s, 1),
+            "teacher_input_size": list(teacher_size),
+            "student_input_size": list(student_size),
+            "held_out_images": quality["images"],
+            "top1_agreement": quality["top1_agreement"],
+            "labelled_held_out_images": quality["labelled_images"],
+            "student_accuracy": quality["accuracy"],
+            "teacher_accuracy": quality["teacher_accuracy"],
+            "teacher_params": int(teacher.count_params()),
+            "student_params": int(student.count_params()),
+            "student_sparsity": sparsity,
+            "teacher_size_bytes": os.path.getsize(options['teacher']),
+            "student_size_bytes": os.path.getsize(output),
+            "student_gzip_size_bytes": self._gzip_size(output),
+            "teacher_latency_ms": self._latency(options['teacher'], options['latency_runs']),
+            "student_latency_ms": self._latency(output, options['latency_runs']),
+        }
+        with open(report_path(output), 'w') as f:
+            json.dump(report, f, indent=2)
+        self._print_report(report, output)
+
+    @staticmethod
+    def _latency(model_path, runs):
+        """Median single-image latency (ms) through the serving backend."""
+        backend = KerasBackend(model_path)
+        backend.warm_up()
+        image = np.random.default_rng(0).random((1, *backend.input_shape), dtype=np.float32)
+        samples = []
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            backend.predict(image)
+            samples.append((time.perf_counter() - start) * 1000.0)
+        return round(statistics.median(samples), 3)
+
+    @staticmethod
+    def _gzip_size(path):
+        """Compressed size; pruned (zeroed) weights only shrink the file once compressed."""
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # gzip container
+        compressed = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                compressed += len(compressor.compress(chunk))
+        return compressed + len(compressor.flush())
+
+    def _print_report(self, report, output):
+        def pct(value):
+            return '-' if value is None else f"{value:.2%}"
+
+        mb = 1024 * 1024
+        self.stdout.write(self.style.SUCCESS(f"\nSaved student to {output} (report: {report_path(output)})"))
+        self.stdout.write(f"{'':<22}{'teacher':>12}{'student':>12}")
+        self.stdout.write(f"{'parameters':<22}{report['teacher_params']:>12,}{report['student_params']:>12,}")
+        self.stdout.write(
+            f"{'file size (MB)':<22}{report['teacher_size_bytes'] / mb:>12.1f}{report['student_size_bytes'] / mb:>12.1f}"
+        )
+        self.stdout.write(
+            f"{'latency (ms/image)':<22}{report['teacher_latency_ms']:>12.2f}{report['student_latency_ms']:>12.2f}"
+        )
+        self.stdout.write(
+            f"{'held-out accuracy':<22}{pct(report['teacher_accuracy']):>12}{pct(report['student_accuracy']):>12}"
+        )
+        self.stdout.write(
+            f"Top-1 agreement with the teacher: {pct(report['top1_agreement'])} "
+            f"on {report['held_out_images']} held-out images"
+        )
+        if report['student_sparsity']:
+            self.stdout.write(
+                f"Sparsity {report['student_sparsity']:.1%}; gzipped student "
+                f"{report['student_gzip_size_bytes'] / mb:.1f}MB"
+            )
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import config
+from ml_engine.backends import class_directories, load_backend, load_calibration_set
+from ml_engine.preprocessing import resize_batch
+
+MODELS_DIR = os.path.join(settings.BASE_DIR, 'ml_engine', 'models')
+
+
+class Command(BaseCommand):
+    help = (
+        'Offline accuracy/throughput tradeoff of the two-stage cascade for a range of confidence '
+        'thresholds. --data-dir holds one sub-directory of images per class (named like the '
+        'classes.json entry, e.g. Tomato___Early_blight); a flat directory of images is scored '
+        'against the full model instead of labels.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', required=True)
+        parser.add_argument('--primary', default=os.path.join(MODELS_DIR, 'plant_disease_model.h5'))
+        parser.add_argument('--first-stage', default=os.path.join(MODELS_DIR, 'plant_disease_model_small.h5'))
+        parser.add_argument('--classes', default=os.path.join(settings.BASE_DIR, 'ml_engine', 'classes.json'))
+        parser.add_argument(
+            '--thresholds', type=float, nargs='+',
+            default=[0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99],
+        )
+        parser.add_argument('--max-per-class', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--backend', default=config.DISEASE_MODEL_BACKEND)
+
+    def handle(self, *args, **options):
+        for key in ('primary', 'first_stage'):
+            if not os.path.exists(options[key]):
+                raise CommandError(f"Model not found: {options[key]}")
+
+        full = load_backend(options['primary'], options['backend'])
+        first_stage = load_backend(options['first_stage'], options['backend'])
+        images, labels = self._load_images(options, full.input_shape[:2])
+        if not len(images):
+            raise CommandError(f"No images found in {options['data_dir']}")
+        self.stdout.write(
+            f"{len(images)} images, {'labelled' if labels is not None else 'unlabelled (scored against the full model)'}"
+        )
+
+        batch_size = options['batch_size']
+        full_probs, full_s = self._run(full.predict, images, batch_size)
+        small_size = tuple(first_stage.input_shape[:2])
+        first_probs, first_s = self._run(
+            lambda batch: first_stage.predict(resize_batch(batch, small_size)), images, batch_size
+        )
+        if first_probs.shape[1] != full_probs.shape[1]:
+            raise CommandError(
+                f"First-stage model predicts {first_probs.shape[1]} classes, the primary model {full_probs.shape[1]}"
+            )
+
+        n = len(images)
+        full_pred = full_probs.argmax(axis=1)
+        first_pred = first_probs.argmax(axis=1)
+        first_conf = first_probs.max(axis=1)
+        truth = labels if labels is not None else full_pred
+        full_ms, first_ms = full_s * 1000.0 / n, first_s * 1000.0 / n
+
+        self.stdout.write(
+            f"Full model: {full_ms:.2f} ms/image, first stage ({'x'.join(map(str, small_size))}): "
+            f"{first_ms:.2f} ms/image"
+        )
+        metric = 'accuracy' if labels is not None else 'agreement'
+        self.stdout.write(
+            f"\n{'threshold':>9}  {'escalated':>9}  {metric:>9}  {'accepted ' + metric[:3]:>12}  "
+            f"{'ms/image':>8}  {'images/s':>8}  {'speedup':>7}"
+        )
+        self._row('full', 1.0, float(np.mean(full_pred == truth)), None, full_ms, full_ms)
+        for threshold in sorted(options['thresholds']):
+            accepted = first_conf >= threshold
+            final = np.where(accepted, first_pred, full_pred)
+            escalation = 1.0 - float(accepted.mean())
+            accepted_score = float(np.mean(first_pred[accepted] == truth[accepted])) if accepted.any() else None
+            # Every image pays the first stage; escalated ones also pay the full model
+            self._row(
+                f"{threshold:.2f}", escalation, float(np.mean(final == truth)), accepted_score,
+                first_ms + escalation * full_ms, full_ms,
+            )
+
+    def _row(self, label, escalation, score, accepted_score, ms, full_ms):
+        accepted = f"{accepted_score:.2%}" if accepted_score is not None else '-'
+        self.stdout.write(
+            f"{label:>9}  {escalation:>9.1%}  {score:>9.2%}  {accepted:>12}  "
+            f"{ms:>8.2f}  {1000.0 / ms:>8.1f}  {full_ms / ms:>6.2f}x"
+        )
+
+    @staticmethod
+    def _run(predict, images, batch_size):
+        """Softmax rows for all images and the total inference time (s)."""
+        predict(images[:1])  # trace/allocate outside the timing
+        outputs = []
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            outputs.append(np.asarray(predict(images[i:i + batch_size]), dtype=np.float32))
+        return np.concatenate(outputs), time.perf_counter() - start
+
+    def _load_images(self, options, target_size):
+        """(images, class indices or None) from a per-class or flat directory."""
+        data_dir = options['data_dir']
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+        try:
+            with open(options['classes'], 'r') as f:
+                mapping = json.load(f).get('plant_village', {})
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['classes']}: {e}")
+        directories, unknown = class_directories(data_dir, mapping)
+        for name in unknown:
+            self.stdout.write(f"  skipping {name}: not a class in {os.path.basename(options['classes'])}")
+        if not directories and not unknown:
+            images = load_calibration_set(data_dir, target_size=target_size, limit=options['max_per_class'])
+            return images, None
+
+        batches, labels = [], []
+        for path, idx in directories:
+            images = load_calibration_set(path, target_size=target_size, limit=options['max_per_class'])
+            batches.append(images)
+            labels.extend([idx] * len(images))
+        if not batches:
+            return np.zeros((0, *target_size, 3), dtype=np.float32), None
+        return np.concatenate(batches), np.asarray(labels)
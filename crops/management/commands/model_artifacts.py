@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import config
+from ml_engine.artifact_store import CHUNK_SIZE, ArtifactStore
+
+MODELS_DIR = os.path.join(settings.BASE_DIR, 'ml_engine', 'models')
+
+
+def large_model_files(directory=MODELS_DIR, threshold=CHUNK_SIZE):
+    """Model files too big to commit whole."""
+    found = []
+    for dirpath, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if os.path.getsize(path) > threshold:
+                found.append(path)
+    return sorted(found)
+
+
+class Command(BaseCommand):
+    help = (
+        'Packs large model files into the chunked artifact store, restores them from it '
+        '(skipping files that already match) and verifies chunk checksums.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', default=config.MODEL_ARTIFACT_STORE)
+        parser.add_argument('--workers', type=int, default=config.MODEL_ARTIFACT_WORKERS)
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        pack = actions.add_parser('pack', help='Chunk files into the store')
+        pack.add_argument(
+            'paths', nargs='*',
+            help=f'Files to pack (default: files under ml_engine/models over {CHUNK_SIZE // (1024 * 1024)}MB)',
+        )
+
+        restore = actions.add_parser('restore', help='Rebuild missing or changed files')
+        restore.add_argument('--force', action='store_true', help='Rebuild even files that match')
+
+        actions.add_parser('verify', help='Check every chunk against its checksum')
+
+    def handle(self, *args, **options):
+        store = ArtifactStore(options['store'], str(settings.BASE_DIR), workers=options['workers'])
+        getattr(self, f"_{options['action']}")(store, options)
+
+    def _pack(self, store, options):
+        paths = options['paths'] or large_model_files()
+        if not paths:
+            self.stdout.write("No large model files to pack.")
+            return
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f"Not found: {', '.join(missing)}")
+
+        for relpath, outcome in store.pack(paths).items():
+            self.stdout.write(f"  {outcome:<9} {relpath}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Manifest written to {store.manifest_path}. Commit the store and keep the "
+            f"original files out of git."
+        ))
+
+    def _restore(self, store, options):
+        start = time.perf_counter()
+        results = store.restore(force=options['force'])
+        if not results:
+            self.stdout.write("Artifact manifest is empty; nothing to restore.")
+            return
+
+        errors = 0
+        for relpath, outcome in results.items():
+            if outcome.startswith('error'):
+                errors += 1
+                self.stdout.write(self.style.ERROR(f"  {relpath}: {outcome}"))
+            else:
+                self.stdout.write(f"  {outcome:<9} {relpath}")
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f"{errors} artifact(s) failed verification")
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} artifact(s) verified in {elapsed:.1f}s"))
+
+    def _verify(self, store, options):
+        problems = store.verify()
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(f"  {problem}"))
+        if problems:
+            raise CommandError(f"{len(problems)} chunk(s) failed verification")
+        self.stdout.write(self.style.SUCCESS("All chunks match the manifest."))
@@ -0,0 +1,111 @@
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import config
+from ml_engine.knowledge_base import normalize
+from ml_engine.registry import CLASSES, FIRST_STAGE, PRIMARY, RECENT_DISEASES, ModelRegistry, RegistryError
+from ml_engine.specialists import CLASS_MAP_SUFFIX
+
+MODELS_DIR = os.path.join(settings.BASE_DIR, 'ml_engine', 'models')
+
+
+class Command(BaseCommand):
+    help = (
+        'Manages the versioned disease-model registry: list, register, verify and activate '
+        'versions. Running workers switch to a newly activated version without a restart.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registry', default=config.MODEL_REGISTRY_DIR)
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        actions.add_parser('list', help='Show all versions, marking the active one')
+
+        register = actions.add_parser('register', help='Publish model files as a new version')
+        register.add_argument('version')
+        register.add_argument('--primary', default=os.path.join(MODELS_DIR, 'plant_disease_model.h5'))
+        register.add_argument('--recent', help='Optional recent-disease model')
+        register.add_argument('--first-stage', help='Optional small first-stage model for the cascade')
+        register.add_argument(
+            '--specialist', action='append', default=[], metavar='CROP=PATH',
+            help='Per-crop specialist model (repeatable); its class map is "<crop>_model" in classes.json',
+        )
+        register.add_argument('--classes', default=os.path.join(settings.BASE_DIR, 'ml_engine', 'classes.json'))
+        register.add_argument('--input-size', type=int, nargs=2, default=[256, 256], metavar=('H', 'W'))
+        register.add_argument('--notes', default='')
+        register.add_argument('--activate', action='store_true', help='Make it the active version')
+
+        verify = actions.add_parser('verify', help='Check the checksums of one or all versions')
+        verify.add_argument('version', nargs='?')
+
+        activate = actions.add_parser('activate', help='Verify a version and make it active')
+        activate.add_argument('version')
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(options['registry'])
+        try:
+            getattr(self, f"_{options['action']}")(registry, options)
+        except RegistryError as e:
+            raise CommandError(str(e))
+
+    def _list(self, registry, options):
+        versions = registry.versions()
+        if not versions:
+            self.stdout.write(f"No versions in {registry.root}; the legacy model files are in use.")
+            return
+        current = registry.current_version()
+        for version in versions:
+            marker = '*' if version.version == current else ' '
+            created = datetime.fromtimestamp(version.created_at).strftime('%Y-%m-%d %H:%M')
+            size = 'x'.join(str(n) for n in version.input_size)
+            self.stdout.write(
+                f"{marker} {version.version:<20} {created}  input {size}  "
+                f"{', '.join(version.summary()['artifacts'])}  {version.manifest.get('notes', '')}"
+            )
+
+    def _register(self, registry, options):
+        artifacts = {PRIMARY: options['primary'], CLASSES: options['classes']}
+        if options['recent']:
+            artifacts[RECENT_DISEASES] = options['recent']
+        if options['first_stage']:
+            artifacts[FIRST_STAGE] = options['first_stage']
+        for spec in options['specialist']:
+            crop, sep, path = spec.partition('=')
+            if not sep or not crop or not path:
+                raise CommandError(f"--specialist expects CROP=PATH, got {spec!r}")
+            artifacts[normalize(crop) + CLASS_MAP_SUFFIX] = path
+        version = registry.register(
+            options['version'],
+            artifacts,
+            input_size=options['input_size'],
+            notes=options['notes'],
+            activate=options['activate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Registered {version.version} in {version.path}"))
+        for role, entry in version.manifest['artifacts'].items():
+            self.stdout.write(f"  {role:<16} {entry['file']}  sha256 {entry['sha256'][:16]}...")
+        if options['activate']:
+            self.stdout.write(self.style.SUCCESS(f"{version.version} is now active"))
+
+    def _verify(self, registry, options):
+        versions = [registry.get(options['version'])] if options['version'] else registry.versions()
+        failed = 0
+        for version in versions:
+            problems = version.verify()
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{version.version}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{version.version}: OK"))
+        if failed:
+            raise CommandError(f"{failed} version(s) failed verification")
+
+    def _activate(self, registry, options):
+        version = registry.activate(options['version'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{version.version} is now active; workers pick it up within "
+            f"{config.MODEL_REGISTRY_POLL_INTERVAL:g}s"
+        ))
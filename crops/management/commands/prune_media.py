@@ -0,0 +1,96 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from crops.models import DiseaseLog
+from crops.storage import UPLOAD_DIR, media_storage
+from ml_engine import config as ml_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes uploaded originals (and their preprocessed derivatives) that are older than '
+        'the retention period and not referenced by any DiseaseLog.image_name'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, default=ml_config.MEDIA_RETENTION_DAYS, metavar='DAYS',
+            help='Retention period in days (defaults to MEDIA_RETENTION_DAYS)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        # Only the content-addressed uploads are ours to prune; anything
+        # else under MEDIA_ROOT is left alone
+        uploads = os.path.join(root, UPLOAD_DIR)
+        cutoff = time.time() - options['older_than'] * 86400
+        dry_run = options['dry_run']
+
+        referenced = set(
+            DiseaseLog.objects.exclude(image_name__isnull=True)
+            .exclude(image_name='')
+            .values_list('image_name', flat=True)
+            .distinct()
+            .iterator()
+        )
+
+        deleted = kept = freed = 0
+        for dirpath, _, files in os.walk(uploads):
+            for filename in files:
+                path = os.path.join(dirpath, filename)
+                if not os.path.exists(path):
+                    continue  # derivative already removed with its original
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+
+                if media_storage.is_derivative(name):
+                    # Derivatives go with their original; orphans are removed
+                    if any(os.path.exists(p) for p in self._originals_of(path)):
+                        continue
+                elif name in referenced or os.path.getmtime(path) >= cutoff:
+                    kept += 1
+                    continue
+
+                size = os.path.getsize(path)
+                victims = [path]
+                if not media_storage.is_derivative(name):
+                    derivative = media_storage.path(media_storage.derivative_name(name))
+                    if os.path.exists(derivative):
+                        victims.append(derivative)
+                        size += os.path.getsize(derivative)
+
+                self.stdout.write(f"  {'would delete' if dry_run else 'deleting'} {name}")
+                if not dry_run:
+                    for victim in victims:
+                        try:
+                            os.remove(victim)
+                        except FileNotFoundError:
+                            pass
+                deleted += 1
+                freed += size
+
+        if not dry_run:
+            # Drop shard directories emptied above (never the uploads root)
+            for dirpath, dirnames, files in os.walk(uploads, topdown=False):
+                if dirpath != uploads and not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+
+        verb = 'Would free' if dry_run else 'Freed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {freed / (1024 * 1024):.1f}MB: {deleted} file(s) removed, {kept} kept "
+            f"({len(referenced)} referenced by disease logs)"
+        ))
+
+    @staticmethod
+    def _originals_of(derivative_path):
+        """Candidate original paths for a derivative (any extension)."""
+        stem = derivative_path[:-len(media_storage.derivative_name(''))]
+        directory = os.path.dirname(derivative_path)
+        base = os.path.basename(stem)
+        return [
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if os.path.splitext(name)[0] == base and not media_storage.is_derivative(name)
+        ]
@@ -0,0 +1,219 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from crops.models import DiseaseLog
+from crops.storage import media_storage
+
+
+def _load_pixels(name, target_size):
+    """
+    Decode one stored upload (its derivative when possible) in a pool
+    process. Returned as uint8 pixels, a quarter of the float32 size to
+    send back; the images are 8-bit anyway, so nothing is lost.
+    """
+    try:
+        batch = media_storage.load_preprocessed(name, target_size)
+    except Exception:
+        return None
+    return np.rint(batch[0] * 255.0).astype(np.uint8)
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-scores image-based DiseaseLog records with a (new) model version: stored uploads '
+        'are decoded in a process pool, predicted in batches and written back with bulk '
+        'updates. Progress is checkpointed after each chunk, so an interrupted run resumes '
+        'where it stopped; --max-rate / --max-load keep it from crowding out live traffic. '
+        'Results decided by the mock fallback instead of a model are left unchanged.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', help='Registry version to score with (default: the active one)')
+        parser.add_argument('--chunk-size', type=int, default=512, help='Logs read, scored and updated per step')
+        parser.add_argument('--batch-size', type=int, default=32, help='Images per forward pass')
+        parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+        parser.add_argument('--max-rate', type=float, default=0, help='Images/s ceiling (0 = unthrottled)')
+        parser.add_argument(
+            '--max-load', type=float, default=0,
+            help='Pause while the 1-minute load average per CPU is above this (0 = ignore)',
+        )
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'rescore_checkpoint.json'))
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+        parser.add_argument('--limit', type=int, help='Stop after this many logs')
+        parser.add_argument('--dry-run', action='store_true', help='Report disagreement without writing')
+
+    def handle(self, *args, **options):
+        from ml_engine.disease_prediction import EnsembleDiseasePredictor
+        from ml_engine.registry import RegistryError
+
+        # Start the pool before TensorFlow is loaded; spawned workers only
+        # need Django and the media storage
+        pool = ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+        try:
+            try:
+                predictor = EnsembleDiseasePredictor(model_version=options['model_version'])
+            except RegistryError as e:
+                raise CommandError(str(e))
+            if not predictor.primary_model:
+                raise CommandError("The disease model could not be loaded")
+            self._rescore(predictor, pool, options)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def _rescore(self, predictor, pool, options):
+        version = predictor.model_version
+        state = self._read_checkpoint(options, version)
+        if state['last_pk']:
+            self.stdout.write(
+                f"Resuming after log {state['last_pk']} ({state['processed']} already processed)"
+            )
+
+        # Logs already scored by this version (new uploads) are skipped
+        logs = (
+            DiseaseLog.objects.exclude(image_name__isnull=True).exclude(image_name='')
+            .exclude(model_version=version).order_by('pk')
+        )
+        self.stdout.write(f"Scoring with model version {version}")
+
+        transitions = Counter()
+        run_images, run_start = 0, time.perf_counter()
+        last_pk = state['last_pk']
+        while options['limit'] is None or run_images < options['limit']:
+            size = options['chunk_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - run_images)
+            chunk = list(
+                logs.filter(pk__gt=last_pk)
+                .values_list('pk', 'image_name', 'crop_name', 'predicted_disease')[:size]
+            )
+            if not chunk:
+                break
+            self._throttle(options, run_images, run_start)
+
+            updated, missing = self._score_chunk(predictor, pool, chunk, options, transitions, state)
+            if updated and not options['dry_run']:
+                with transaction.atomic():
+                    DiseaseLog.objects.bulk_update(
+                        updated, ['predicted_disease', 'confidence', 'model_version'], batch_size=500
+                    )
+
+            last_pk = chunk[-1][0]
+            run_images += len(chunk)
+            state.update(last_pk=last_pk, processed=state['processed'] + len(chunk))
+            state['missing'] += missing
+            if not options['dry_run']:
+                self._write_checkpoint(options['checkpoint'], state)
+
+            elapsed = time.perf_counter() - run_start
+            self.stdout.write(
+                f"  up to log {last_pk}: {state['processed']} processed, "
+                f"{run_images / elapsed:.1f} images/s, {self._rate(state):.1%} disagree"
+            )
+
+        elapsed = time.perf_counter() - run_start
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if options['dry_run'] else 'Re-scored'} {run_images} logs in {elapsed:.1f}s "
+            f"({run_images / elapsed if elapsed else 0.0:.1f} images/s); overall "
+            f"{state['changed']} of {state['scored']} predictions changed ({self._rate(state):.1%}), "
+            f"{state['missing']} logs without a readable image, "
+            f"{state['unscored']} left unchanged because no model answered"
+        ))
+        for (old, new), count in transitions.most_common(5):
+            self.stdout.write(f"  {count:>6}  {old} -> {new}")
+
+    def _score_chunk(self, predictor, pool, chunk, options, transitions, state):
+        """Decode and predict one chunk; returns the DiseaseLog objects to update and the missing count."""
+        names = [image_name for _, image_name, _, _ in chunk]
+        pixels = list(pool.map(
+            _load_pixels, names, [predictor.input_size] * len(names),
+            chunksize=max(1, len(names) // (4 * max(1, options['workers']))),
+        ))
+        batch_size = options['batch_size']
+
+        # predict_batch takes one crop per call
+        by_crop = {}
+        missing = 0
+        for (pk, _, crop_name, old), image in zip(chunk, pixels):
+            if image is None:
+                missing += 1
+                continue
+            by_crop.setdefault(crop_name, []).append((pk, old, image))
+
+        updated = []
+        for crop_name, rows in by_crop.items():
+            for start in range(0, len(rows), batch_size):
+                part = rows[start:start + batch_size]
+                batch = np.stack([image for _, _, image in part]).astype(np.float32) * np.float32(1.0 / 255.0)
+                for (pk, old, _), result in zip(part, predictor.predict_batch(batch, crop_name)):
+                    # Random fallback guesses must not overwrite history or skew the stats
+                    if not predictor.from_model(result):
+                        state['unscored'] += 1
+                        continue
+                    new = result.get('disease', 'Unknown')
+                    state['scored'] += 1
+                    if new != old:
+                        state['changed'] += 1
+                        transitions[(old, new)] += 1
+                    updated.append(DiseaseLog(
+                        pk=pk,
+                        predicted_disease=new,
+                        confidence=result.get('confidence', 0.0),
+                        model_version=result.get('model_version'),
+                    ))
+        return updated, missing
+
+    @staticmethod
+    def _rate(state):
+        return state['changed'] / state['scored'] if state['scored'] else 0.0
+
+    def _throttle(self, options, run_images, run_start):
+        """Sleep to honour --max-rate, and while the machine is busier than --max-load."""
+        if options['max_rate'] > 0:
+            ahead = run_images / options['max_rate'] - (time.perf_counter() - run_start)
+            if ahead > 0:
+                time.sleep(ahead)
+        if options['max_load'] > 0 and hasattr(os, 'getloadavg'):
+            cpus = os.cpu_count() or 1
+            while os.getloadavg()[0] / cpus > options['max_load']:
+                self.stdout.write(f"  load {os.getloadavg()[0]:.1f} is above the limit; waiting")
+                time.sleep(10)
+
+    def _read_checkpoint(self, options, version):
+        fresh = {'model_version': version, 'last_pk': 0, 'processed': 0, 'scored': 0, 'changed': 0, 'missing': 0,
+                 'unscored': 0}
+        if options['restart'] or options['dry_run']:
+            return fresh
+        try:
+            with open(options['checkpoint'], 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return fresh
+        except ValueError as e:
+            raise CommandError(f"Corrupt checkpoint {options['checkpoint']}: {e} (use --restart)")
+        if state.get('model_version') != version:
+            self.stdout.write(
+                f"Checkpoint is for model version {state.get('model_version')}; starting over"
+            )
+            return fresh
+        return {**fresh, **state}
+
+    @staticmethod
+    def _write_checkpoint(path, state):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
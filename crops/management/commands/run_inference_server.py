@@ -0,0 +1,49 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import config
+from ml_engine.disease_prediction import LazyPredictor
+from ml_engine.inference_server import InferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Runs the disease model in a standalone process serving web workers over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=config.DISEASE_INFERENCE_SOCKET or '/tmp/agromind-inference.sock',
+            help='Unix domain socket path (defaults to DISEASE_INFERENCE_SOCKET)',
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+
+        self.stdout.write("Loading disease models...")
+        # The lazy wrapper lets the server hot-swap registry versions too
+        predictor = LazyPredictor()
+        try:
+            loaded = predictor.get()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        if not loaded.primary_model:
+            raise CommandError("Primary disease model could not be loaded")
+        self.stdout.write(f"Model version {loaded.model_version}")
+
+        server = InferenceServer(socket_path, predictor)
+
+        def shutdown(signum, frame):
+            # shutdown() blocks until serve_forever returns, so call it off-thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(f"Inference server listening on {socket_path}"))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.stdout.write("Inference server stopped.")
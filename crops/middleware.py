@@ -0,0 +1,62 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from ml_engine import instrumentation
+
+
+class ServerTimingMiddleware:
+    """
+    Gives each request a `timings` dict that views fill with `stage_timer`,
+    then records the stages as histograms (labelled by view and, when the
+    view sets `request.model_version` / `request.inference_path`, by model
+    version and cascade path) and returns them in
+    a `Server-Timing` header. With METRICS_ENABLED off, `request.timings` is
+    None and nothing is measured. Works in both sync and async chains, so
+    async views are not pushed onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not instrumentation.ENABLED:
+            request.timings = None
+            return self.get_response(request)
+
+        request.timings = {}
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self._finish(request, response, start)
+
+    async def __acall__(self, request):
+        if not instrumentation.ENABLED:
+            request.timings = None
+            return await self.get_response(request)
+
+        request.timings = {}
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self._finish(request, response, start)
+
+    def _finish(self, request, response, start):
+        total_ms = (time.perf_counter() - start) * 1000.0
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        if view == 'metrics':
+            return response
+
+        instrumentation.record_request(
+            view, request.timings, total_ms,
+            getattr(request, 'model_version', None), getattr(request, 'inference_path', None),
+        )
+        response['Server-Timing'] = instrumentation.server_timing(request.timings, total_ms)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0004_diseaselog_crop_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diseaselog',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -66,6 +66,7 @@ class DiseaseLog(models.Model):
     symptoms = models.TextField(blank=True, null=True)
     predicted_disease = models.CharField(max_length=100)
     confidence = models.FloatField(default=0.0)
+    model_version = models.CharField(max_length=64, blank=True, null=True)
 
     def __str__(self):
         return f"Disease Detection for {self.user} at {self.created_at}"
@@ -0,0 +1,76 @@
+from ml_engine import config as ml_config
+from ml_engine.embeddings import EmbeddingStore, IVFIndex, decode_embedding
+
+from .executor import inference_executor
+from .models import DiseaseLog
+
+# Shared by every worker through the files in DISEASE_EMBEDDINGS_DIR
+similarity_index = (
+    IVFIndex(EmbeddingStore(ml_config.DISEASE_EMBEDDINGS_DIR), nprobe=ml_config.DISEASE_ANN_NPROBE)
+    if ml_config.DISEASE_EMBEDDINGS else None
+)
+
+
+def index_embedding(log_id, embedding, k=0):
+    """
+    Add a log's embedding (as returned by the predictor) to the index and
+    return the `k` most similar earlier cases as (log id, similarity).
+    """
+    if similarity_index is None or not embedding:
+        return []
+    vector = decode_embedding(embedding)
+    try:
+        matches = similarity_index.search(vector, k) if k else []
+        similarity_index.add(log_id, vector)
+    except (OSError, ValueError) as e:
+        print(f"Error updating similarity index: {e}")
+        return []
+    return matches
+
+
+def _describe(matches, logs, user):
+    cases = []
+    for log_id, score in matches:
+        log = logs.get(log_id)
+        if log is None:
+            continue  # log deleted since it was indexed
+        cases.append({
+            'log_id': log_id,
+            'disease': log.predicted_disease,
+            'crop_name': log.crop_name,
+            'confidence': log.confidence,
+            'similarity': round(score, 4),
+            'created_at': log.created_at.isoformat(),
+            # Only the user's own photos are linked
+            'image_name': log.image_name if log.user_id == user.id else None,
+        })
+    return cases
+
+
+async def similar_cases_for_new_log(log, embedding, user, k=ml_config.DISEASE_SIMILAR_CASES):
+    """
+    Index a freshly created log and describe its nearest past cases.
+
+    Best effort: the log is already saved, so a busy executor or a failing
+    index only leaves the suggestions out (and the log unindexed until
+    `build_similarity_index` runs) instead of failing the request.
+    """
+    try:
+        matches = await inference_executor.run(index_embedding, log.id, embedding, k)
+        logs = {l.id: l async for l in DiseaseLog.objects.filter(id__in=[m[0] for m in matches])}
+    except Exception as e:
+        print(f"Similar cases skipped for disease log {log.id}: {e}")
+        return []
+    return _describe(matches, logs, user)
+
+
+def similar_cases_for_log(log_id, user, k=ml_config.DISEASE_SIMILAR_CASES):
+    """Nearest past cases of an already indexed log, or None if it has no embedding."""
+    if similarity_index is None:
+        return None
+    vector = similarity_index.store.get(log_id)
+    if vector is None:
+        return None
+    matches = similarity_index.search(vector, k, exclude_id=log_id)
+    logs = DiseaseLog.objects.in_bulk([m[0] for m in matches])
+    return _describe(matches, logs, user)
@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+from ml_engine import config as ml_config
+from ml_engine.preprocessing import decode_image
+
+UPLOAD_DIR = 'uploads'
+DERIVATIVE_SUFFIX = f'.{ml_config.MEDIA_DERIVATIVE_SIZE}.npy'
+_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif', 'BMP': '.bmp', 'TIFF': '.tif'}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Media storage that names uploads by the SHA-256 of their content, under
+    uploads/<ab>/<sha256><ext>. Saving the same photo twice stores it once.
+
+    Next to each original it keeps a derivative: the image decoded and
+    resized to MEDIA_DERIVATIVE_SIZE as a uint8 .npy array, so reprocessing
+    stored uploads skips JPEG decoding.
+    """
+
+    def content_name(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        # The extension comes from the image header, not the client's file
+        # name, so the same bytes always map to the same name
+        try:
+            image_format = Image.open(io.BytesIO(data)).format
+        except Exception:
+            image_format = None
+        ext = _EXTENSIONS.get(image_format, '')
+        return f"{UPLOAD_DIR}/{digest[:2]}/{digest}{ext}"
+
+    def get_available_name(self, name, max_length=None):
+        # The name is derived from the content, so an existing file with the
+        # same name already holds these bytes
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            try:
+                # Restart the retention clock: prune_media goes by mtime
+                os.utime(full_path)
+                return name
+            except FileNotFoundError:
+                pass  # pruned in the meantime; write it again
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename: workers racing on the same upload both write
+        # identical bytes, and readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(tmp, self.file_permissions_mode or 0o644)
+            os.replace(tmp, full_path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name
+
+    @staticmethod
+    def derivative_name(name):
+        return os.path.splitext(name)[0] + DERIVATIVE_SUFFIX
+
+    @staticmethod
+    def is_derivative(name):
+        return name.endswith(DERIVATIVE_SUFFIX)
+
+    def save_original(self, name, data):
+        """Write the original and its derivative unless they already exist."""
+        self.save(name, ContentFile(data))
+        derivative = self.derivative_name(name)
+        if self.exists(derivative):
+            return
+        size = ml_config.MEDIA_DERIVATIVE_SIZE
+        try:
+            img = Image.open(io.BytesIO(data))
+            if img.format == 'JPEG':
+                img.draft('RGB', (size, size))
+            img = img.convert('RGB').resize((size, size), Image.BICUBIC, reducing_gap=3.0)
+        except Exception as e:
+            # The original is kept; reprocessing just decodes it
+            print(f"No derivative for {name}: {e}")
+            return
+        buf = io.BytesIO()
+        np.save(buf, np.asarray(img, dtype=np.uint8))
+        self.save(derivative, ContentFile(buf.getvalue()))
+
+    def load_preprocessed(self, name, target_size=None):
+        """
+        A stored upload as a normalized (1, H, W, 3) float32 batch, read from
+        its derivative when one of the right size exists, else decoded.
+        """
+        size = ml_config.MEDIA_DERIVATIVE_SIZE
+        target_size = tuple(target_size or (size, size))
+        derivative = self.derivative_name(name)
+        if target_size == (size, size) and self.exists(derivative):
+            with self.open(derivative, 'rb') as f:
+                pixels = np.load(f)
+            return pixels[None, ...].astype(np.float32) * np.float32(1.0 / 255.0)
+
+        with self.open(name, 'rb') as f:
+            return decode_image(f.read(), target_size)
+
+
+media_storage = ContentAddressedStorage()
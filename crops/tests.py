@@ -1,3 +1,827 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from ml_engine import config as ml_config, inference_server, prediction_cache
+from ml_engine.artifact_store import ArtifactStore
+from ml_engine.batching import MicroBatcher
+from ml_engine.cascade import ESCALATED, FIRST_STAGE, InferenceCascade
+from ml_engine.disease_prediction import EnsembleDiseasePredictor
+from ml_engine.embeddings import EmbeddingStore, IVFIndex, decode_embedding, encode_embedding
+from ml_engine.ensemble import EnsembleMember, EnsembleRunner
+from ml_engine.inference_server import InferenceClient, InferenceServer
+from ml_engine.knowledge_base import DiseaseKnowledgeBase
+from ml_engine.prediction_cache import PredictionCache
+from ml_engine.registry import ModelRegistry, RegistryError
+from ml_engine.specialists import SpecialistPool
+from ml_engine.symptom_matcher import SymptomMatcher
+from ml_engine.tta import TestTimeAugmenter, augment, merge
+
+from . import similarity, views
+from .executor import InferenceExecutor
+from .models import DiseaseLog
+from .storage import media_storage
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class _CountingPredictor:
+    """Stands in for the disease predictor and counts the images it has scored."""
+
+    input_size = (8, 8)
+
+    def __init__(self):
+        self.scored = 0
+
+    def is_ready(self):
+        return True
+
+    def predict_batch(self, batch, crop_name=None):
+        assert batch.shape[1:3] == self.input_size, batch.shape
+        self.scored += len(batch)
+        return [{"disease": "Tomato - healthy", "confidence": 0.9, "model_version": "test"} for _ in batch]
+
+
+class BulkDetectDiseaseTests(TestCase):
+    async def test_first_result_streams_before_last_image_is_processed(self):
+        user = await get_user_model().objects.acreate(username='grower')
+        images = [SimpleUploadedFile(f'leaf{i}.png', _png((i * 40, 100, 0)), 'image/png') for i in range(6)]
+        request = AsyncRequestFactory().post('/disease/bulk/', {'crop_name': 'Tomato', 'images': images})
+        request.user = user
+        predictor = _CountingPredictor()
+
+        with mock.patch.object(views, 'disease_predictor', predictor), \
+                mock.patch.object(views.ml_config, 'DISEASE_BULK_BATCH_SIZE', 2), \
+                mock.patch.object(views, 'persist_upload', lambda data: f'uploads/{len(data)}.png'):
+            response = await views.bulk_detect_disease(request)
+            self.assertTrue(response.is_async)
+            lines = []
+            scored_at_first_line = None
+            async for line in response.streaming_content:
+                if scored_at_first_line is None:
+                    scored_at_first_line = predictor.scored
+                lines.append(line)
+
+        self.assertLess(scored_at_first_line, len(images))
+        self.assertEqual(len(lines), len(images) + 1)
+        self.assertIn(b'"summary"', lines[-1])
+        names = [name async for name in DiseaseLog.objects.filter(user=user).values_list('image_name', flat=True)]
+        self.assertEqual(len(names), len(images))
+        self.assertTrue(all(name.startswith('uploads/') for name in names))
+
+
+class _EmbeddingPredictor:
+    def is_ready(self):
+        return True
+
+    def predict_from_image(self, image, crop_name=None, timings=None):
+        return {"disease": "Potato - Late blight", "confidence": 0.7, "embedding": "AAAA"}
+
+
+class DetectDiseaseTests(TestCase):
+    async def test_busy_similarity_lookup_still_answers_once(self):
+        user = await get_user_model().objects.acreate(username='scout')
+        saturated = InferenceExecutor(workers=1, max_pending=1)
+        saturated._pending = saturated.max_pending
+        request = AsyncRequestFactory().post(
+            '/disease/', {'crop_name': 'Potato', 'image': SimpleUploadedFile('leaf.png', _png('brown'), 'image/png')},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        request.user = user
+
+        with mock.patch.object(views, 'disease_predictor', _EmbeddingPredictor()), \
+                mock.patch.object(views, 'persist_upload', lambda data: 'uploads/leaf.png'), \
+                mock.patch.object(similarity, 'inference_executor', saturated), \
+                mock.patch('builtins.print'):
+            response = await views.detect_disease(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['result']['similar_cases'], [])
+        self.assertEqual(await DiseaseLog.objects.filter(user=user).acount(), 1)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def make_batcher(self, infer_fn, **kwargs):
+        batcher = MicroBatcher(infer_fn, **kwargs)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_queued_tensors_share_one_forward_pass(self):
+        sizes = []
+
+        def infer(batch):
+            sizes.append(len(batch))
+            return batch.sum(axis=1)
+
+        batcher = self.make_batcher(infer, max_batch_size=4, max_wait_ms=1000)
+        futures = [batcher.submit(np.full(3, i, dtype=np.float32)) for i in range(4)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [0.0, 3.0, 6.0, 9.0])
+        self.assertEqual(sizes, [4])
+
+    def test_lone_request_is_flushed_after_max_wait(self):
+        batcher = self.make_batcher(lambda batch: batch, max_batch_size=8, max_wait_ms=20)
+        np.testing.assert_array_equal(batcher.predict(np.ones(2), timeout=5), np.ones(2))
+
+    def test_model_errors_reach_every_caller(self):
+        def infer(batch):
+            raise ValueError("model failed")
+
+        batcher = self.make_batcher(infer, max_batch_size=2, max_wait_ms=1000)
+        for future in [batcher.submit(np.zeros(1)) for _ in range(2)]:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+
+    def test_short_output_fails_the_batch_instead_of_hanging(self):
+        batcher = self.make_batcher(lambda batch: batch[:1], max_batch_size=3, max_wait_ms=1000)
+        for future in [batcher.submit(np.zeros(1)) for _ in range(3)]:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+    def test_closed_batcher_rejects_work(self):
+        batcher = MicroBatcher(lambda batch: batch)
+        batcher.close()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(np.zeros(1))
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_hits_are_private_copies(self):
+        cache = PredictionCache()
+        key = cache.make_key(b'leaf', 'Tomato')
+        self.assertIsNone(cache.get(key))
+        cache.set(key, {"disease": "Tomato - Late blight", "top": [["Tomato - Late blight", 0.8]]})
+
+        first = cache.get(key)
+        first["top"].append(["Tomato - healthy", 0.2])
+        self.assertEqual(cache.get(key)["top"], [["Tomato - Late blight", 0.8]])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_key_ignores_crop_case_and_padding(self):
+        cache = PredictionCache()
+        self.assertEqual(cache.make_key(b'leaf', ' Potato '), cache.make_key(b'leaf', 'potato'))
+        self.assertNotEqual(cache.make_key(b'leaf', 'Potato'), cache.make_key(b'leaf', 'Tomato'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PredictionCache(max_entries=2)
+        for name in ('a', 'b'):
+            cache.set(name, {"disease": name})
+        cache.get('a')
+        cache.set('c', {"disease": "c"})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {"disease": "a"})
+
+    def test_expired_entries_are_misses(self):
+        cache = PredictionCache(ttl=-1)
+        cache.set('k', {"disease": "x"})
+        self.assertIsNone(cache.get('k'))
+
+    def test_model_change_invalidates_entries(self):
+        versions = iter(['v1', 'v1', 'v2', 'v2'])
+        with mock.patch.object(prediction_cache, 'file_fingerprint', lambda *paths: next(versions)), \
+                mock.patch('builtins.print'):
+            cache = PredictionCache(watch_paths=['model.h5'])
+            key = cache.make_key(b'leaf')
+            cache.set(key, {"disease": "x"})
+            self.assertNotEqual(cache.make_key(b'leaf'), key)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_disk_mirror_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as shared:
+            writer, reader = PredictionCache(disk_dir=shared), PredictionCache(disk_dir=shared)
+            key = writer.make_key(b'leaf', 'Corn')
+            writer.set(key, {"disease": "Corn - Common rust"})
+            self.assertEqual(reader.get(key), {"disease": "Corn - Common rust"})
+            self.assertEqual(reader.disk_hits, 1)
+
+
+class _SummingPredictor:
+    """Server-side predictor that reports each image's pixel sum."""
+
+    input_size = (4, 4)
+
+    def __init__(self):
+        self.stored = {}
+
+    def is_ready(self):
+        return True
+
+    def cached_result(self, digest, crop_name=None):
+        return self.stored.get(digest)
+
+    def store_result(self, digest, crop_name, result):
+        self.stored[digest] = result
+
+    def predict_from_array(self, img_array, crop_name=None):
+        return {"disease": crop_name, "confidence": float(img_array.sum())}
+
+    def predict_batch(self, img_batch, crop_name=None):
+        return [self.predict_from_array(img, crop_name) for img in img_batch]
+
+
+class InferenceServerProtocolTests(SimpleTestCase):
+    def setUp(self):
+        socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_dir, True)
+        self.socket_path = os.path.join(socket_dir, 'inference.sock')
+        # Server and client share this process's resource tracker, so the
+        # server must not unregister the client's segments
+        attach = mock.patch.object(inference_server, '_attach', lambda name: shared_memory.SharedMemory(name=name))
+        attach.start()
+        self.addCleanup(attach.stop)
+        self.server = InferenceServer(self.socket_path, _SummingPredictor())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.fallback = mock.Mock()
+        self.client = InferenceClient(self.socket_path, self.fallback, timeout=5, retry_after=60)
+        self.addCleanup(self.client._release_segments)
+
+    def test_tensors_round_trip_through_shared_memory(self):
+        batch = np.stack([np.full((2, 2, 3), v, dtype=np.float32) for v in (0.5, 1.0)])
+        results = self.client.predict_batch(batch, 'Tomato')
+        self.assertEqual([r["confidence"] for r in results], [6.0, 12.0])
+        self.assertEqual(self.client.predict_from_array(batch[:1], 'Corn', digest='d1')["disease"], 'Corn')
+        self.assertEqual(self.server.predictor.stored['d1']["confidence"], 6.0)
+        self.fallback.predict_batch.assert_not_called()
+
+    def test_positive_ping_is_reused_briefly(self):
+        with mock.patch.object(self.client, '_call', wraps=self.client._call) as call:
+            self.assertTrue(self.client.is_ready())
+            self.assertTrue(self.client.is_ready())
+        self.assertEqual(call.call_count, 1)
+
+    def test_failed_request_gets_a_fresh_segment(self):
+        image = np.ones((1, 2, 2, 3), dtype=np.float32)
+        self.client.predict_from_array(image)
+        first = self.client._local.shm.name
+        with mock.patch.object(self.server, 'dispatch', side_effect=RuntimeError("timed out")), \
+                mock.patch('builtins.print'):
+            self.client.predict_from_array(image)
+        self.assertIsNone(self.client._local.shm)
+        self.client.predict_from_array(image)
+        self.assertNotEqual(self.client._local.shm.name, first)
+
+    def test_client_decodes_at_the_size_the_server_reports(self):
+        self.fallback.input_size = (256, 256)
+        self.assertEqual(self.client.input_size, (4, 4))
+        self.client.predict_from_image(_png('green'), 'Tomato')
+        # 4x4 pixels of (0, 128, 0)
+        self.assertAlmostEqual(self.server.predictor.stored.popitem()[1]["confidence"], 4 * 4 * 128 / 255, places=4)
+
+    def test_unreachable_server_falls_back_in_process(self):
+        self.fallback.predict_from_symptoms.return_value = {"disease": "local"}
+        client = InferenceClient(self.socket_path + '.missing', self.fallback, retry_after=60)
+        with mock.patch('builtins.print'):
+            self.assertEqual(client.predict_from_symptoms('yellow leaves')["disease"], 'local')
+            client.predict_batch(np.zeros((1, 2, 2, 3), dtype=np.float32))
+        self.fallback.predict_batch.assert_called_once()
+        self.assertEqual(client._segments, [])
+
+
+class DiseaseKnowledgeBaseTests(SimpleTestCase):
+    DATA = {
+        "crop_aliases": {"maize": "Corn (maize)"},
+        "diseases": [
+            {"name": "Potato - Early blight", "crop": "Potato", "aliases": ["Alternaria leaf spot"],
+             "treatment": "Chlorothalonil"},
+            {"name": "Tomato - Early blight", "crop": "Tomato", "treatment": "Copper spray"},
+            {"name": "Corn (maize) - Common rust", "crop": "Corn (maize)", "treatment": "Resistant hybrids"},
+        ],
+    }
+
+    def write_kb(self, data, **kwargs):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+        self.addCleanup(os.remove, f.name)
+        with mock.patch('builtins.print'):
+            return DiseaseKnowledgeBase(f.name, **kwargs), f.name
+
+    def test_bare_disease_name_is_scoped_to_the_request_crop(self):
+        kb, _ = self.write_kb(self.DATA)
+        self.assertEqual(kb.get("Early blight", "Tomato")["treatment"], "Copper spray")
+        self.assertEqual(kb.get("Early_blight", "potato")["treatment"], "Chlorothalonil")
+
+    def test_full_name_wins_over_the_request_crop(self):
+        kb, _ = self.write_kb(self.DATA)
+        self.assertEqual(kb.find("Potato___Early_blight", "Tomato")["name"], "Potato - Early blight")
+
+    def test_disease_and_crop_aliases(self):
+        kb, _ = self.write_kb(self.DATA)
+        self.assertEqual(kb.find("alternaria leaf spot")["crop"], "Potato")
+        self.assertEqual(kb.find("Common rust", "Maize")["name"], "Corn (maize) - Common rust")
+        self.assertIsNone(kb.get("Fire blight", "Apple"))
+
+    def test_edited_file_is_picked_up(self):
+        kb, path = self.write_kb({"diseases": []}, reload_interval=0)
+        self.assertEqual(len(kb), 0)
+        with open(path, 'w') as f:
+            json.dump(self.DATA, f)
+        os.utime(path, (0, 0))
+        with mock.patch('builtins.print'):
+            self.assertEqual(kb.find("Common rust", "Corn (maize)")["treatment"], "Resistant hybrids")
+        self.assertEqual(len(kb), 3)
+
+
+class SymptomMatcherTests(SimpleTestCase):
+    def test_phrases_match_whole_words_only(self):
+        matcher = SymptomMatcher([
+            {"phrase": "rot", "disease": "Rot"},
+            {"phrase": "white", "disease": "Powdery Mildew"},
+            {"phrase": "whitefly", "disease": "Leaf Curl Virus"},
+        ])
+        self.assertEqual(matcher.score("a carrot"), [])
+        self.assertEqual(matcher.score("whitefly under the leaves"), [("Leaf Curl Virus", 1.0)])
+        self.assertEqual(matcher.score("Rotting stems, rotten fruit"), [("Rot", 2.0)])
+        self.assertEqual(matcher.score("whiteness on the leaves"), [("Powdery Mildew", 1.0)])
+
+    def test_stem_phrases_take_any_ending(self):
+        matcher = SymptomMatcher([{"phrase": "murjha", "disease": "Wilt", "stem": True}])
+        self.assertEqual(matcher.score("paudhe murjhane lage"), [("Wilt", 1.0)])
+
+    def test_weights_rank_diseases_within_the_crop(self):
+        matcher = SymptomMatcher([
+            {"phrase": "Yellow  Spots", "disease": "Leaf Spot"},
+            {"phrase": "brown rings", "disease": "Early Blight", "weight": 3, "crops": ["Tomato"]},
+        ])
+        text = "yellow spots and brown rings"
+        self.assertEqual(matcher.score(text, "tomato"), [("Early Blight", 3.0), ("Leaf Spot", 2.0)])
+        self.assertEqual(matcher.score(text, "Rice"), [("Leaf Spot", 2.0)])
+        self.assertEqual(matcher.score(text, top_k=1), [("Early Blight", 3.0)])
+
+    def test_shipped_phrases_keep_crop_specific_diseases_to_their_hosts(self):
+        matcher = SymptomMatcher.from_file(ml_config.SYMPTOM_PHRASES_PATH)
+        diseases = lambda text, crop: [disease for disease, _ in matcher.score(text, crop, top_k=10)]
+        self.assertIn("Early Blight", diseases("yellow spots with concentric rings", "Tomato"))
+        self.assertNotIn("Early Blight", diseases("yellow spots with concentric rings", "Rice"))
+        self.assertEqual(diseases("orange rust on the leaves", "Wheat"), ["Wheat Rust"])
+        self.assertEqual(diseases("orange pustules and rust", "Maize"), ["Common Rust"])
+
+
+class CropMaskTests(SimpleTestCase):
+    CLASSES = ['Corn_(maize)___Common_rust_', 'Corn_(maize)___healthy', 'Tomato___Late_blight', 'Tomato___healthy']
+
+    def setUp(self):
+        # Only the class tables are needed; skip loading any models
+        self.predictor = EnsembleDiseasePredictor.__new__(EnsembleDiseasePredictor)
+        self.predictor.class_mappings = {'plant_village': {str(i): name for i, name in enumerate(self.CLASSES)}}
+        self.predictor.knowledge_base = mock.Mock(**{'crop_aliases.return_value': {'makka': 'corn maize'}})
+        self.predictor._build_crop_mask()
+
+    def test_mask_rows_and_crop_lookup(self):
+        self.assertEqual(self.predictor.class_display_names[0], 'Corn (maize) - Common rust')
+        np.testing.assert_array_equal(self.predictor.crop_mask, [[1, 1, 0, 0], [0, 0, 1, 1]])
+        corn = self.predictor.crop_row('Corn (maize)')
+        self.assertEqual([self.predictor.crop_row(name) for name in ('maize', 'Makka', 'sweet corn')], [corn] * 3)
+        self.assertIsNone(self.predictor.crop_row('Rice'))
+
+    def test_other_crops_are_masked_out(self):
+        scores = self.predictor._crop_scores([0.1, 0.2, 0.6, 0.1], 'Corn')
+        np.testing.assert_allclose(scores, [0.1, 0.2, -1, -1])
+        np.testing.assert_allclose(self.predictor._crop_scores([0.1, 0.2, 0.6, 0.1], None), [0.1, 0.2, 0.6, 0.1])
+
+    def test_confident_prediction_for_another_crop_is_kept(self):
+        np.testing.assert_allclose(self.predictor._crop_scores([0.01, 0.01, 0.97, 0.01], 'maize'), [0.01, 0.01, 0.97, 0.01])
+
+    def test_uncovered_crop_has_no_primary_scores(self):
+        self.assertIsNone(self.predictor._crop_scores([0.4, 0.2, 0.3, 0.1], 'Rice'))
+        self.assertIsNotNone(self.predictor._crop_scores([0.97, 0.01, 0.01, 0.01], 'Rice'))
+
+
+class TestTimeAugmenterTests(SimpleTestCase):
+    def test_augment_is_image_major(self):
+        batch = np.arange(2 * 2 * 2 * 3, dtype=np.float32).reshape(2, 2, 2, 3)
+        views = augment(batch, ('hflip', 'vflip'))
+        self.assertEqual(views.shape, (4, 2, 2, 3))
+        np.testing.assert_array_equal(views[0], batch[0, :, ::-1])
+        np.testing.assert_array_equal(views[1], batch[0, ::-1])
+        np.testing.assert_array_equal(views[3], batch[1, ::-1])
+
+    def test_rotations_of_non_square_images_are_identity(self):
+        batch = np.random.default_rng(3).random((1, 2, 4, 3), dtype=np.float32)
+        np.testing.assert_array_equal(augment(batch, ('rot90',))[0], batch[0])
+
+    def test_merge_averages_logits_and_renormalises(self):
+        first = np.array([[0.6, 0.4], [0.5, 0.5]])
+        views = np.array([[0.6, 0.4], [0.6, 0.4], [0.1, 0.9], [0.1, 0.9]])
+        merged = merge(first, views, n_views=2)
+        np.testing.assert_allclose(merged.sum(axis=1), [1.0, 1.0], rtol=1e-6)
+        np.testing.assert_allclose(merged[0], [0.6, 0.4], rtol=1e-5)
+        self.assertGreater(merged[1, 1], 0.5)
+
+    def test_only_low_confidence_is_wanted(self):
+        augmenter = TestTimeAugmenter(lambda batch: batch, threshold=0.6)
+        self.assertEqual([augmenter.wants(c) for c in (0.3, 0.6, 0.9)], [True, False, False])
+        self.assertEqual(augmenter.stats()["checked"], 3)
+
+    def test_views_come_back_after_one_slow_run(self):
+        calls = []
+
+        def infer(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                time.sleep(0.2)
+            return np.full((len(batch), 3), 1 / 3, dtype=np.float32)
+
+        augmenter = TestTimeAugmenter(infer, budget_ms=20)
+        image, first_pass = np.zeros((1, 4, 4, 3)), np.array([[0.5, 0.3, 0.2]])
+        self.assertIsNotNone(augmenter.run(image, first_pass))
+        self.assertEqual(augmenter._view_count(1), 0)
+
+        results = [augmenter.run(image, first_pass) for _ in range(30)]
+        self.assertIsNone(results[0])
+        self.assertIsNotNone(results[-1])
+        self.assertGreater(augmenter.skipped_budget, 0)
+        self.assertEqual(augmenter._view_count(1), len(augmenter.views))
+
+
+class EnsembleRunnerTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.runner = EnsembleRunner(max_workers=4, timeout_ms=50)
+        self.addCleanup(self.runner.close)
+
+    def scaled(self, factor):
+        return lambda batch: batch * factor
+
+    def stuck(self, batch):
+        self.release.wait(5)
+        return batch
+
+    def failing(self, batch):
+        raise RuntimeError("bad weights")
+
+    def test_members_share_the_batch_and_specialists_need_their_crop(self):
+        self.runner.add(EnsembleMember("primary", self.scaled(1), [], "Primary", required=True))
+        self.runner.add(EnsembleMember("recent", self.scaled(2), [], "Recent"))
+        self.runner.add(EnsembleMember("rice", self.scaled(3), [], "Rice", crop="rice"))
+        batch = np.ones((2, 1))
+
+        outputs, dropped = self.runner.run(batch, crop="wheat")
+        self.assertEqual(sorted(outputs), ["primary", "recent"])
+        np.testing.assert_array_equal(outputs["recent"], batch * 2)
+        self.assertEqual(dropped, {})
+        self.assertEqual(sorted(self.runner.run(batch, crop="rice")[0]), ["primary", "recent", "rice"])
+
+    def test_late_and_failing_members_are_dropped(self):
+        self.runner.add(EnsembleMember("primary", self.scaled(1), [], "Primary", required=True))
+        self.runner.add(EnsembleMember("slow", self.stuck, [], "Slow"))
+        self.runner.add(EnsembleMember("broken", self.failing, [], "Broken"))
+        with mock.patch('builtins.print'):
+            outputs, dropped = self.runner.run(np.ones((1, 1)))
+        self.assertEqual(list(outputs), ["primary"])
+        self.assertEqual(dropped, {"slow": "timeout", "broken": "error"})
+        members = self.runner.stats()["members"]
+        self.assertEqual((members["slow"]["timeouts"], members["broken"]["errors"]), (1, 1))
+
+    def test_required_member_is_waited_for(self):
+        self.runner.add(EnsembleMember("primary", self.stuck, [], "Primary", required=True))
+        self.runner.add(EnsembleMember("recent", self.scaled(2), [], "Recent"))
+        threading.Timer(0.2, self.release.set).start()
+        outputs, dropped = self.runner.run(np.ones((1, 1)))
+        self.assertEqual(sorted(outputs), ["primary", "recent"])
+        self.assertEqual(dropped, {})
+
+    def test_lone_member_runs_inline(self):
+        self.runner.add(EnsembleMember("broken", self.failing, [], "Broken"))
+        self.runner.close()
+        with mock.patch('builtins.print'):
+            self.assertEqual(self.runner.run(np.ones((1, 1))), ({}, {"broken": "error"}))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        workspace = tempfile.TemporaryDirectory()
+        self.addCleanup(workspace.cleanup)
+        self.sources = os.path.join(workspace.name, 'build')
+        os.makedirs(os.path.join(self.sources, 'int8'))
+        self.registry = ModelRegistry(os.path.join(workspace.name, 'registry'))
+
+    def artifact(self, name, content):
+        path = os.path.join(self.sources, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_registered_version_becomes_current(self):
+        version = self.registry.register(
+            'v1', {'primary': self.artifact('model.h5', b'weights'), 'classes': self.artifact('classes.json', b'{}')},
+            input_size=(224, 224), activate=True,
+        )
+        self.assertEqual(self.registry.current_version(), 'v1')
+        self.assertEqual(self.registry.current().input_size, (224, 224))
+        self.assertEqual(version.verify(), [])
+        with self.assertRaises(RegistryError):
+            self.registry.register('v1', {'primary': self.artifact('model.h5', b'weights')})
+
+    def test_tampered_artifact_cannot_be_activated(self):
+        version = self.registry.register('v2', {'primary': self.artifact('model.h5', b'weights')})
+        with open(version.artifact('primary'), 'ab') as f:
+            f.write(b'!')
+        self.assertEqual(version.verify(), ['primary: size mismatch'])
+        with self.assertRaises(RegistryError):
+            self.registry.activate('v2')
+        self.assertIsNone(self.registry.current_version())
+
+    def test_artifacts_sharing_a_file_name_are_rejected(self):
+        artifacts = {'primary': self.artifact('model.tflite', b'a'), 'first_stage': self.artifact('int8/model.tflite', b'b')}
+        with self.assertRaises(RegistryError):
+            self.registry.register('v3', artifacts)
+        self.assertEqual(self.registry.versions(), [])
+
+
+class ArtifactStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.models = os.path.join(self.base, 'models')
+        os.makedirs(self.models)
+        self.store = ArtifactStore(os.path.join(self.base, 'store'), self.models, chunk_size=1000, workers=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def model_file(self, name, data):
+        path = os.path.join(self.models, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def chunk_files(self):
+        return [name for _, _, files in os.walk(os.path.join(self.base, 'store', 'chunks')) for name in files]
+
+    def test_identical_chunks_are_stored_once(self):
+        block = os.urandom(1000)
+        a = self.model_file('a.h5', block * 3)
+        b = self.model_file('b.h5', block + os.urandom(500))
+        self.assertEqual(self.store.pack([a, b]), {'a.h5': 'packed', 'b.h5': 'packed'})
+        self.assertEqual(len(self.chunk_files()), 2)
+        self.assertEqual(self.store.pack([a, b]), {'a.h5': 'unchanged', 'b.h5': 'unchanged'})
+
+    def test_deleted_file_is_restored_and_stale_chunks_pruned(self):
+        path = self.model_file('model.h5', os.urandom(2500))
+        self.store.pack([path])
+        original = Path(path).read_bytes()
+        self.model_file('model.h5', os.urandom(1200))
+        self.store.pack([path])
+        self.assertEqual(len(self.chunk_files()), 2)
+
+        updated = Path(path).read_bytes()
+        os.remove(path)
+        self.assertEqual(self.store.restore(), {'model.h5': 'restored'})
+        self.assertEqual(Path(path).read_bytes(), updated)
+        self.assertNotEqual(updated, original)
+        self.assertEqual(self.store.restore(), {'model.h5': 'unchanged'})
+
+    def test_corrupt_chunk_never_replaces_the_file(self):
+        path = self.model_file('model.h5', os.urandom(3000))
+        self.store.pack([path])
+        digest = self.store.load_manifest()['model.h5']['chunks'][1]['sha256']
+        with open(self.store.chunk_path(digest), 'r+b') as f:
+            f.write(b'\x00' * 8)
+        self.assertEqual(len(self.store.verify()), 1)
+
+        self.model_file('model.h5', b'older copy')
+        self.assertTrue(self.store.restore()['model.h5'].startswith('error'))
+        self.assertEqual(Path(path).read_bytes(), b'older copy')
+
+
+class PruneMediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+    def stored(self, color, age_days):
+        name = media_storage.content_name(_png(color))
+        media_storage.save_original(name, _png(color))
+        past = time.time() - age_days * 86400
+        os.utime(media_storage.path(name), (past, past))
+        return name
+
+    def test_only_stale_unreferenced_uploads_are_deleted(self):
+        stale = self.stored('red', 90)
+        logged = self.stored('blue', 90)
+        fresh = self.stored('white', 1)
+        DiseaseLog.objects.create(user=get_user_model().objects.create(username='pruner'), image_name=logged)
+        report = os.path.join(self.media_root, 'reports', 'season.pdf')
+        os.makedirs(os.path.dirname(report))
+        Path(report).write_bytes(b'%PDF')
+        os.utime(report, (0, 0))
+
+        call_command('prune_media', older_than=30, stdout=io.StringIO())
+        self.assertFalse(media_storage.exists(stale))
+        self.assertFalse(media_storage.exists(media_storage.derivative_name(stale)))
+        self.assertTrue(media_storage.exists(logged))
+        self.assertTrue(media_storage.exists(fresh))
+        self.assertTrue(os.path.exists(report))
+
+    def test_uploading_again_restarts_the_retention_clock(self):
+        name = self.stored('green', 90)
+        media_storage.save_original(name, _png('green'))
+        call_command('prune_media', older_than=30, stdout=io.StringIO())
+        self.assertTrue(media_storage.exists(name))
+
+
+class IVFIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root, True)
+        rng = np.random.default_rng(21)
+        centers = rng.normal(size=(12, 24))
+        cls.vectors = (centers[rng.integers(0, 12, 1200)] + 0.3 * rng.normal(size=(1200, 24))).astype(np.float32)
+
+    def index(self, name, rows, **kwargs):
+        store = EmbeddingStore(os.path.join(self.root, name), grow_rows=512)
+        for log_id, vector in enumerate(rows, start=1):
+            store.append(log_id, vector)
+        return IVFIndex(store, **kwargs)
+
+    def exact(self, query, k):
+        unit = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        return [int(i) + 1 for i in np.argsort(unit @ (query / np.linalg.norm(query)))[::-1][:k]]
+
+    def test_embeddings_survive_the_wire_format(self):
+        vector = self.vectors[0]
+        np.testing.assert_allclose(decode_embedding(encode_embedding(vector)), vector, rtol=1e-2, atol=1e-2)
+
+    def test_untrained_search_is_exact(self):
+        index = self.index('exact', self.vectors[:200])
+        query = self.vectors[7]
+        matches = index.search(query, k=5, exclude_id=8)
+        self.assertNotIn(8, [log_id for log_id, _ in matches])
+        self.assertEqual([log_id for log_id, _ in index.search(query, k=3)][0], 8)
+
+    def test_trained_index_keeps_recall_and_sees_new_rows(self):
+        index = self.index('ivf', self.vectors, nprobe=4)
+        self.assertEqual(index.train(n_lists=24), 24)
+        queries = self.vectors[::60]
+        found = [
+            len({log_id for log_id, _ in index.search(q, k=10)} & set(self.exact(q, 10)))
+            for q in queries
+        ]
+        self.assertGreaterEqual(sum(found) / (10 * len(queries)), 0.9)
+
+        index.add(5000, self.vectors[3] * 2)
+        reader = IVFIndex(EmbeddingStore(index.store.directory), nprobe=4)
+        self.assertIn(5000, [log_id for log_id, _ in reader.search(self.vectors[3], k=2)])
+
+
+class _FakeBackend:
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def predict(self, batch):
+        return np.full((len(batch), 2), 0.5, dtype=np.float32)
+
+    def close(self):
+        self.closed = True
+
+
+class SpecialistPoolTests(SimpleTestCase):
+    def setUp(self):
+        models = tempfile.TemporaryDirectory()
+        self.addCleanup(models.cleanup)
+        self.paths = {}
+        for crop in ('rice', 'wheat', 'cotton'):
+            self.paths[crop] = os.path.join(models.name, f'{crop}_model.h5')
+            with open(self.paths[crop], 'wb') as f:
+                f.truncate(1024 * 1024)
+        self.loaded = []
+        for patch in (mock.patch('ml_engine.specialists.resident_bytes', return_value=None), mock.patch('builtins.print')):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def slow_loader(self, path):
+        time.sleep(0.2)
+        self.loaded.append(path)
+        return _FakeBackend(path)
+
+    def pool(self, budget_mb=2.5):
+        return SpecialistPool(self.paths, lambda path: self.loaded.append(path) or _FakeBackend(path), budget_mb)
+
+    def test_least_recently_used_model_is_evicted_and_closed(self):
+        pool = self.pool()
+        rice, wheat = pool.get('rice'), pool.get('wheat')
+        pool.get('rice')
+        pool.get('cotton')
+        self.assertEqual(pool.stats()["resident"], ['rice', 'cotton'])
+        self.assertTrue(wheat.closed)
+        self.assertFalse(rice.closed)
+        self.assertEqual((pool.loads, pool.hits, pool.evictions), (3, 1, 1))
+
+    def test_leased_model_closes_only_when_released(self):
+        pool = self.pool(budget_mb=1)
+        with pool.lease('rice') as rice:
+            pool.get('wheat')
+            self.assertNotIn('rice', pool.stats()["resident"])
+            self.assertFalse(rice.closed)
+        self.assertTrue(rice.closed)
+
+    def test_broken_file_is_not_reloaded_until_it_changes(self):
+        def loader(path):
+            self.loaded.append(path)
+            raise OSError("truncated file")
+
+        pool = SpecialistPool(self.paths, loader)
+        self.assertIsNone(pool.get('rice'))
+        self.assertIsNone(pool.get('rice'))
+        self.assertEqual(len(self.loaded), 1)
+        os.utime(self.paths['rice'], (0, 0))
+        with self.assertRaises(RuntimeError):
+            pool.predict('rice', np.zeros((1, 2, 2, 3)))
+        self.assertEqual(len(self.loaded), 2)
+        self.assertIsNone(pool.get('tea'))
+
+    def test_concurrent_first_requests_share_one_load(self):
+        pool = SpecialistPool(self.paths, self.slow_loader)
+        threads = [threading.Thread(target=pool.predict, args=('wheat', np.zeros((1, 2, 2, 3)))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.loaded, [self.paths['wheat']])
+        self.assertEqual(pool.hits, 3)
+
+    def test_first_request_for_a_crop_is_not_dropped_while_loading(self):
+        predictor = EnsembleDiseasePredictor.__new__(EnsembleDiseasePredictor)
+        predictor.tta = None
+        predictor.specialists = SpecialistPool({'rice': self.paths['rice']}, self.slow_loader)
+        predictor.specialist_index = {'rice': 'rice'}
+        predictor.ensemble = EnsembleRunner(timeout_ms=50)
+        self.addCleanup(predictor.ensemble.close)
+        predictor.ensemble.add(EnsembleMember(
+            "primary", lambda batch: (np.ones((len(batch), 2)), None, None), [], "Primary", required=True,
+        ))
+        predictor.ensemble.add(EnsembleMember(
+            "rice_specialist", lambda batch: predictor.specialists.predict('rice', batch), ['a', 'b'], "Rice", crop='rice',
+        ))
+
+        members = predictor._run_members(np.zeros((1, 2, 2, 3)), 'Paddy rice')[4]
+        self.assertEqual(members, {"contributed": ["primary", "rice_specialist"], "dropped": {}})
+        self.assertEqual(len(self.loaded), 1)
+
+
+class InferenceCascadeTests(SimpleTestCase):
+    class FirstStage:
+        """Small model at 2x2 that is as confident as an image is bright."""
+
+        input_shape = (2, 2, 3)
+
+        def __init__(self):
+            self.shapes = []
+
+        def predict(self, batch):
+            self.shapes.append(batch.shape)
+            confidence = batch.mean(axis=(1, 2, 3))
+            return np.stack([confidence, 1 - confidence], axis=1)
+
+    def test_only_unsure_images_reach_the_full_model(self):
+        escalated_batches = []
+
+        def full_forward(batch):
+            escalated_batches.append(len(batch))
+            return np.tile([[0.1, 0.9]], (len(batch), 1)), np.ones((len(batch), 4))
+
+        first_stage = self.FirstStage()
+        cascade = InferenceCascade(first_stage, full_forward, threshold=0.8)
+        batch = np.stack([np.full((4, 4, 3), v, dtype=np.float32) for v in (0.95, 0.5, 0.85, 0.6)])
+        probabilities, embeddings, paths = cascade.run(batch)
+
+        self.assertEqual(first_stage.shapes, [(4, 2, 2, 3)])
+        self.assertEqual(escalated_batches, [2])
+        self.assertEqual(paths, [FIRST_STAGE, ESCALATED, FIRST_STAGE, ESCALATED])
+        np.testing.assert_allclose(probabilities[1], [0.1, 0.9])
+        self.assertAlmostEqual(float(probabilities[0, 0]), 0.95, places=5)
+        self.assertEqual([e is None for e in embeddings], [True, False, True, False])
+        self.assertEqual(cascade.stats()["escalation_rate"], 0.5)
+
+    def test_confident_batch_skips_the_full_model(self):
+        cascade = InferenceCascade(self.FirstStage(), mock.Mock(side_effect=AssertionError), threshold=0.5)
+        _, _, paths = cascade.run(np.ones((3, 4, 4, 3), dtype=np.float32))
+        self.assertEqual(paths, [FIRST_STAGE] * 3)
+        self.assertEqual(cascade.stats()["latency_ms"][ESCALATED]["count"], 0)
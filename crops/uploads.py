@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import media_storage
+
+# Single background writer: persisting uploads is not on the request path
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-writer")
+
+
+def _save(storage, name, data):
+    try:
+        storage.save_original(name, data)
+    except Exception as e:
+        print(f"Error saving upload {name}: {e}")
+
+
+def persist_upload(data):
+    """
+    Schedule the original upload (and its preprocessed derivative) to be
+    written to MEDIA_ROOT and return the content-addressed name it will be
+    stored under. Identical uploads share one file.
+    """
+    filename = media_storage.content_name(data)
+    _writer.submit(_save, media_storage, filename, data)
+    return filename
@@ -7,5 +7,7 @@ urlpatterns = [
     path('yield/', views.predict_yield, name='predict_yield'),
     path('yield/pdf/', views.download_yield_pdf, name='download_yield_pdf'),
     path('disease/', views.detect_disease, name='detect_disease'),
+    path('disease/bulk/', views.bulk_detect_disease, name='bulk_detect_disease'),
+    path('disease/<int:log_id>/similar/', views.similar_cases, name='similar_cases'),
     path('disease/pdf/', views.download_disease_pdf, name='download_disease_pdf'),
 ]
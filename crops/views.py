@@ -1,11 +1,18 @@
-from django.shortcuts import render, redirect
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from .models import Crop, RecommendationLog, YieldLog, DiseaseLog
 from ml_engine.recommendation import CropRecommender
 from ml_engine.yield_prediction import YieldPredictor
-from ml_engine.disease_prediction import predictor as disease_predictor
+from ml_engine import config as ml_config
+from ml_engine.disease_prediction import predictor as local_disease_predictor
+from ml_engine.inference_server import InferenceClient
+from ml_engine.preprocessing import stage_timer
+from .uploads import persist_upload
+from .bulk import iter_uploaded_images, screen_images
+from .executor import InferenceBusy, arender, async_login_required, inference_executor
+from .similarity import index_embedding, similar_cases_for_log, similar_cases_for_new_log
 
 # PDF Generation
 from reportlab.lib.pagesizes import letter
@@ -13,17 +20,36 @@ from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+import asyncio
 import io
+import json
+import zipfile
 from datetime import datetime
 
 # Initialize ML engines
 recommender = CropRecommender()
 yield_predictor = YieldPredictor()
 
-@login_required
-def recommend_crop(request):
+# Disease inference runs in the standalone inference server when one is
+# configured, falling back to the in-process predictor if it is down
+if ml_config.DISEASE_INFERENCE_SOCKET:
+    disease_predictor = InferenceClient(
+        ml_config.DISEASE_INFERENCE_SOCKET,
+        fallback=local_disease_predictor,
+        timeout=ml_config.DISEASE_INFERENCE_TIMEOUT,
+    )
+else:
+    disease_predictor = local_disease_predictor
+
+
+def _timings(request):
+    """Per-request stage timings dict from ServerTimingMiddleware (None when metrics are off)."""
+    return getattr(request, 'timings', None)
+
+@async_login_required
+async def recommend_crop(request):
     if request.method == 'POST':
-        print("DEBUG: recommend_crop POST data:", request.POST)
+        timings = _timings(request)
         try:
             data = request.POST
             nitrogen = float(data.get('nitrogen'))
@@ -36,12 +62,12 @@ def recommend_crop(request):
             
             # Optional fields
             soil_moisture = data.get('soil_moisture')
-            print(f"DEBUG: Extra Recommendation Inputs - Soil Moisture: {soil_moisture}")
             
-            recommendations = recommender.recommend(
-                nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall
-            )
-            print("DEBUG: Recommendations:", recommendations)
+            with stage_timer(timings, 'inference'):
+                recommendations = await inference_executor.run(
+                    recommender.recommend,
+                    nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall
+                )
             context = {
                 'recommendations': recommendations,
                 'nitrogen': nitrogen,
@@ -59,26 +85,28 @@ def recommend_crop(request):
                 top_rec = recommendations[0]['crop'] if recommendations else "None"
                 conf = recommendations[0]['confidence'] if recommendations else 0.0
                 
-                RecommendationLog.objects.create(
-                    user=request.user,
-                    nitrogen=nitrogen,
-                    phosphorus=phosphorus,
-                    potassium=potassium,
-                    temperature=temperature,
-                    humidity=humidity,
-                    ph=ph,
-                    rainfall=rainfall,
-                    soil_moisture=str(soil_moisture) if soil_moisture else None,
-                    recommended_crop=top_rec,
-                    confidence=conf
-                )
+                with stage_timer(timings, 'db'):
+                    await RecommendationLog.objects.acreate(
+                        user=request.user,
+                        nitrogen=nitrogen,
+                        phosphorus=phosphorus,
+                        potassium=potassium,
+                        temperature=temperature,
+                        humidity=humidity,
+                        ph=ph,
+                        rainfall=rainfall,
+                        soil_moisture=str(soil_moisture) if soil_moisture else None,
+                        recommended_crop=top_rec,
+                        confidence=conf
+                    )
 
-            return render(request, 'crops/recommend_result.html', context)
+            with stage_timer(timings, 'render'):
+                return await arender(request, 'crops/recommend_result.html', context)
         except Exception as e:
             print("DEBUG: Error in recommend_crop:", e)
-            return render(request, 'crops/recommend_form.html', {'error': str(e)})
+            return await arender(request, 'crops/recommend_form.html', {'error': str(e)})
             
-    return render(request, 'crops/recommend_form.html')
+    return await arender(request, 'crops/recommend_form.html')
 
 @login_required
 def download_recommendation_pdf(request):
@@ -93,9 +121,11 @@ def download_recommendation_pdf(request):
         rainfall = float(request.GET.get('rainfall', 0))
         
         # Get recommendations again
-        recommendations = recommender.recommend(
-            nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall
-        )
+        timings = _timings(request)
+        with stage_timer(timings, 'inference'):
+            recommendations = recommender.recommend(
+                nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall
+            )
         
         # Create PDF
         buffer = io.BytesIO()
@@ -159,7 +189,8 @@ def download_recommendation_pdf(request):
         else:
             elements.append(Paragraph("No specific recommendations found based on the input data.", styles['Normal']))
 
-        doc.build(elements)
+        with stage_timer(_timings(request), 'render'):
+            doc.build(elements)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf')
         
@@ -214,10 +245,10 @@ def get_gov_measures(crop):
     return specific.get(crop.lower(), []) + common
 
 
-@login_required
-def predict_yield(request):
+@async_login_required
+async def predict_yield(request):
     if request.method == 'POST':
-        print("DEBUG: predict_yield POST data:", request.POST)
+        timings = _timings(request)
         try:
             crop_name = request.POST.get('crop')
             area = float(request.POST.get('area'))
@@ -228,10 +259,12 @@ def predict_yield(request):
             # Optional fields
             fertilizer = float(request.POST.get('fertilizer', 0) or 0)
             irrigation = request.POST.get('irrigation', 'None')
-            print(f"DEBUG: Extra Yield Inputs - Fertilizer: {fertilizer}, Irrigation: {irrigation}")
             
-            prediction = yield_predictor.predict_yield(crop_name, area, soil_type, rainfall, temperature, fertilizer, irrigation)
-            print("DEBUG: Prediction:", prediction)
+            with stage_timer(timings, 'inference'):
+                prediction = await inference_executor.run(
+                    yield_predictor.predict_yield,
+                    crop_name, area, soil_type, rainfall, temperature, fertilizer, irrigation
+                )
             
             context = {
                 'prediction': prediction,
@@ -246,25 +279,27 @@ def predict_yield(request):
             
             # Save Log
             if request.user.is_authenticated:
-                YieldLog.objects.create(
-                    user=request.user,
-                    crop_name=crop_name,
-                    area=area,
-                    soil_type=soil_type,
-                    rainfall=rainfall,
-                    temperature=temperature,
-                    fertilizer=fertilizer,
-                    irrigation=irrigation,
-                    predicted_yield=prediction
-                )
+                with stage_timer(timings, 'db'):
+                    await YieldLog.objects.acreate(
+                        user=request.user,
+                        crop_name=crop_name,
+                        area=area,
+                        soil_type=soil_type,
+                        rainfall=rainfall,
+                        temperature=temperature,
+                        fertilizer=fertilizer,
+                        irrigation=irrigation,
+                        predicted_yield=prediction
+                    )
                 
-            return render(request, 'crops/yield_result.html', context)
+            with stage_timer(timings, 'render'):
+                return await arender(request, 'crops/yield_result.html', context)
         except Exception as e:
             print("DEBUG: Error in predict_yield:", e)
-            return render(request, 'crops/yield_form.html', {'error': str(e)})
+            return await arender(request, 'crops/yield_form.html', {'error': str(e)})
         
-    crops = Crop.objects.all()
-    return render(request, 'crops/yield_form.html', {'crops': crops})
+    crops = [crop async for crop in Crop.objects.all()]
+    return await arender(request, 'crops/yield_form.html', {'crops': crops})
 
 @login_required
 def download_yield_pdf(request):
@@ -317,18 +352,18 @@ def download_yield_pdf(request):
         elements.append(Paragraph(f"{prediction} Quintals", styles['Heading1']))
         elements.append(Paragraph("This is an estimate based on historical data and current conditions.", styles['Normal']))
         
-        doc.build(elements)
+        with stage_timer(_timings(request), 'render'):
+            doc.build(elements)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf')
         
     except Exception as e:
         return HttpResponse(f"Error generating PDF: {str(e)}")
 
-@login_required
-def detect_disease(request):
+@async_login_required
+async def detect_disease(request):
     if request.method == 'POST':
-        print("DEBUG: detect_disease POST data:", request.POST)
-        print("DEBUG: detect_disease FILES data:", request.FILES)
+        timings = _timings(request)
         
         # Optional fields
         plant_age = request.POST.get('plant_age')
@@ -336,63 +371,232 @@ def detect_disease(request):
         
         # Get crop name from either form
         crop_name = request.POST.get('crop_name') or request.POST.get('crop_name_symptoms')
-        
-        print(f"DEBUG: Extra Disease Inputs - Plant Age: {plant_age}, Affected Area: {affected_area}, Crop: {crop_name}")
 
-        if 'image' in request.FILES:
-            image = request.FILES['image']
-            
-            # Save the image temporarily
-            from django.core.files.storage import FileSystemStorage
-            fs = FileSystemStorage()
-            filename = fs.save(image.name, image)
-            file_path = fs.path(filename)
-            
-            print(f"DEBUG: Image saved to {file_path}")
-            
-            # Run prediction
-            result = disease_predictor.predict_from_image(file_path, crop_name)
+
+        # Don't tie up the worker while the models are still loading
+        if not disease_predictor.is_ready():
+            disease_predictor.start()
+            message = "The disease model is warming up. Please try again in a few seconds."
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                response = JsonResponse({'status': 'warming_up', 'message': message}, status=503)
+                response['Retry-After'] = '5'
+                return response
+            return await arender(request, 'crops/disease_form.html', {'error': message})
+
+        try:
+            return await _run_disease_detection(request, crop_name, timings)
+        except InferenceBusy as e:
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                response = JsonResponse({'status': 'busy', 'message': str(e)}, status=503)
+                response['Retry-After'] = '2'
+                return response
+            return await arender(request, 'crops/disease_form.html', {'error': str(e)})
             
-            # Save Log
-            if request.user.is_authenticated:
-                DiseaseLog.objects.create(
+    return await arender(request, 'crops/disease_form.html')
+
+async def _run_disease_detection(request, crop_name, timings):
+    """Image or symptom prediction for a detect_disease POST."""
+    if 'image' in request.FILES:
+        image = request.FILES['image']
+        
+        # Decode straight from the upload; the original is written to
+        # MEDIA_ROOT in the background
+        with stage_timer(timings, 'read'):
+            image_bytes = image.read()
+        
+        # Run prediction
+        result = await inference_executor.run(
+            disease_predictor.predict_from_image, image_bytes, crop_name, timings=timings
+        )
+        # Unreadable uploads are not worth keeping
+        filename = persist_upload(image_bytes) if 'error' not in result else None
+        request.model_version = result.get('model_version')
+        request.inference_path = result.get('inference_path')
+        embedding = result.pop('embedding', None)
+        
+        # Save Log
+        if request.user.is_authenticated:
+            with stage_timer(timings, 'db'):
+                log = await DiseaseLog.objects.acreate(
                     user=request.user,
                     crop_name=crop_name,
+                    image_name=filename,
                     symptoms="Image Upload",
                     predicted_disease=result.get('disease', 'Unknown'),
-                    confidence=result.get('confidence', 0.0)
+                    confidence=result.get('confidence', 0.0),
+                    model_version=result.get('model_version')
                 )
-            
-            # Pass crop name back to template
-            result['crop_name'] = crop_name
-            
+            if embedding:
+                with stage_timer(timings, 'similar'):
+                    result['similar_cases'] = await similar_cases_for_new_log(log, embedding, request.user)
+        
+        # Pass crop name back to template
+        result['crop_name'] = crop_name
+        
+        with stage_timer(timings, 'render'):
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({
                     'status': 'success',
                     'result': result
                 })
                 
-            return render(request, 'crops/disease_result.html', {'result': result})
-            
-        elif 'symptoms' in request.POST:
-            symptoms = request.POST.get('symptoms')
-            result = disease_predictor.predict_from_symptoms(symptoms, crop_name)
-            
-            # Save Log
-            if request.user.is_authenticated:
-                DiseaseLog.objects.create(
+            return await arender(request, 'crops/disease_result.html', {'result': result})
+        
+    elif 'symptoms' in request.POST:
+        symptoms = request.POST.get('symptoms')
+        with stage_timer(timings, 'inference'):
+            result = await inference_executor.run(
+                disease_predictor.predict_from_symptoms, symptoms, crop_name
+            )
+        
+        # Save Log
+        if request.user.is_authenticated:
+            with stage_timer(timings, 'db'):
+                await DiseaseLog.objects.acreate(
                     user=request.user,
                     crop_name=crop_name,
                     symptoms=symptoms,
                     predicted_disease=result.get('disease', 'Unknown'),
                     confidence=result.get('confidence', 0.0)
                 )
-            
-            # Pass crop name back to template
-            result['crop_name'] = crop_name
-            return render(request, 'crops/disease_result.html', {'result': result})
-            
-    return render(request, 'crops/disease_form.html')
+        
+        # Pass crop name back to template
+        result['crop_name'] = crop_name
+        with stage_timer(timings, 'render'):
+            return await arender(request, 'crops/disease_result.html', {'result': result})
+        
+    return await arender(request, 'crops/disease_form.html')
+
+def _next_screened(batches):
+    """
+    Next screened batch as (file name, stored image name, result) tuples,
+    or None when done. Images that screened cleanly are persisted under
+    their content hash; failed ones get no stored name.
+    """
+    batch = next(batches, None)
+    if batch is None:
+        return None
+    return [
+        (name, None if 'error' in result else persist_upload(data), result)
+        for name, data, result in batch
+    ]
+
+
+def _index_logs(logs, embeddings):
+    # Backends that don't return primary keys from bulk_create (MySQL)
+    # leave these logs out of the similarity index
+    for log, embedding in zip(logs, embeddings):
+        if log.pk is not None and embedding:
+            index_embedding(log.pk, embedding)
+
+
+def _close_screening(batches):
+    try:
+        batches.close()
+    except ValueError:
+        pass  # still running on an inference thread after a disconnect; it finishes on its own
+
+
+async def _run_when_free(fn, *args):
+    """Run on the inference executor, waiting for a free slot instead of failing mid-stream."""
+    while True:
+        try:
+            return await inference_executor.run(fn, *args)
+        except InferenceBusy:
+            await asyncio.sleep(0.5)
+
+
+@async_login_required
+async def bulk_detect_disease(request):
+    """
+    Screen a zip archive (`archive`) and/or many files (`images`) in one
+    request, streaming one NDJSON result per image as batches finish.
+
+    The response body is an async generator, so it streams under ASGI
+    (a sync iterator would be buffered whole). Each batch is decoded and
+    predicted on the inference executor, and its logs are written before
+    the next batch starts.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST a zip archive or images.'}, status=405)
+
+    if not disease_predictor.is_ready():
+        disease_predictor.start()
+        response = JsonResponse({'status': 'warming_up', 'message': 'The disease model is warming up.'}, status=503)
+        response['Retry-After'] = '5'
+        return response
+
+    crop_name = request.POST.get('crop_name')
+    files = request.FILES.getlist('images')
+    archive = request.FILES.get('archive')
+    if not files and archive is None:
+        return JsonResponse({'status': 'error', 'message': 'No images uploaded.'}, status=400)
+    if archive is not None and not zipfile.is_zipfile(archive):
+        return JsonResponse({'status': 'error', 'message': 'Archive is not a valid zip file.'}, status=400)
+
+    user = request.user
+
+    async def stream():
+        stats = {'logged': 0}
+        batches = screen_images(
+            iter_uploaded_images(files, archive),
+            disease_predictor,
+            crop_name=crop_name,
+            batch_size=ml_config.DISEASE_BULK_BATCH_SIZE,
+            workers=ml_config.DISEASE_BULK_DECODE_WORKERS,
+            stats=stats,
+        )
+        try:
+            while True:
+                batch = await _run_when_free(_next_screened, batches)
+                if batch is None:
+                    break
+
+                logs, embeddings = [], []
+                for name, image_name, result in batch:
+                    if image_name is not None:
+                        embeddings.append(result.pop('embedding', None))
+                        logs.append(DiseaseLog(
+                            user=user,
+                            crop_name=crop_name,
+                            image_name=image_name,
+                            symptoms="Bulk Upload",
+                            predicted_disease=result.get('disease', 'Unknown'),
+                            confidence=result.get('confidence', 0.0),
+                            model_version=result.get('model_version')
+                        ))
+                    yield json.dumps({"file": name, **result}) + "\n"
+
+                if not logs:
+                    continue
+                try:
+                    await DiseaseLog.objects.abulk_create(logs)
+                except Exception as e:
+                    print(f"Error writing bulk disease logs: {e}")
+                    yield json.dumps({"error": f"Could not save the results of {len(logs)} images."}) + "\n"
+                    continue
+                stats['logged'] += len(logs)
+                await _run_when_free(_index_logs, logs, embeddings)
+
+            yield json.dumps({'summary': stats}) + "\n"
+        finally:
+            await sync_to_async(_close_screening, thread_sensitive=False)(batches)
+
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+@login_required
+def similar_cases(request, log_id):
+    """Past cases whose images are closest to one of the user's own disease logs."""
+    if not DiseaseLog.objects.filter(pk=log_id, user=request.user).exists():
+        return JsonResponse({'status': 'error', 'message': 'Log not found.'}, status=404)
+    try:
+        k = min(int(request.GET.get('k', ml_config.DISEASE_SIMILAR_CASES)), 50)
+    except ValueError:
+        k = ml_config.DISEASE_SIMILAR_CASES
+    cases = similar_cases_for_log(log_id, request.user, k)
+    if cases is None:
+        return JsonResponse({'status': 'error', 'message': 'No image embedding for this log.'}, status=404)
+    return JsonResponse({'status': 'success', 'log_id': log_id, 'similar_cases': cases})
 
 @login_required
 def download_disease_pdf(request):
@@ -436,7 +640,8 @@ def download_disease_pdf(request):
         elements.append(Spacer(1, 24))
         elements.append(Paragraph("Disclaimer: This is an AI-based prediction. Please consult an agricultural expert for confirmation.", styles['Italic']))
         
-        doc.build(elements)
+        with stage_timer(_timings(request), 'render'):
+            doc.build(elements)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf')
         
@@ -0,0 +1,12 @@
+# Gunicorn picks this file up automatically from the working directory.
+
+
+def post_fork(server, worker):
+    # Load and warm up the disease model in the background as soon as the
+    # worker boots, so the first upload doesn't pay for it. Workers that
+    # talk to a standalone inference server don't load the model at all.
+    from ml_engine import config
+    if config.DISEASE_INFERENCE_SOCKET:
+        return
+    from ml_engine.disease_prediction import predictor
+    predictor.start()
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Large model files are kept in git (and in deploy zips) as content-addressed
+# chunks plus a manifest:
+#
+#   <store>/manifest.json              {relative path: size, sha256, chunks}
+#   <store>/chunks/<ab>/<sha256>       chunk bodies, named by their hash
+#
+# Identical chunks are stored once, so re-packing a model only adds the
+# chunks that actually changed.
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 50 * 1024 * 1024   # stays under git hosting per-file limits
+COPY_BUFFER = 1024 * 1024       # bytes held in memory per copy
+
+
+class ArtifactError(Exception):
+    """A chunk or reassembled file does not match the manifest."""
+
+
+def _read_blocks(f, limit=None):
+    """Yield COPY_BUFFER-sized blocks, at most `limit` bytes in total."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        block = f.read(COPY_BUFFER if remaining is None else min(COPY_BUFFER, remaining))
+        if not block:
+            return
+        if remaining is not None:
+            remaining -= len(block)
+        yield block
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in _read_blocks(f):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Chunked, checksummed copies of large files under `root`.
+
+    `pack` splits files into chunks and records their SHA-256 hashes;
+    `restore` rebuilds the files with streaming copies, checking every chunk
+    and the whole file against the manifest, and leaves files that already
+    match untouched. Files are processed in parallel (hashlib releases the
+    GIL on large buffers).
+    """
+
+    def __init__(self, store_dir, root, chunk_size=CHUNK_SIZE, workers=4):
+        self.store_dir = store_dir
+        self.root = root
+        self.chunk_size = chunk_size
+        self.workers = max(1, workers)
+
+    # Manifest
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.store_dir, MANIFEST)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def chunk_path(self, digest):
+        return os.path.join(self.store_dir, 'chunks', digest[:2], digest)
+
+    def _relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def _abspath(self, relpath):
+        return os.path.join(self.root, *relpath.split('/'))
+
+    # Packing
+
+    def pack(self, paths):
+        """
+        Chunk `paths` into the store. A file whose size and mtime match its
+        manifest entry is skipped. Returns {relative path: "packed" | "unchanged"}.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        outcome = {}
+        for path in paths:
+            relpath = self._relpath(path)
+            st = os.stat(path)
+            entry = manifest.get(relpath)
+            if entry and entry['size'] == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+                outcome[relpath] = 'unchanged'
+                continue
+            manifest[relpath] = self._pack_file(path, st)
+            outcome[relpath] = 'packed'
+        self._save_manifest(manifest)
+        self.prune(manifest)
+        return outcome
+
+    def _pack_file(self, path, st):
+        chunks = []
+        file_digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                digest = hashlib.sha256()
+                fd, tmp = tempfile.mkstemp(dir=self.store_dir, prefix='.chunk-')
+                size = 0
+                with os.fdopen(fd, 'wb') as out:
+                    for block in _read_blocks(f, self.chunk_size):
+                        digest.update(block)
+                        file_digest.update(block)
+                        out.write(block)
+                        size += len(block)
+                if not size:
+                    os.remove(tmp)
+                    break
+                target = self.chunk_path(digest.hexdigest())
+                if os.path.exists(target):
+                    os.remove(tmp)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.chmod(tmp, 0o644)  # mkstemp files are private
+                    os.replace(tmp, target)
+                chunks.append({'sha256': digest.hexdigest(), 'size': size})
+        return {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': file_digest.hexdigest(),
+            'chunks': chunks,
+        }
+
+    def prune(self, manifest=None):
+        """Delete chunks no manifest entry refers to; returns how many."""
+        manifest = self.load_manifest() if manifest is None else manifest
+        referenced = {c['sha256'] for entry in manifest.values() for c in entry['chunks']}
+        removed = 0
+        chunks_dir = os.path.join(self.store_dir, 'chunks')
+        for dirpath, _, files in os.walk(chunks_dir):
+            for name in files:
+                if name not in referenced:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+        return removed
+
+    # Restoring and verification
+
+    def _matches(self, relpath, entry):
+        path = self._abspath(relpath)
+        return (
+            os.path.exists(path)
+            and os.path.getsize(path) == entry['size']
+            and sha256_file(path) == entry['sha256']
+        )
+
+    def _restore_file(self, relpath, entry, force=False):
+        if not force and self._matches(relpath, entry):
+            return 'unchanged'
+
+        target = self._abspath(relpath)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.restore-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in entry['chunks']:
+                    digest = hashlib.sha256()
+                    try:
+                        f = open(self.chunk_path(chunk['sha256']), 'rb')
+                    except FileNotFoundError:
+                        raise ArtifactError(f"{relpath}: chunk {chunk['sha256'][:12]} is missing")
+                    with f:
+                        for block in _read_blocks(f):
+                            digest.update(block)
+                            file_digest.update(block)
+                            out.write(block)
+                    if digest.hexdigest() != chunk['sha256']:
+                        raise ArtifactError(f"{relpath}: chunk {chunk['sha256'][:12]} is corrupt")
+            if file_digest.hexdigest() != entry['sha256']:
+                raise ArtifactError(f"{relpath}: reassembled file does not match its checksum")
+            # Only a fully verified file replaces the old one
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return 'restored'
+
+    def restore(self, force=False):
+        """
+        Rebuild every file in the manifest that is missing or differs.
+        Returns {relative path: "restored" | "unchanged" | error message};
+        a failed file never replaces an existing one.
+        """
+        manifest = self.load_manifest()
+
+        def run(item):
+            relpath, entry = item
+            try:
+                return relpath, self._restore_file(relpath, entry, force)
+            except (ArtifactError, OSError) as e:
+                return relpath, f"error: {e}"
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(pool.map(run, sorted(manifest.items())))
+
+    def verify(self):
+        """Check every stored chunk against its hash; returns a list of problems."""
+        manifest = self.load_manifest()
+        chunks = {c['sha256']: relpath for relpath, entry in manifest.items() for c in entry['chunks']}
+
+        def check(digest):
+            path = self.chunk_path(digest)
+            if not os.path.exists(path):
+                return f"{chunks[digest]}: chunk {digest[:12]} is missing"
+            if sha256_file(path) != digest:
+                return f"{chunks[digest]}: chunk {digest[:12]} is corrupt"
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return [problem for problem in pool.map(check, sorted(chunks)) if problem]
@@ -0,0 +1,308 @@
+import json
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Supported values for the DISEASE_MODEL_BACKEND setting
+KERAS = "keras"
+TFLITE_FP16 = "tflite_fp16"
+TFLITE_INT8 = "tflite_int8"
+BACKENDS = (KERAS, TFLITE_FP16, TFLITE_INT8)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def artifact_path(model_path, backend):
+    """Path of the converted artifact for `backend` next to the .h5 model."""
+    if backend == KERAS:
+        return model_path
+    stem, _ = os.path.splitext(model_path)
+    suffix = backend.split("_", 1)[1]  # fp16 / int8
+    return f"{stem}.{suffix}.tflite"
+
+
+def report_path(artifact):
+    """Sidecar JSON written by the conversion command."""
+    return f"{artifact}.json"
+
+
+def parse_buckets(value):
+    """Parse a "1,8,16,32" style setting into a sorted tuple of batch sizes."""
+    if not value:
+        return ()
+    return tuple(sorted({int(v) for v in str(value).split(",") if v.strip()}))
+
+
+class KerasBackend:
+    """
+    Full TensorFlow/Keras execution of the .h5 model.
+
+    By default the model is wrapped in a `tf.function` with a fixed input
+    signature, which skips the data-adapter and loop machinery that
+    `Model.predict` sets up on every call. With `batch_buckets`, batches are
+    padded up to the next bucket size so each bucket is traced exactly once.
+
+    The traced function also returns the input of the final Dense layer (the
+    penultimate-layer embedding), so `predict_with_embeddings` gets both
+    from one forward pass.
+    """
+
+    name = KERAS
+
+    def __init__(self, model_path, compiled=True, batch_buckets=()):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape[1:])
+        self.compiled = compiled
+        self.batch_buckets = tuple(batch_buckets)
+        self._functions = {}
+
+        # Same graph with the classifier head's input as an extra output
+        self.embedding_model = None
+        head = next(
+            (layer for layer in reversed(self.model.layers) if isinstance(layer, tf.keras.layers.Dense)),
+            None,
+        )
+        if head is not None:
+            try:
+                self.embedding_model = tf.keras.Model(self.model.inputs, [self.model.output, head.input])
+            except Exception as e:
+                print(f"Embeddings unavailable for {model_path}: {e}")
+        self._graph = self.embedding_model or self.model
+
+        if compiled:
+            sizes = self.batch_buckets or (None,)
+            for size in sizes:
+                spec = tf.TensorSpec([size, *self.input_shape], tf.float32)
+                self._functions[size] = tf.function(
+                    lambda x: self._graph(x, training=False), input_signature=[spec]
+                )
+
+    def predict_keras(self, batch):
+        """The stock `Model.predict` path, kept for benchmarking."""
+        return self.model.predict(batch, verbose=0)
+
+    def _bucket_for(self, n):
+        for size in self.batch_buckets:
+            if n <= size:
+                return size
+        return self.batch_buckets[-1]
+
+    def _split(self, outputs):
+        """(probabilities, embeddings or None) from a graph call's outputs."""
+        if self.embedding_model is None:
+            return np.asarray(outputs[0]), None
+        probabilities, embeddings = outputs
+        return np.asarray(probabilities), np.asarray(embeddings).reshape(len(embeddings), -1)
+
+    def predict_with_embeddings(self, batch):
+        if not self.compiled:
+            if self.embedding_model is None:
+                return self.predict_keras(batch), None
+            return self._split(self.embedding_model.predict(batch, verbose=0))
+
+        batch = np.asarray(batch, dtype=np.float32)
+        if not self.batch_buckets:
+            return self._split([
+                out.numpy() for out in self._as_list(self._functions[None](self._tf.constant(batch)))
+            ])
+
+        probabilities, embeddings = [], []
+        largest = self.batch_buckets[-1]
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            n = len(chunk)
+            size = self._bucket_for(n)
+            if n < size:
+                pad = np.zeros((size - n, *chunk.shape[1:]), dtype=np.float32)
+                chunk = np.concatenate([chunk, pad])
+            outputs = [out.numpy()[:n] for out in self._as_list(self._functions[size](self._tf.constant(chunk)))]
+            probs, emb = self._split(outputs)
+            probabilities.append(probs)
+            embeddings.append(emb)
+        if embeddings[0] is None:
+            return np.concatenate(probabilities), None
+        return np.concatenate(probabilities), np.concatenate(embeddings)
+
+    def _as_list(self, outputs):
+        return list(outputs) if self.embedding_model is not None else [outputs]
+
+    def predict(self, batch):
+        return self.predict_with_embeddings(batch)[0]
+
+    def warm_up(self):
+        """Trace every signature ahead of real traffic."""
+        for size in (self.batch_buckets or (1,)):
+            self.predict(np.zeros((size, *self.input_shape), dtype=np.float32))
+
+    def close(self):
+        """
+        Drop the traced functions and the model, so their graphs and weights
+        can be freed. (keras.backend.clear_session would also reset the
+        other models of the process.)
+        """
+        self._functions.clear()
+        self.model = self.embedding_model = self._graph = None
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter execution (float16 or int8-quantized weights).
+
+    Uses the standalone `tflite_runtime` package when installed, which keeps
+    full TensorFlow out of the worker; otherwise falls back to `tf.lite`.
+    """
+
+    def __init__(self, model_path, name):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.path = model_path
+        self.name = name
+        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        # A TFLite interpreter must not be invoked from two threads at once
+        self._lock = threading.Lock()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self.input_shape = tuple(int(d) for d in self._input['shape'][1:])
+
+        # Agreement with the Keras baseline, as measured at conversion time
+        self.report = {}
+        try:
+            with open(report_path(model_path), 'r') as f:
+                self.report = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                self._input['index'], [batch_size, *self.input_shape]
+            )
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+
+        # Quantize float input into the model's integer domain if needed
+        scale, zero_point = self._input['quantization']
+        if self._input['dtype'] != np.float32 and scale:
+            info = np.iinfo(self._input['dtype'])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+
+        with self._lock:
+            self._resize(batch.shape[0])
+            self.interpreter.set_tensor(self._input['index'], batch.astype(self._input['dtype']))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+
+        scale, zero_point = self._output['quantization']
+        if self._output['dtype'] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def warm_up(self):
+        self.predict(np.zeros((1, *self.input_shape), dtype=np.float32))
+
+    def close(self):
+        """Release the interpreter and its tensor arena."""
+        with self._lock:
+            self.interpreter = None
+
+
+def load_backend(model_path, backend=KERAS, compiled=True, batch_buckets=()):
+    """
+    Load `model_path` with the requested backend.
+
+    Falls back to Keras when a TFLite artifact has not been produced yet (see
+    `manage.py convert_disease_model`).
+    """
+    if backend not in BACKENDS:
+        print(f"Unknown model backend '{backend}', using {KERAS}.")
+        backend = KERAS
+
+    if backend != KERAS:
+        path = artifact_path(model_path, backend)
+        if os.path.exists(path):
+            loaded = TFLiteBackend(path, backend)
+            agreement = loaded.report.get('top1_agreement')
+            if agreement is not None:
+                print(f"Loaded {backend} model (top-1 agreement with Keras: {agreement:.2%}).")
+            else:
+                print(f"Loaded {backend} model (no agreement report found).")
+            return loaded
+        print(f"{path} not found, falling back to {KERAS}.")
+
+    return KerasBackend(model_path, compiled=compiled, batch_buckets=batch_buckets)
+
+
+def load_calibration_set(directory, target_size=(256, 256), limit=200):
+    """
+    Load up to `limit` images from `directory` and its sub-directories (the
+    media store keeps uploads under uploads/<ab>/) as a normalized float32
+    batch.
+    """
+    images = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            try:
+                with Image.open(os.path.join(root, name)) as img:
+                    img = img.convert('RGB').resize(target_size)
+                    images.append(np.asarray(img, dtype=np.float32) / 255.0)
+            except Exception as e:
+                print(f"Skipping {name}: {e}")
+            if len(images) >= limit:
+                return np.stack(images)
+    if not images:
+        return np.zeros((0, target_size[0], target_size[1], 3), dtype=np.float32)
+    return np.stack(images)
+
+
+def class_directories(data_dir, class_mapping):
+    """
+    Match the sub-directories of `data_dir` to classes by name ("Tomato___Early_blight"
+    or "Tomato - Early blight"). `class_mapping` is a classes.json section
+    (index -> name). Returns [(directory path, class index)] and the names
+    that match no class.
+    """
+    from .knowledge_base import normalize
+
+    class_index = {normalize(name): int(idx) for idx, name in class_mapping.items()}
+    matched, unknown = [], []
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if not os.path.isdir(path):
+            continue
+        idx = class_index.get(normalize(name))
+        if idx is None:
+            unknown.append(name)
+        else:
+            matched.append((path, idx))
+    return matched, unknown
+
+
+def top1_agreement(reference, candidate, images, batch_size=16):
+    """Fraction of images where both backends pick the same top-1 class."""
+    if len(images) == 0:
+        return 0.0
+    matches = 0
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        ref = np.argmax(reference.predict(batch), axis=1)
+        cand = np.argmax(candidate.predict(batch), axis=1)
+        matches += int(np.sum(ref == cand))
+    return matches / len(images)
@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .metrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_BUCKETS_MS
+
+
+class MicroBatcher:
+    """
+    In-process dynamic batching scheduler.
+
+    Callers submit a single preprocessed tensor (without batch dimension) and
+    get back a Future resolving to their own row of the model output. A
+    background thread groups pending tensors and flushes them through
+    `infer_fn` as one batch as soon as `max_batch_size` items are queued or the
+    oldest item has waited `max_wait_ms`.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=16, max_wait_ms=10, name="batcher"):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(LATENCY_BUCKETS_MS)
+        self.batches_flushed = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, tensor):
+        """Queue one tensor and return a Future for its output row."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        future = Future()
+        self._queue.put((tensor, future, time.perf_counter()))
+        self._ensure_worker()
+        return future
+
+    def predict(self, tensor, timeout=None):
+        """Blocking helper: submit and wait for the result row."""
+        return self.submit(tensor).result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first item, then gather more until size or deadline."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = first[2] + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-post the sentinel so the loop exits after this flush
+                self._queue.put(None)
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            self._flush(items)
+
+    def _flush(self, items):
+        flush_start = time.perf_counter()
+        for _, _, enqueued in items:
+            self.queue_wait_hist.observe((flush_start - enqueued) * 1000.0)
+        self.batch_size_hist.observe(len(items))
+        self.batches_flushed += 1
+
+        try:
+            batch = np.stack([t for t, _, _ in items]).astype(np.float32, copy=False)
+            outputs = self.infer_fn(batch)
+            # A short answer would leave the unmatched callers waiting forever
+            if len(outputs) != len(items):
+                raise RuntimeError(f"{self.name}: {len(outputs)} outputs for a batch of {len(items)}")
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+
+        for row, (_, future, _) in zip(outputs, items):
+            future.set_result(row)
+
+    def stats(self):
+        """Batch-size and queue-wait (ms) histograms."""
+        return {
+            "batches_flushed": self.batches_flushed,
+            "pending": self._queue.qsize(),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
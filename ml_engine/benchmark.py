@@ -0,0 +1,167 @@
+import io
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from .metrics import resident_bytes
+from .preprocessing import decode_image
+
+# Metrics compared against a baseline, and the direction that counts as worse
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+HIGHER_IS_BETTER = ('throughput_per_s',)
+
+# Allowed relative regression per metric before `compare` reports it
+DEFAULT_THRESHOLDS = {
+    'p50_ms': 0.20,
+    'p95_ms': 0.25,
+    'p99_ms': 0.35,
+    'throughput_per_s': 0.20,
+    'peak_rss_mb': 0.25,
+}
+
+IMAGE_BATCH_SIZES = (1, 8, 32)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None without /proc."""
+    rss = resident_bytes()
+    return None if rss is None else rss / (1024.0 * 1024.0)
+
+
+def measure(fn, iterations=50, warmup=5, items_per_call=1):
+    """
+    Call `fn` `warmup` + `iterations` times and summarise the timed calls:
+    latency percentiles (ms), throughput (items/s) and memory.
+
+    Memory is the current RSS sampled after every call (outside the timing):
+    `peak_rss_mb` is the highest sample of this case and `rss_delta_mb` its
+    growth over the RSS before the case, so a case is not charged for what
+    earlier ones allocated. Without /proc (macOS) both fall back to the
+    process-wide high-water mark.
+    """
+    rss_before = current_rss_mb()
+    rss_peak = rss_before
+    for _ in range(warmup):
+        fn()
+        rss_peak = _max_rss(rss_peak)
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - start) * 1000.0
+        rss_peak = _max_rss(rss_peak)
+
+    if rss_before is None:
+        rss_before = rss_peak = peak_rss_mb()
+    total_s = samples.sum() / 1000.0
+    return {
+        'iterations': iterations,
+        'items_per_call': items_per_call,
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'throughput_per_s': round(iterations * items_per_call / total_s, 2) if total_s else 0.0,
+        'peak_rss_mb': round(rss_peak, 2),
+        'rss_delta_mb': round(rss_peak - rss_before, 2),
+    }
+
+
+def _max_rss(peak):
+    rss = current_rss_mb()
+    return peak if rss is None else max(peak, rss)
+
+
+def sample_jpeg(size=(640, 480), seed=0):
+    """A synthetic leaf-coloured JPEG, so the suite needs no fixture files."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    pixels[..., 1] = np.maximum(pixels[..., 1], 120)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def build_cases(disease_predictor, recommender, yield_predictor, crop_name='Tomato'):
+    """Return {case name: (callable, items per call)} for the standard suite."""
+    image = sample_jpeg()
+    cases = {
+        'preprocess_image': (lambda: disease_predictor.preprocess_image(image), 1),
+    }
+
+    for batch_size in IMAGE_BATCH_SIZES:
+        if batch_size == 1:
+            fn = lambda: disease_predictor.predict_from_image(image, crop_name)
+        else:
+            # Batched path: decode every image, then one forward pass
+            images = [image] * batch_size
+
+            def fn(images=images):
+                batch = np.concatenate([decode_image(data) for data in images])
+                return disease_predictor.predict_batch(batch, crop_name)
+        cases[f'predict_from_image[bs={batch_size}]'] = (fn, batch_size)
+
+    description = "Yellow spots on leaves with brown rings, leaves wilting and drying"
+    cases['predict_from_symptoms'] = (
+        lambda: disease_predictor.predict_from_symptoms(description, crop_name), 1
+    )
+    cases['recommend'] = (lambda: recommender.recommend(90, 42, 43, 25.0, 80.0, 6.5, 200.0), 1)
+    cases['predict_yield'] = (
+        lambda: yield_predictor.predict_yield('Rice', 2.5, 'Clay', 150.0, 28.0, 120, 'Canal'), 1
+    )
+    return cases
+
+
+def run_suite(cases, iterations=50, warmup=5, only=None, progress=None):
+    """Measure every case (or those whose name contains one of `only`)."""
+    results = {}
+    for name, (fn, items) in cases.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(fn, iterations, warmup, items)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'warmup': warmup,
+        },
+        'cases': results,
+    }
+
+
+def compare(current, baseline, thresholds=None):
+    """
+    Compare two suite results. Returns one row per (case, metric) present in
+    both: (case, metric, baseline, current, relative change, regressed).
+    The relative change is positive when the metric got worse.
+    """
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    rows = []
+    for case, base in baseline.get('cases', {}).items():
+        now = current.get('cases', {}).get(case)
+        if now is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if metric not in base or metric not in now or not base[metric]:
+                continue
+            change = (now[metric] - base[metric]) / base[metric]
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            rows.append((case, metric, base[metric], now[metric], change, change > limits[metric]))
+    return rows
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import numpy as np
+
+from .metrics import Histogram, LATENCY_BUCKETS_MS
+from .preprocessing import resize_batch
+
+# Which model produced a prediction
+FIRST_STAGE = "first_stage"
+ESCALATED = "escalated"
+
+
+class InferenceCascade:
+    """
+    Two-stage image inference.
+
+    A small first-stage classifier (distilled and/or low-resolution, with
+    the same classes as the primary model) scores the whole batch. Images
+    whose top probability reaches `threshold` keep that answer; the rest
+    are escalated to `full_forward` together, as one smaller batch.
+
+    Latency is recorded per path: first-stage only, or first stage plus
+    the full model for escalated images.
+    """
+
+    def __init__(self, first_stage, full_forward, threshold=0.9):
+        self.first_stage = first_stage
+        self.full_forward = full_forward    # batch -> (probabilities, embeddings or None)
+        self.threshold = threshold
+        self.input_size = tuple(first_stage.input_shape[:2])
+        self.latency_hist = {FIRST_STAGE: Histogram(LATENCY_BUCKETS_MS), ESCALATED: Histogram(LATENCY_BUCKETS_MS)}
+        self.images = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def run(self, batch):
+        """
+        (probabilities, embeddings, paths) for a (N, H, W, 3) batch. Only
+        escalated images have an embedding (from the full model); the
+        others get None.
+        """
+        start = time.perf_counter()
+        probabilities = np.array(self.first_stage.predict(resize_batch(batch, self.input_size)), dtype=np.float32)
+        first_ms = (time.perf_counter() - start) * 1000.0
+
+        escalate = np.flatnonzero(probabilities.max(axis=1) < self.threshold)
+        embeddings = [None] * len(batch)
+        paths = [FIRST_STAGE] * len(batch)
+        if len(escalate):
+            full, full_embeddings = self.full_forward(batch[escalate])
+            for j, i in enumerate(escalate):
+                probabilities[i] = full[j]
+                paths[i] = ESCALATED
+                if full_embeddings is not None:
+                    embeddings[i] = full_embeddings[j]
+        total_ms = (time.perf_counter() - start) * 1000.0
+
+        with self._lock:
+            self.images += len(batch)
+            self.escalated += len(escalate)
+        if len(escalate) < len(batch):
+            self.latency_hist[FIRST_STAGE].observe(first_ms)
+        if len(escalate):
+            self.latency_hist[ESCALATED].observe(total_ms)
+        return probabilities, embeddings, paths
+
+    def stats(self):
+        """Escalation rate and per-path batch latency (ms) histograms."""
+        with self._lock:
+            images, escalated = self.images, self.escalated
+        return {
+            "threshold": self.threshold,
+            "first_stage_input_size": list(self.input_size),
+            "images": images,
+            "escalated": escalated,
+            "escalation_rate": (escalated / images) if images else 0.0,
+            "latency_ms": {path: hist.snapshot() for path, hist in self.latency_hist.items()},
+        }
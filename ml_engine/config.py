@@ -0,0 +1,133 @@
+import os
+
+# Runtime knobs for the ML engine. These are read from the environment (the
+# same .env that crop_project/settings.py loads) so that scripts which use
+# ml_engine without Django get identical behaviour.
+
+# Dynamic micro-batching of image inference
+DISEASE_BATCHING = os.getenv('DISEASE_BATCHING', 'False') == 'True'
+DISEASE_BATCH_MAX_SIZE = int(os.getenv('DISEASE_BATCH_MAX_SIZE', 16))
+DISEASE_BATCH_MAX_WAIT_MS = float(os.getenv('DISEASE_BATCH_MAX_WAIT_MS', 10))
+
+# Inference backend for the disease models: keras, tflite_fp16 or tflite_int8.
+# TFLite artifacts are produced by `manage.py convert_disease_model`.
+DISEASE_MODEL_BACKEND = os.getenv('DISEASE_MODEL_BACKEND', 'keras')
+
+# Content-addressed prediction cache. DISEASE_CACHE_DIR enables a shared
+# on-disk store so all gunicorn workers benefit from each other's results.
+DISEASE_CACHE = os.getenv('DISEASE_CACHE', 'True') == 'True'
+DISEASE_CACHE_SIZE = int(os.getenv('DISEASE_CACHE_SIZE', 1024))
+DISEASE_CACHE_TTL = int(os.getenv('DISEASE_CACHE_TTL', 86400))
+DISEASE_CACHE_DIR = os.getenv('DISEASE_CACHE_DIR', '')
+
+# Call the Keras model through a traced tf.function instead of Model.predict.
+# DISEASE_BATCH_BUCKETS (e.g. "1,8,16,32") pads batches to fixed sizes so
+# each size is traced once; empty means a single dynamic-batch signature.
+DISEASE_COMPILED_CALL = os.getenv('DISEASE_COMPILED_CALL', 'True') == 'True'
+DISEASE_BATCH_BUCKETS = os.getenv('DISEASE_BATCH_BUCKETS', '')
+
+# Out-of-process inference server (`manage.py run_inference_server`). When a
+# socket path is set, web workers send decoded tensors there through shared
+# memory and only load the models themselves if the server is down.
+DISEASE_INFERENCE_SOCKET = os.getenv('DISEASE_INFERENCE_SOCKET', '')
+DISEASE_INFERENCE_TIMEOUT = float(os.getenv('DISEASE_INFERENCE_TIMEOUT', 30))
+
+# Bulk screening endpoint: images per forward pass and decode threads
+DISEASE_BULK_BATCH_SIZE = int(os.getenv('DISEASE_BULK_BATCH_SIZE', 32))
+DISEASE_BULK_DECODE_WORKERS = int(os.getenv('DISEASE_BULK_DECODE_WORKERS', 4))
+
+# Disease knowledge base (descriptions, treatments, precautions). The file is
+# re-read when it changes, checked at most every DISEASE_KB_RELOAD_INTERVAL s.
+DISEASE_KB_PATH = os.getenv(
+    'DISEASE_KB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'disease_info.json'),
+)
+DISEASE_KB_RELOAD_INTERVAL = float(os.getenv('DISEASE_KB_RELOAD_INTERVAL', 5))
+
+# Symptom phrase vocabulary compiled into the Aho-Corasick symptom matcher
+SYMPTOM_PHRASES_PATH = os.getenv(
+    'SYMPTOM_PHRASES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symptom_phrases.json'),
+)
+
+# Async views run predictor calls on a dedicated pool of this many threads;
+# beyond INFERENCE_EXECUTOR_MAX_PENDING running + queued calls they answer 503
+INFERENCE_EXECUTOR_WORKERS = int(os.getenv('INFERENCE_EXECUTOR_WORKERS', 2))
+INFERENCE_EXECUTOR_MAX_PENDING = int(os.getenv('INFERENCE_EXECUTOR_MAX_PENDING', 16))
+
+# Live-capture WebSocket (/ws/live-capture/, served by crop_project.asgi):
+# largest accepted frame in bytes
+LIVE_CAPTURE_MAX_FRAME_BYTES = int(os.getenv('LIVE_CAPTURE_MAX_FRAME_BYTES', 512 * 1024))
+
+# Per-stage request instrumentation: histograms exported at /metrics in
+# Prometheus format and a Server-Timing header on every response. When
+# METRICS_TOKEN is set, scrapes must send "Authorization: Bearer <token>".
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Number of ranked classes returned alongside each image prediction
+DISEASE_TOP_K = int(os.getenv('DISEASE_TOP_K', 3))
+
+# Test-time augmentation: when the first-pass confidence is below the
+# threshold, flipped/rotated/cropped views are run in one extra batch and
+# averaged. Views are trimmed to keep the added latency within the budget.
+DISEASE_TTA = os.getenv('DISEASE_TTA', 'False') == 'True'
+DISEASE_TTA_THRESHOLD = float(os.getenv('DISEASE_TTA_THRESHOLD', 0.5))
+DISEASE_TTA_BUDGET_MS = float(os.getenv('DISEASE_TTA_BUDGET_MS', 200))
+
+# Ensemble members run concurrently on a bounded pool; a member that has not
+# answered within DISEASE_MEMBER_TIMEOUT_MS is dropped from the vote (the primary
+# model is always waited for).
+DISEASE_ENSEMBLE_WORKERS = int(os.getenv('DISEASE_ENSEMBLE_WORKERS', 4))
+DISEASE_MEMBER_TIMEOUT_MS = float(os.getenv('DISEASE_MEMBER_TIMEOUT_MS', 2000))
+
+# Versioned model registry (`manage.py model_registry`). Workers check the
+# registry's CURRENT pointer at most every MODEL_REGISTRY_POLL_INTERVAL s and
+# hot-swap to a newly activated version in the background (0 disables);
+# the old version is closed once its in-flight requests have drained.
+MODEL_REGISTRY_DIR = os.getenv(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'registry'),
+)
+MODEL_REGISTRY_POLL_INTERVAL = float(os.getenv('MODEL_REGISTRY_POLL_INTERVAL', 10))
+MODEL_SWAP_DRAIN_TIMEOUT = float(os.getenv('MODEL_SWAP_DRAIN_TIMEOUT', 30))
+
+# Chunked, checksummed store for large model files (`manage.py model_artifacts`).
+# Files are packed into it instead of being committed whole and restored at
+# build time; MODEL_ARTIFACT_WORKERS files are verified/restored in parallel.
+MODEL_ARTIFACT_STORE = os.getenv(
+    'MODEL_ARTIFACT_STORE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'artifacts'),
+)
+MODEL_ARTIFACT_WORKERS = int(os.getenv('MODEL_ARTIFACT_WORKERS', 4))
+
+# Uploaded leaf photos are stored once per distinct content, each with a
+# MEDIA_DERIVATIVE_SIZE square preprocessed copy. `manage.py prune_media`
+# deletes originals older than MEDIA_RETENTION_DAYS that no DiseaseLog uses.
+MEDIA_DERIVATIVE_SIZE = int(os.getenv('MEDIA_DERIVATIVE_SIZE', 256))
+MEDIA_RETENTION_DAYS = float(os.getenv('MEDIA_RETENTION_DAYS', 90))
+
+# Penultimate-layer embeddings of disease images, stored per DiseaseLog in a
+# float16 memory-mapped matrix with an IVF nearest-neighbour index, used to
+# show the DISEASE_SIMILAR_CASES most similar past cases. Train the index
+# with `manage.py build_similarity_index`; until then search is exact.
+DISEASE_EMBEDDINGS = os.getenv('DISEASE_EMBEDDINGS', 'True') == 'True'
+DISEASE_EMBEDDINGS_DIR = os.getenv(
+    'DISEASE_EMBEDDINGS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'embeddings'),
+)
+DISEASE_SIMILAR_CASES = int(os.getenv('DISEASE_SIMILAR_CASES', 5))
+DISEASE_ANN_NPROBE = int(os.getenv('DISEASE_ANN_NPROBE', 8))
+
+# Per-crop specialist models (<crop>_model.h5 with a "<crop>_model" class map
+# in classes.json) are loaded on the first request for their crop and kept
+# in an LRU; the least recently used are evicted to keep the resident memory
+# they added (measured around each load) within this budget.
+DISEASE_SPECIALIST_MEMORY_MB = float(os.getenv('DISEASE_SPECIALIST_MEMORY_MB', 1024))
+
+# Cascade: a small first-stage model (plant_disease_model_small.h5 or the
+# registry's first_stage artifact) answers when its top probability is at
+# least DISEASE_CASCADE_THRESHOLD; other images go on to the primary model.
+# `manage.py evaluate_cascade` shows the accuracy/throughput per threshold.
+DISEASE_CASCADE = os.getenv('DISEASE_CASCADE', 'False') == 'True'
+DISEASE_CASCADE_THRESHOLD = float(os.getenv('DISEASE_CASCADE_THRESHOLD', 0.9))
@@ -1,22 +1,130 @@
-import tensorflow as tf
 import numpy as np
-from PIL import Image
+import inspect
 import json
 import os
 import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from . import config
+from .backends import load_backend, parse_buckets
+from .batching import MicroBatcher
+from .cascade import InferenceCascade
+from .embeddings import encode_embedding
+from .ensemble import EnsembleMember, EnsembleRunner
+from .knowledge_base import DiseaseKnowledgeBase, normalize
+from .symptom_matcher import SymptomMatcher
+from .prediction_cache import PredictionCache, content_hash, file_fingerprint
+from .preprocessing import decode_image, read_bytes, stage_timer
+from .registry import CLASSES, FIRST_STAGE, PRIMARY, RECENT_DISEASES, ModelRegistry, RegistryError
+from .specialists import CLASS_MAP_SUFFIX, SpecialistPool, specialist_crops
+from .tta import TestTimeAugmenter
+
+# A primary prediction for another crop is still reported above this
+# confidence (the user most likely picked the wrong crop)
+CROSS_CROP_CONFIDENCE = 0.95
 
 class EnsembleDiseasePredictor:
-    def __init__(self):
+    def __init__(self, model_version=None, registry=None):
         self.base_path = os.path.dirname(os.path.abspath(__file__))
         self.models_path = os.path.join(self.base_path, 'models')
         self.classes_path = os.path.join(self.base_path, 'classes.json')
+        self.primary_model_path = os.path.join(self.models_path, 'plant_disease_model.h5')
+        self.secondary_model_path = os.path.join(self.models_path, 'recent_disease_model.h5')
+        self.first_stage_model_path = os.path.join(self.models_path, 'plant_disease_model_small.h5')
+        self.input_size = (256, 256)
+
+        # A registry version (the requested one, else CURRENT) replaces the
+        # legacy files above; without one the legacy files are used
+        self.registry = registry or ModelRegistry(config.MODEL_REGISTRY_DIR)
+        self.registry_version = (
+            self.registry.get(model_version) if model_version else self.registry.current()
+        )
+        if self.registry_version is not None:
+            self._use_registry_version(self.registry_version)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
         
         self.primary_model = None
         self.secondary_model = None
+        self.specialists = None
+        self.specialist_index = {}
+        self.cascade = None
         self.class_mappings = {}
+        self.class_names = []
+        self.class_display_names = []
+        self.crop_mask = np.zeros((0, 0), dtype=bool)
+        self.crop_index = {}
+        self.top_k = config.DISEASE_TOP_K
+        self.model_version = None
+        self.knowledge_base = DiseaseKnowledgeBase(
+            config.DISEASE_KB_PATH, reload_interval=config.DISEASE_KB_RELOAD_INTERVAL
+        )
+        self.symptom_matcher = SymptomMatcher.from_file(config.SYMPTOM_PHRASES_PATH)
+        self.batcher = None
+        self.cache = None
+        self.tta = None
+        self.ensemble = None
         
         self.load_resources()
 
+        # Repeated uploads of the same photo skip decode and inference
+        if config.DISEASE_CACHE:
+            self.cache = PredictionCache(
+                watch_paths=self._model_files(),
+                max_entries=config.DISEASE_CACHE_SIZE,
+                ttl=config.DISEASE_CACHE_TTL,
+                disk_dir=config.DISEASE_CACHE_DIR,
+            )
+
+        # Group concurrent single-image requests into one forward pass
+        if self.primary_model and config.DISEASE_BATCHING:
+            self.batcher = MicroBatcher(
+                self._forward_rows,
+                max_batch_size=config.DISEASE_BATCH_MAX_SIZE,
+                max_wait_ms=config.DISEASE_BATCH_MAX_WAIT_MS,
+                name="primary-model",
+            )
+
+        # Ensemble members share one preprocessed tensor and run concurrently
+        self.ensemble = EnsembleRunner(
+            max_workers=config.DISEASE_ENSEMBLE_WORKERS,
+            timeout_ms=config.DISEASE_MEMBER_TIMEOUT_MS,
+        )
+        if self.primary_model:
+            self.ensemble.add(EnsembleMember(
+                "primary", self._predict_primary, self.class_display_names, "PlantVillage Model",
+                required=True,
+            ))
+        if self.secondary_model:
+            recent = self.class_mappings.get('recent_diseases', {})
+            self.ensemble.add(EnsembleMember(
+                "recent_diseases",
+                self.secondary_model.predict,
+                [recent.get(str(i), "Unknown") for i in range(len(recent))],
+                "Recent Disease Model",
+            ))
+        # Per-crop specialists only vote on requests for their crop
+        if self.specialists is not None:
+            for crop, class_names in self._specialist_classes.items():
+                self.ensemble.add(EnsembleMember(
+                    f"{crop}_specialist",
+                    lambda batch, crop=crop: self.specialists.predict(crop, batch),
+                    class_names,
+                    f"{crop.title()} Specialist Model",
+                    crop=crop,
+                ))
+
+        # Spend an extra augmented forward pass on low-confidence images
+        if self.primary_model and config.DISEASE_TTA:
+            self.tta = TestTimeAugmenter(
+                self._predict_primary_batch,
+                threshold=config.DISEASE_TTA_THRESHOLD,
+                budget_ms=config.DISEASE_TTA_BUDGET_MS,
+            )
+
     def load_resources(self):
         """Load models and class mappings."""
         # Load Class Mappings
@@ -27,106 +135,527 @@ class EnsembleDiseasePredictor:
             print(f"Error loading classes.json: {e}")
             self.class_mappings = {"plant_village": {}, "recent_diseases": {}}
 
-        # Load Primary Model (PlantVillage)
-        primary_model_path = os.path.join(self.models_path, 'plant_disease_model.h5')
+        # TensorFlow is imported by the backends rather than at module level
+        # so that management commands and idle workers don't pay for it.
+
+        # Load Primary Model (PlantVillage) with the configured backend
+        primary_model_path = self.primary_model_path
         if os.path.exists(primary_model_path):
             try:
-                self.primary_model = tf.keras.models.load_model(primary_model_path)
-                print("Primary model loaded successfully.")
+                self.primary_model = load_backend(
+                    primary_model_path,
+                    config.DISEASE_MODEL_BACKEND,
+                    compiled=config.DISEASE_COMPILED_CALL,
+                    batch_buckets=parse_buckets(config.DISEASE_BATCH_BUCKETS),
+                )
+                print(f"Primary model loaded successfully ({self.primary_model.name}).")
             except Exception as e:
                 print(f"Error loading primary model: {e}")
         else:
             print("Primary model not found.")
 
         # Load Secondary Model (Recent Diseases) - Placeholder for now
-        secondary_model_path = os.path.join(self.models_path, 'recent_disease_model.h5')
+        secondary_model_path = self.secondary_model_path
         if os.path.exists(secondary_model_path):
             try:
-                self.secondary_model = tf.keras.models.load_model(secondary_model_path)
+                self.secondary_model = load_backend(secondary_model_path, config.DISEASE_MODEL_BACKEND)
                 print("Secondary model loaded successfully.")
             except Exception as e:
                 print(f"Error loading secondary model: {e}")
         else:
             print("Secondary model not found (using mock logic for recent diseases).")
 
-    def preprocess_image(self, image_path, target_size=(256, 256)):
-        """Preprocess image for model inference."""
+        self._load_specialists()
+        self._build_crop_mask()
+        if config.DISEASE_CASCADE:
+            self._load_cascade()
+        if self.registry_version is not None:
+            self.model_version = self.registry_version.version
+        else:
+            self.model_version = file_fingerprint(*self._model_files())
+
+    def _load_cascade(self):
+        """
+        Put the small first-stage model in front of the primary model. It
+        must predict the same classes; otherwise the cascade stays off.
+        """
+        path = self.first_stage_model_path
+        if not self.primary_model:
+            return
+        if not os.path.exists(path):
+            print("First-stage model not found; cascade disabled.")
+            return
         try:
-            img = Image.open(image_path).convert('RGB')
-            img = img.resize(target_size)
-            img_array = np.array(img)
-            img_array = img_array / 255.0  # Normalize
-            img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-            return img_array
+            first_stage = load_backend(path, config.DISEASE_MODEL_BACKEND)
+            probe = first_stage.predict(np.zeros((1, *first_stage.input_shape), dtype=np.float32))
+        except Exception as e:
+            print(f"Error loading first-stage model: {e}")
+            return
+        if np.shape(probe)[-1] != len(self.class_names):
+            print(
+                f"First-stage model predicts {np.shape(probe)[-1]} classes, the primary model "
+                f"{len(self.class_names)}; cascade disabled."
+            )
+            return
+        self.cascade = InferenceCascade(first_stage, self._forward, threshold=config.DISEASE_CASCADE_THRESHOLD)
+        print(
+            f"Cascade enabled: first stage at {'x'.join(map(str, self.cascade.input_size))}, "
+            f"escalating below {self.cascade.threshold:.2f} confidence."
+        )
+
+    def _specialist_path(self, crop):
+        role = crop + CLASS_MAP_SUFFIX
+        if self.registry_version is not None:
+            return self.registry_version.artifact(role) or ''
+        return os.path.join(self.models_path, f'{role}.h5')
+
+    def _load_specialists(self):
+        """
+        Register the per-crop specialists that have both a class map and a
+        model file. Nothing is loaded here; the pool loads each on first use.
+        """
+        self._specialist_classes = {
+            crop: class_names
+            for crop, class_names in specialist_crops(self.class_mappings).items()
+            if os.path.exists(self._specialist_path(crop))
+        }
+        if not self._specialist_classes:
+            return
+        self.specialists = SpecialistPool(
+            {crop: self._specialist_path(crop) for crop in self._specialist_classes},
+            lambda path: load_backend(path, config.DISEASE_MODEL_BACKEND),
+            memory_budget_mb=config.DISEASE_SPECIALIST_MEMORY_MB,
+        )
+        # Crop names and their knowledge-base aliases ("paddy") -> specialist
+        self.specialist_index = {crop: crop for crop in self._specialist_classes}
+        for alias, target in self.knowledge_base.crop_aliases().items():
+            if target in self.specialist_index:
+                self.specialist_index.setdefault(alias, target)
+        print(f"Specialist models available for: {', '.join(self.specialists.crops())}.")
+
+    def specialist_for(self, crop_name):
+        """Crop key of the specialist model for a user-supplied crop name, or None."""
+        if not self.specialist_index or not crop_name:
+            return None
+        key = normalize(crop_name)
+        if key in self.specialist_index:
+            return self.specialist_index[key]
+        return next((self.specialist_index[w] for w in key.split() if w in self.specialist_index), None)
+
+    def _use_registry_version(self, version):
+        """Point the model paths at a registry version after checking its checksums."""
+        problems = version.verify()
+        if problems:
+            raise RegistryError(f"Model version {version.version} failed verification: {'; '.join(problems)}")
+        # A version without a given artifact simply lacks that member
+        self.primary_model_path = version.artifact(PRIMARY) or ''
+        self.secondary_model_path = version.artifact(RECENT_DISEASES) or ''
+        self.first_stage_model_path = version.artifact(FIRST_STAGE) or ''
+        self.classes_path = version.artifact(CLASSES) or self.classes_path
+        self.input_size = version.input_size
+        print(f"Using model version {version.version} from the registry.")
+
+    def _model_files(self):
+        specialists = self.specialists.paths if self.specialists is not None else {}
+        return (
+            self.primary_model_path, self.secondary_model_path, self.classes_path,
+            *(specialists[crop] for crop in sorted(specialists)),
+            *((self.first_stage_model_path,) if self.cascade is not None else ()),
+        )
+
+    def model_info(self):
+        """Version and provenance of the loaded models."""
+        info = {"model_version": self.model_version, "input_size": list(self.input_size)}
+        if self.registry_version is not None:
+            info.update(self.registry_version.summary(), model_version=self.model_version)
+        else:
+            info["source"] = "legacy"
+        return info
+
+    @contextmanager
+    def _in_use(self):
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def close(self, drain_timeout=30.0):
+        """
+        Release the batcher and ensemble threads once requests still running
+        on this instance have finished (or `drain_timeout` s have passed).
+        """
+        deadline = time.monotonic() + drain_timeout
+        while self._in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.ensemble is not None:
+            self.ensemble.close()
+        if self.specialists is not None:
+            self.specialists.close()
+
+    def _build_crop_mask(self):
+        """
+        Precompute per-class names and a (crops x classes) boolean mask from
+        classes.json so requests never parse class-name strings.
+        """
+        mapping = self.class_mappings.get('plant_village', {})
+        n_classes = (max(int(k) for k in mapping) + 1) if mapping else 0
+        self.class_names = [mapping.get(str(i), "Unknown") for i in range(n_classes)]
+        self.class_display_names = [
+            name.replace("___", " - ").replace("_", " ").strip() for name in self.class_names
+        ]
+
+        class_crops = [normalize(name.split("___")[0]) for name in self.class_names]
+        crops = sorted(set(class_crops))
+        rows = {crop: i for i, crop in enumerate(crops)}
+
+        self.crop_mask = np.zeros((len(crops), n_classes), dtype=bool)
+        for idx, crop in enumerate(class_crops):
+            self.crop_mask[rows[crop], idx] = True
+
+        # Lookup keys: full crop name, each of its words ("corn", "maize")
+        # and the crop aliases from the knowledge base
+        self.crop_index = {}
+        for crop, row in rows.items():
+            self.crop_index.setdefault(crop, row)
+            for word in crop.split():
+                self.crop_index.setdefault(word, row)
+        for alias, target in self.knowledge_base.crop_aliases().items():
+            if target in rows:
+                self.crop_index.setdefault(alias, rows[target])
+
+    def crop_row(self, crop_name):
+        """Row of `crop_mask` for a user-supplied crop name, or None."""
+        key = normalize(crop_name)
+        row = self.crop_index.get(key)
+        if row is None:
+            # Loose containment match, as the old string check allowed
+            for crop, candidate in self.crop_index.items():
+                if crop in key or key in crop:
+                    row = candidate
+                    break
+        return row
+
+    def _predict_primary_batch(self, batch):
+        """Run the primary model on a stacked (N, H, W, 3) batch."""
+        return self.primary_model.predict(batch)
+
+    def _forward(self, batch):
+        """
+        Primary softmax and penultimate-layer embeddings (None if the
+        backend can't provide them) from one forward pass.
+        """
+        if hasattr(self.primary_model, 'predict_with_embeddings'):
+            return self.primary_model.predict_with_embeddings(batch)
+        return self.primary_model.predict(batch), None
+
+    def _primary_pass(self, batch):
+        """
+        (probabilities, embeddings, inference paths) through the cascade if
+        it is on, else straight through the primary model (paths None).
+        """
+        if self.cascade is not None:
+            return self.cascade.run(batch)
+        probabilities, embeddings = self._forward(batch)
+        return probabilities, embeddings, None
+
+    def _forward_rows(self, batch):
+        """`_primary_pass` as one (probabilities, embedding, path) triple per image, for the micro-batcher."""
+        probabilities, embeddings, paths = self._primary_pass(batch)
+        if embeddings is None:
+            embeddings = [None] * len(probabilities)
+        if paths is None:
+            paths = [None] * len(probabilities)
+        return list(zip(probabilities, embeddings, paths))
+
+    def embed_batch(self, img_batch):
+        """Penultimate-layer embeddings for a preprocessed batch, or None if unavailable."""
+        if not self.primary_model:
+            return None
+        return self._forward(img_batch)[1]
+
+    def _predict_primary(self, img_array):
+        """
+        Primary model inference returning (probabilities, embeddings, paths);
+        single images are micro-batched across callers when enabled.
+        """
+        if self.batcher is not None and len(img_array) == 1:
+            probabilities, embedding, path = self.batcher.predict(img_array[0])
+            return probabilities[None, :], [embedding], [path]
+        return self._primary_pass(img_array)
+
+    def warm_up(self, target_size=None):
+        """Run a dummy inference so graph tracing happens before real traffic."""
+        if not self.primary_model:
+            return
+        target_size = target_size or self.input_size
+        if hasattr(self.primary_model, 'warm_up'):
+            self.primary_model.warm_up()
+        else:
+            dummy = np.zeros((1, target_size[0], target_size[1], 3), dtype=np.float32)
+            self._predict_primary_batch(dummy)
+        print("Primary model warmed up.")
+
+    def batching_stats(self):
+        """Batch-size and queue-wait histograms, or None when batching is off."""
+        return self.batcher.stats() if self.batcher is not None else None
+
+    def tta_stats(self):
+        """Test-time augmentation counters, or None when TTA is off."""
+        return self.tta.stats() if self.tta is not None else None
+
+    def ensemble_stats(self):
+        """Per-member latency, timeout and error counters."""
+        return self.ensemble.stats() if self.ensemble is not None else None
+
+    def cascade_stats(self):
+        """Escalation rate and per-path latency, or None when the cascade is off."""
+        return self.cascade.stats() if self.cascade is not None else None
+
+    def specialist_stats(self):
+        """Resident specialists and load/eviction counters, or None without specialists."""
+        return self.specialists.stats() if self.specialists is not None else None
+
+    def preprocess_image(self, image, target_size=None, timings=None):
+        """Preprocess an image path, bytes or uploaded file for model inference."""
+        try:
+            with stage_timer(timings, 'read'):
+                data = read_bytes(image)
+            return decode_image(data, target_size or self.input_size, timings)
         except Exception as e:
             print(f"Error preprocessing image: {e}")
             return None
 
-    def predict_from_image(self, image_path, crop_name=None):
+    def predict_from_image(self, image, crop_name=None, timings=None):
         """
-        Predict disease using Ensemble approach.
+        Predict disease from an image path, raw bytes or uploaded file.
+
+        The image is decoded in memory (nothing is written to disk) and the
+        prediction cache is consulted first. Per-stage timings in ms are
+        returned under `timings_ms`; pass a dict in `timings` to include stages
+        measured by the caller (e.g. reading the upload).
         """
-        print(f"DEBUG: Processing image at {image_path}")
-        img_array = self.preprocess_image(image_path)
-        
-        if img_array is None:
-            print("DEBUG: Image preprocessing failed.")
+        timings = {} if timings is None else timings
+        try:
+            with stage_timer(timings, 'read'):
+                data = read_bytes(image)
+        except OSError as e:
+            print(f"Error reading image: {e}")
             return {"error": "Invalid image"}
-            
-        print(f"DEBUG: Image Array Shape: {img_array.shape}")
-        print(f"DEBUG: Image Array Mean: {np.mean(img_array)}, Std: {np.std(img_array)}")
 
+        digest = content_hash(data) if self.cache is not None else None
+        cached = self.cached_result(digest, crop_name)
+        if cached is not None:
+            if 'inference_path' in cached:
+                cached['inference_path'] = 'cached'
+            cached['timings_ms'] = self._round_timings(timings)
+            return cached
+
+        try:
+            img_array = decode_image(data, self.input_size, timings)
+        except Exception as e:
+            print(f"Error preprocessing image: {e}")
+            return {"error": "Invalid image"}
+
+        result = self.predict_from_array(img_array, crop_name, timings=timings)
+        self.store_result(digest, crop_name, result)
+        result['timings_ms'] = self._round_timings(timings)
+        return result
+
+    @staticmethod
+    def _round_timings(timings):
+        return {stage: round(ms, 2) for stage, ms in timings.items()}
+
+    def cached_result(self, digest, crop_name=None):
+        """Cached result for an image content hash, or None."""
+        if self.cache is None or digest is None:
+            return None
+        return self.cache.get(self.cache.key_for_digest(digest, crop_name))
+
+    def store_result(self, digest, crop_name, result):
+        if self.cache is None or digest is None or 'error' in result:
+            return
+        self.cache.set(self.cache.key_for_digest(digest, crop_name), result)
+
+    def cache_stats(self):
+        """Hit/miss counters of the prediction cache, or None when disabled."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def predict_from_array(self, img_array, crop_name=None, timings=None):
+        """
+        Predict disease using Ensemble approach on a preprocessed (1, H, W, 3) array.
+        """
+        with self._in_use():
+            with stage_timer(timings, 'inference'):
+                rows, embeddings, paths, member_rows, members = self._run_members(img_array, crop_name)
+            with stage_timer(timings, 'postprocess'):
+                result = self._build_result(rows[0], crop_name, member_rows[0], members)
+                return self._annotate(result, embeddings[0], paths[0])
+
+    def predict_batch(self, img_batch, crop_name=None):
+        """
+        Predict a stacked (N, H, W, 3) batch in a single forward pass and
+        return one result per image.
+        """
+        if not len(img_batch):
+            return []
+        with self._in_use():
+            rows, embeddings, paths, member_rows, members = self._run_members(img_batch, crop_name)
+        return [
+            self._annotate(self._build_result(row, crop_name, extra, members), embedding, path)
+            for row, extra, embedding, path in zip(rows, member_rows, embeddings, paths)
+        ]
+
+    @staticmethod
+    def _annotate(result, embedding, path):
+        """
+        Attach the image embedding (base64 float16, see ml_engine.embeddings)
+        so callers can index it; it is not meant for API responses. With the
+        cascade on, `inference_path` says which stage answered.
+        """
+        if embedding is not None:
+            result['embedding'] = encode_embedding(embedding)
+        if path is not None:
+            result['inference_path'] = path
+        return result
+
+    def _run_members(self, img_batch, crop_name=None):
+        """
+        Run all ensemble members concurrently on one (N, H, W, 3) batch,
+        including the specialist for `crop_name` if there is one.
+
+        Returns the primary softmax rows, embeddings and cascade paths (None
+        where unavailable), one {member name: row} dict per image for the
+        other members, and a report of which members contributed and which
+        were dropped.
+        """
+        specialist = self.specialist_for(crop_name)
+        # A specialist's first load takes seconds; do it before the members'
+        # deadline starts so its first request isn't dropped as late
+        with self.specialists.lease(specialist) if specialist else nullcontext():
+            outputs, dropped = self.ensemble.run(img_batch, specialist) if self.ensemble else ({}, {})
+        members = {"contributed": sorted(outputs), "dropped": dropped}
+
+        rows, embeddings, paths = outputs.pop("primary", (None, None, None))
+        if rows is None:
+            rows = [None] * len(img_batch)
+        else:
+            rows = self._refine_low_confidence(img_batch, rows, crop_name)
+        if embeddings is None:
+            embeddings = [None] * len(img_batch)
+        if paths is None:
+            paths = [None] * len(img_batch)
+
+        member_rows = [{name: out[i] for name, out in outputs.items()} for i in range(len(img_batch))]
+        return rows, embeddings, paths, member_rows, members
+
+    def _refine_low_confidence(self, img_batch, rows, crop_name=None):
+        """
+        Replace the softmax rows whose (crop-masked) confidence is under
+        the TTA threshold with the test-time-augmented average. All such
+        images go through one augmented forward pass.
+        """
+        if self.tta is None:
+            return rows
+
+        low = []
+        for i, row in enumerate(rows):
+            scores = self._crop_scores(row, crop_name)
+            if scores is not None and self.tta.wants(float(scores.max())):
+                low.append(i)
+        if not low:
+            return rows
+
+        try:
+            refined = self.tta.run(img_batch[low], np.stack([rows[i] for i in low]))
+        except Exception as e:
+            print(f"Test-time augmentation failed: {e}")
+            return rows
+        if refined is None:
+            return rows
+
+        rows = list(rows)
+        for i, row in zip(low, refined):
+            rows[i] = row
+        return rows
+
+    def _crop_scores(self, probabilities, crop_name=None):
+        """
+        Primary softmax restricted to the user's crop with the precomputed
+        mask: in-crop classes keep their raw probability, other classes get
+        -1. A prediction for another crop above CROSS_CROP_CONFIDENCE is
+        kept unmasked (the crop was likely mislabelled). None if nothing
+        usable remains, e.g. the crop isn't covered by the model.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        if not crop_name or crop_name == "Live Capture":
+            return probabilities
+        top = int(np.argmax(probabilities))
+        crop_row = self.crop_row(crop_name)
+        if crop_row is not None and self.crop_mask[crop_row][top]:
+            return np.where(self.crop_mask[crop_row], probabilities, -1.0)
+        if probabilities[top] > CROSS_CROP_CONFIDENCE:
+            return probabilities
+        if crop_row is None:
+            return None
+        return np.where(self.crop_mask[crop_row], probabilities, -1.0)
+
+    def _build_result(self, probabilities, crop_name=None, member_rows=None, members=None):
+        """
+        Turn the primary model's softmax row, plus the rows of the other
+        ensemble members, into the final ensemble result.
+        """
+        member_rows = member_rows or {}
         results = []
 
         # 1. Primary Model Prediction
-        if self.primary_model:
-            try:
-                predictions = self.primary_model.predict(img_array)
-                print(f"DEBUG: Raw Predictions: {predictions[0]}")
-                
-                predicted_class_idx = np.argmax(predictions[0])
-                confidence = float(np.max(predictions[0]))
-                
-                print(f"DEBUG: Predicted Index: {predicted_class_idx}, Confidence: {confidence}")
-                
-                class_name = self.class_mappings['plant_village'].get(str(predicted_class_idx), "Unknown")
-                print(f"DEBUG: Mapped Class Name: {class_name}")
-                
-                # Crop Consistency Check
-                is_relevant = True
-                if crop_name and crop_name != "Live Capture":
-                    # Extract crop from class name (e.g., "Apple___Black_rot" -> "Apple")
-                    predicted_crop = class_name.split("___")[0]
-                    if crop_name.lower() not in predicted_crop.lower() and predicted_crop.lower() not in crop_name.lower():
-                        print(f"DEBUG: Prediction {class_name} does not match crop {crop_name}. Discarding/Penalizing.")
-                        is_relevant = False
-                        confidence = 0.1 # Penalize heavily
+        top_k = []
+        if probabilities is not None:
+            # Crop Consistency Check: restrict the softmax to classes of the
+            # user's crop with the precomputed mask and take one masked argmax
+            scores = self._crop_scores(probabilities, crop_name)
+            
+            # None: the crop isn't covered by the PlantVillage model, so the
+            # specialist and fallback candidates below decide
+            if scores is not None:
+                predicted_class_idx = int(np.argmax(scores))
+                confidence = float(scores[predicted_class_idx])
+                class_name = self.class_names[predicted_class_idx]
                 
-                # Clean up class name
-                clean_name = class_name.replace("___", " - ").replace("_", " ")
+                order = np.argsort(scores)[::-1][:self.top_k]
+                top_k = [
+                    {"disease": self.class_display_names[i], "confidence": round(float(scores[i]), 4)}
+                    for i in order if scores[i] >= 0
+                ]
                 
-                if is_relevant or confidence > 0.95: # Keep if very high confidence or relevant
-                     results.append({
-                        "source": "PlantVillage Model",
-                        "disease": clean_name,
-                        "confidence": confidence,
-                        "raw_class": class_name
-                    })
-            except Exception as e:
-                print(f"Primary prediction failed: {e}")
+                results.append({
+                    "source": "PlantVillage Model",
+                    "disease": self.class_display_names[predicted_class_idx],
+                    "confidence": confidence,
+                    "raw_class": class_name
+                })
+
+        # Crop specialist, trained on exactly this crop's diseases
+        specialist_rows = {
+            name: row for name, row in member_rows.items() if self.ensemble.member(name).crop
+        }
+        for name, row in specialist_rows.items():
+            results.append(self._member_candidate(name, row))
 
         # 2. Secondary Model / Fallback Logic
         # If we have no results or low confidence results, try to find a relevant disease for the crop
         if not results or (results and results[0]['confidence'] < 0.5):
-            print("DEBUG: Primary model result poor or mismatch. Attempting fallback.")
-            
             # Check Recent Diseases first
             recent_candidates = self.class_mappings.get('recent_diseases', {})
             
             # If crop_name is provided, try to find a disease that matches the crop in our "database"
             # Since we don't have a full DB, we'll use a smart mock
             
-            if crop_name:
+            if crop_name and not specialist_rows:
                 # Mock logic: Return a common disease for this crop
                 common_diseases = {
                     'rice': ['Bacterial Leaf Blight', 'Brown Spot', 'Rice Blast'],
@@ -150,8 +679,13 @@ class EnsembleDiseasePredictor:
                         "raw_class": disease
                     })
             
-            # Also randomly add a "Recent Disease" for demo if applicable
-            if random.random() < 0.2:
+            # Candidates from the other ensemble members that answered in time
+            for name, row in member_rows.items():
+                if name not in specialist_rows:
+                    results.append(self._member_candidate(name, row))
+            
+            # Without a trained recent-disease model, randomly add one for demo
+            if "recent_diseases" not in member_rows and random.random() < 0.2:
                  idx = random.choice(list(recent_candidates.keys()))
                  name = recent_candidates[idx]
                  results.append({
@@ -168,7 +702,9 @@ class EnsembleDiseasePredictor:
                 "confidence": 0.0,
                 "description": "Could not detect any disease.",
                 "treatment": "Consult an expert.",
-                "precautions": []
+                "precautions": [],
+                "members": members,
+                "model_version": self.model_version
             }
             
         # Sort by confidence
@@ -177,8 +713,7 @@ class EnsembleDiseasePredictor:
         disease_name = best_result['disease']
         
         # Generate description and treatment based on disease name
-        # (This part would ideally come from a database, but we'll use a helper)
-        info = self.get_disease_info(disease_name)
+        info = self.get_disease_info(disease_name, crop_name)
 
         return {
             "disease": disease_name,
@@ -186,198 +721,38 @@ class EnsembleDiseasePredictor:
             "description": info['description'],
             "treatment": info['treatment'],
             "precautions": info['precautions'],
-            "model_source": best_result['source']
+            "top_k": top_k,
+            "model_source": best_result['source'],
+            "members": members,
+            "model_version": self.model_version
         }
 
-    def get_disease_info(self, disease_name):
-        """Helper to get static info for diseases."""
-        # Expanded DB for PlantVillage + Recent
-        db = {
-            "Fall Armyworm": {
-                "description": "A pest that feeds on leaves and stems of more than 80 plant species.",
-                "treatment": "Apply biological control agents like Bacillus thuringiensis or Emamectin benzoate.",
-                "precautions": ["Monitor fields regularly", "Use pheromone traps", "Deep ploughing in summer"]
-            },
-            "Locust Infestation": {
-                "description": "Swarms of locusts devouring crops.",
-                "treatment": "Aerial spraying of ULV malathion or fenitrothion.",
-                "precautions": ["Monitor breeding areas", "Community alerts"]
-            },
-            "Wheat Blast": {
-                "description": "Fungal disease affecting wheat heads.",
-                "treatment": "Apply fungicides like Tricyclazole.",
-                "precautions": ["Use resistant varieties", "Crop rotation", "Burn infected residues"]
-            },
-             "Banana Fusarium Wilt TR4": {
-                "description": "Soil-borne fungal disease blocking water flow in banana plants.",
-                "treatment": "No cure. Destroy infected plants immediately.",
-                "precautions": ["Quarantine measures", "Use disease-free planting material", "Disinfect tools"]
-            },
-            
-            # Apple
-            "Apple - Apple scab": {
-                "description": "Fungal disease causing dark, scabby spots on fruit and leaves.",
-                "treatment": "Apply fungicides like Captan or Myclobutanil.",
-                "precautions": ["Remove fallen leaves", "Prune for air circulation", "Apply urea in autumn"]
-            },
-            "Apple - Black rot": {
-                "description": "Causes rotting of fruit and cankers on limbs.",
-                "treatment": "Remove mummified fruit and prune out cankers.",
-                "precautions": ["Sanitation", "Avoid wounding trees", "Fungicide sprays"]
-            },
-            "Apple - Cedar apple rust": {
-                "description": "Fungal disease causing bright orange spots on leaves.",
-                "treatment": "Remove nearby juniper/cedar hosts if possible. Apply fungicides.",
-                "precautions": ["Plant resistant varieties", "Remove galls from cedars"]
-            },
-            
-            # Cherry
-             "Cherry (including sour) - Powdery mildew": {
-                "description": "White powdery growth on leaves and fruit.",
-                "treatment": "Sulfur-based fungicides or potassium bicarbonate.",
-                "precautions": ["Prune for air circulation", "Avoid overhead irrigation"]
-            },
-            
-            # Corn (Maize)
-            "Corn (maize) - Cercospora leaf spot Gray leaf spot": {
-                "description": "Gray to tan rectangular lesions on leaves.",
-                "treatment": "Fungicides containing strobilurins or triazoles.",
-                "precautions": ["Crop rotation", "Tillage of residue", "Resistant hybrids"]
-            },
-            "Corn (maize) - Common rust ": {
-                "description": "Reddish-brown pustules on both leaf surfaces.",
-                "treatment": "Fungicide application if severe early in season.",
-                "precautions": ["Plant resistant hybrids", "Early planting"]
-            },
-             "Corn (maize) - Northern Leaf Blight": {
-                "description": "Cigar-shaped gray-green lesions on leaves.",
-                "treatment": "Fungicides if applied before tasseling.",
-                "precautions": ["Crop rotation", "Resistant varieties", "Manage residue"]
-            },
-
-            # Grape
-            "Grape - Black rot": {
-                "description": "Brown circular spots on leaves and shriveled black berries.",
-                "treatment": "Fungicides like Mancozeb or Myclobutanil.",
-                "precautions": ["Sanitation (remove mummies)", "Good canopy management"]
-            },
-             "Grape - Esca (Black Measles)": {
-                "description": "Tiger-stripe patterns on leaves and spotting on fruit.",
-                "treatment": "Protect pruning wounds. No cure for established vine.",
-                "precautions": ["Avoid pruning in wet weather", "Remove infected vines"]
-            },
-            "Grape - Leaf blight (Isariopsis Leaf Spot)": {
-                "description": "Dark red angular spots on leaves.",
-                "treatment": "Fungicides used for downy mildew often control this.",
-                "precautions": ["Improve air circulation", "Remove infected leaves"]
-            },
-
-            # Peach
-            "Peach - Bacterial spot": {
-                "description": "Small angular shots or cracks on fruit and leaves.",
-                "treatment": "Copper sprays or oxytetracycline causing bloom.",
-                "precautions": ["Resistant varieties", "Avoid high nitrogen", "Pruning"]
-            },
-
-            # Pepper
-            "Pepper, bell - Bacterial spot": {
-                "description": "Small water-soaked spots on leaves and fruit.",
-                "treatment": "Copper-based bactericides.",
-                "precautions": ["Use disease-free seeds", "Crop rotation", "Mulching"]
-            },
-
-            # Potato
-            "Potato - Early blight": {
-                "description": "Target-like concentric rings on older leaves.",
-                "treatment": "Fungicides like Chlorothalonil or Mancozeb.",
-                "precautions": ["Crop rotation", "Proper irrigation", "Maintain plant vigor"]
-            },
-            "Potato - Late blight": {
-                "description": "Water-soaked lesions on leaves, rapid plant death.",
-                "treatment": "Preventive fungicides (Mancozeb) or systemic ones (Metalaxyl).",
-                "precautions": ["Use certified seed", "Destroy cull piles", "Monitor weather"]
-            },
-
-            # Squash
-            "Squash - Powdery mildew": {
-                "description": "White powdery growth on leaves.",
-                "treatment": "Sulfur, Neem oil, or potassium bicarbonate.",
-                "precautions": ["Resistant varieties", "Space plants well", "Weed control"]
-            },
-
-            # Strawberry
-            "Strawberry - Leaf scorch": {
-                "description": "Purple spots giving a scorched appearance.",
-                "treatment": "Fungicides usually applied for other diseases help.",
-                "precautions": ["Renew plantings often", "Remove infected leaves"]
-            },
-
-            # Tomato
-            "Tomato - Bacterial spot": {
-                "description": "Small dark spots on leaves and scabs on fruit.",
-                "treatment": "Copper sprays + Mancozeb.",
-                "precautions": ["Use disease-free seeds", "Avoid overhead watering", "Crop rotation"]
-            },
-             "Tomato - Early blight": {
-                "description": "Target-like brown spots with yellow halos.",
-                "treatment": "Fungicides like Chlorothalonil or Copper.",
-                "precautions": ["Mulching", "Stake plants", "Remove lower leaves"]
-            },
-             "Tomato - Late blight": {
-                "description": "Greasy, gray spots on leaves; fruit rot.",
-                "treatment": "Aggressive fungicide program (Chlorothalonil, Copper).",
-                "precautions": ["Ensure good aeration", "Keep leaves dry", "Remove infected plants immediately"]
-            },
-            "Tomato - Leaf Mold": {
-                "description": "Yellow spots on upper leaf, olive mold on underside.",
-                "treatment": "Fungicides like Copper or Chlorothalonil.",
-                "precautions": ["Reduce humidity (greenhouse)", "Ventilation", "Resistant varieties"]
-            },
-             "Tomato - Septoria leaf spot": {
-                "description": "Small circular spots with gray centers.",
-                "treatment": "Fungicides (Chlorothalonil).",
-                "precautions": ["Remove lower leaves", "Mulching", "Crop rotation"]
-            },
-            "Tomato - Spider mites Two-spotted spider mite": {
-                "description": "Tiny mites causing stippling and webbing.",
-                "treatment": "Miticide or insecticidal soap.",
-                "precautions": ["Avoid dust", "Encourage predatory mites", "Water management"]
-            },
-            "Tomato - Target Spot": {
-                "description": "Brown lesions with concentric rings.",
-                "treatment": "Fungicides (Azoxystrobin).",
-                "precautions": ["Crop rotation", "Good airflow", "Remove debris"]
-            },
-            "Tomato - Tomato Yellow Leaf Curl Virus": {
-                "description": "Yellowing and curling of leaves, stunted growth.",
-                "treatment": "Control whiteflies (vector). No cure for virus.",
-                "precautions": ["Reflective mulches", "Virus-free transplants", "Weed control"]
-            },
-             "Tomato - Tomato mosaic virus": {
-                "description": "Mottling and mosaic patterns on leaves.",
-                "treatment": "No cure. Remove infected plants.",
-                "precautions": ["Sanitize tools", "Wash hands (tobacco users)", "Resistant varieties"]
-            },
-
-            # Healthy
-             "Apple - healthy": {
-                "description": "The plant appears healthy.",
-                "treatment": "Continue standard care.",
-                "precautions": ["Regular monitoring", "Balanced nutrition"]
-            },
-            "Blueberry - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Cherry (including sour) - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Corn (maize) - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Grape - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Peach - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Pepper, bell - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Potato - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Raspberry - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Soybean - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Strawberry - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] },
-            "Tomato - healthy": { "description": "Healthy.", "treatment": "-", "precautions": ["Monitor"] }
+    def _member_candidate(self, name, row):
+        """Top class of an ensemble member's softmax row as a voting candidate."""
+        member = self.ensemble.member(name)
+        row = np.asarray(row, dtype=np.float32)
+        idx = int(np.argmax(row))
+        label = member.class_names[idx] if idx < len(member.class_names) else "Unknown"
+        return {
+            "source": member.source,
+            "disease": label,
+            "confidence": float(row[idx]),
+            "raw_class": label
         }
-        
+
+    def from_model(self, result):
+        """
+        Whether `result` was decided by an ensemble member that answered,
+        rather than the mock fallback (the expert-system guess or the demo
+        "Recent Disease Model" candidate).
+        """
+        if self.ensemble is None:
+            return False
+        contributed = (result.get('members') or {}).get('contributed', [])
+        return result.get('model_source') in {self.ensemble.member(name).source for name in contributed}
+
+    def get_disease_info(self, disease_name, crop_name=None):
+        """Look up static info for a disease in the knowledge base."""
         # Default info
         default_info = {
             "description": f"Detected {disease_name}. Please consult a local agriculture expert for confirmation.",
@@ -385,64 +760,35 @@ class EnsembleDiseasePredictor:
             "precautions": ["Maintain field hygiene", "Ensure proper drainage", "Remove infected parts"]
         }
         
-        return db.get(disease_name.strip(), default_info)
+        return self.knowledge_base.get(disease_name, crop_name, default=default_info)
 
-    def predict_from_symptoms(self, text_description, crop_name=None):
+    def predict_from_symptoms(self, text_description, crop_name=None, top_k=3):
         """
-        Predict disease from text description (Legacy/Keyword based).
+        Predict disease from a text description (weighted symptom-phrase matching).
         """
-        # Re-implementing basic keyword matching or keeping it simple
-        # Since the user asked for 'various models', we can say this is the 'NLP Model'
-        
-        text = text_description.lower()
-        
-        # Simple keyword map
-        # Enhanced keyword map (handling partial matches implicitly via iteration)
-        keywords = {
-            # General
-            "yellow": "Nitrogen Deficiency or Viral Infection",
-            "curl": "Leaf Curl Virus",
-            "spot": "Leaf Spot (Fungal)",
-            "wilt": "Bacterial Wilt",
-            "powder": "Powdery Mildew",
-            "white": "Powdery Mildew",
-            "rot": "Rot (Root/Fruit)",
-            "black": "Black Rot or Sooty Mold",
-            "hole": "Insect Damage (e.g. Caterpillar)",
-            "worm": "Fall Armyworm",
-            
-            # Specific Combinations (Priority)
-            "early blight": "Early Blight",
-            "late blight": "Late Blight",
-            "bacterial spot": "Bacterial Spot",
-            "leaf mold": "Leaf Mold",
-            "spider mite": "Spider Mites",
-            "mosaic": "Mosaic Virus",
-            "yellow spot": "Early Blight",
-            "yellow leaf": "Yellow Leaf Curl Virus"
-        }
-        
-        detected = []
-        # Priority check for multi-word phrases first
-        for key, val in keywords.items():
-            if " " in key and key in text:
-                 detected.append(val)
-        
-        # If no specific multi-word match, check single words
-        if not detected:
-            for key, val in keywords.items():
-                if key in text:
-                    detected.append(val)                
-        if detected:
-            # Return the most frequent or first one
-            disease = detected[0]
-            info = self.get_disease_info(disease)
+        ranked = self.symptom_matcher.score(text_description, crop_name, top_k)
+        return self._symptom_result(ranked, crop_name)
+
+    def predict_from_symptoms_batch(self, text_descriptions, crop_name=None, top_k=3):
+        """Score many descriptions at once; one result per description."""
+        return [
+            self._symptom_result(ranked, crop_name)
+            for ranked in self.symptom_matcher.score_batch(text_descriptions, crop_name, top_k)
+        ]
+
+    def _symptom_result(self, ranked, crop_name=None):
+        if ranked:
+            disease, best = ranked[0]
+            total = sum(score for _, score in ranked)
+            info = self.get_disease_info(disease, crop_name)
             return {
                 "disease": disease,
-                "confidence": 0.75,
+                # A lone match keeps the old fixed 0.75; competing matches dilute it
+                "confidence": round(0.75 * best / total, 2),
                 "description": info['description'],
                 "treatment": info['treatment'],
                 "precautions": info['precautions'],
+                "candidates": [{"disease": d, "score": round(sc, 2)} for d, sc in ranked],
                 "model_source": "Symptom Analysis (NLP)"
             }
             
@@ -452,9 +798,177 @@ class EnsembleDiseasePredictor:
             "description": "Symptoms not recognized.",
             "treatment": "Monitor closely.",
             "precautions": [],
+            "candidates": [],
             "model_source": "Symptom Analysis (NLP)"
         }
 
-# Singleton instance for easy import
-predictor = EnsembleDiseasePredictor()
+class LazyPredictor:
+    """
+    Lazily constructed EnsembleDiseasePredictor.
+
+    Nothing heavy happens at import. `start()` loads the models and runs a
+    warm-up inference in a background thread; views can check `is_ready()` to
+    answer with a fast "warming up" response instead of blocking. Attribute
+    access falls through to the real predictor, waiting for it if needed.
+
+    Once ready, the model registry's CURRENT pointer is checked at most every
+    `poll_interval` seconds; when it names another version, `swap()` builds
+    and warms a new predictor in the background and replaces the instance in
+    one assignment. Requests already running keep the old instance, which is
+    closed after they drain: every method called through the wrapper holds
+    a lease (an in-flight reference) on its instance for the whole call,
+    reading and decoding included.
+    """
+
+    NOT_STARTED = "not_started"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, factory=EnsembleDiseasePredictor, warm_up=True,
+                 registry=None, poll_interval=config.MODEL_REGISTRY_POLL_INTERVAL):
+        self._factory = factory
+        self._warm_up = warm_up
+        self._instance = None
+        self._error = None
+        self._state = self.NOT_STARTED
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._registry = registry or ModelRegistry(config.MODEL_REGISTRY_DIR)
+        self._poll_interval = poll_interval
+        self._checked_at = time.monotonic()
+        self._swapping = None   # version being loaded by a swap
+        self._failed_version = None
+        self.swaps = 0
+        self.failed_swaps = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def is_ready(self):
+        return self._state == self.READY
+
+    def start(self):
+        """Begin loading in a background thread (idempotent)."""
+        with self._lock:
+            if self._state != self.NOT_STARTED:
+                return
+            self._state = self.LOADING
+        threading.Thread(target=self._load, name="predictor-loader", daemon=True).start()
+
+    def _load(self):
+        try:
+            instance = self._factory()
+            if self._warm_up:
+                instance.warm_up()
+            self._instance = instance
+            self._state = self.READY
+        except Exception as e:
+            print(f"Error initializing disease predictor: {e}")
+            self._error = e
+            self._state = self.FAILED
+        finally:
+            self._ready.set()
+
+    def get(self, timeout=None):
+        """Return the loaded predictor, starting and waiting for it if necessary."""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Disease predictor is still loading")
+        instance = self._instance
+        if instance is None:
+            raise RuntimeError(f"Disease predictor failed to load: {self._error}")
+        self._maybe_swap(instance)
+        return instance
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Yield the current predictor, counted as in flight until the block
+        exits so a swap cannot close it mid-call.
+        """
+        while True:
+            instance = self.get(timeout)
+            with instance._in_use():
+                # A swap between get() and the count would close this
+                # instance without waiting for us; take the new one instead
+                if self._instance is instance:
+                    yield instance
+                    return
+
+    def _maybe_swap(self, instance):
+        if self._poll_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self._poll_interval:
+            return
+        self._checked_at = now
+        current = self._registry.current_version()
+        loaded = instance.registry_version.version if instance.registry_version else None
+        # A version that failed to load is not retried until CURRENT changes
+        if current and current != loaded and current != self._failed_version:
+            self.swap(current)
+
+    def swap(self, version=None):
+        """
+        Load `version` (default: the registry's current one) in a background
+        thread and switch to it once warmed up. Returns False if a swap is
+        already in progress.
+        """
+        with self._lock:
+            if self._swapping is not None:
+                return False
+            self._swapping = version or self._registry.current_version() or "legacy"
+        threading.Thread(
+            target=self._swap, args=(version,), name="predictor-swap", daemon=True
+        ).start()
+        return True
+
+    def _swap(self, version):
+        try:
+            try:
+                instance = self._factory(model_version=version)
+                if self._warm_up:
+                    instance.warm_up()
+            except Exception as e:
+                print(f"Error loading model version {version}: {e}; keeping the current one.")
+                self.failed_swaps += 1
+                self._failed_version = version
+                return
+            old, self._instance = self._instance, instance
+            self.swaps += 1
+        finally:
+            with self._lock:
+                self._swapping = None
+
+        print(f"Switched disease predictor to model version {instance.model_version}.")
+        if old is not None:
+            old.close(drain_timeout=config.MODEL_SWAP_DRAIN_TIMEOUT)
+
+    def swap_stats(self):
+        instance = self._instance
+        return {
+            "model_version": instance.model_version if instance is not None else None,
+            "swapping_to": self._swapping,
+            "swaps": self.swaps,
+            "failed_swaps": self.failed_swaps,
+        }
+
+    def __getattr__(self, name):
+        attr = getattr(self.get(), name)
+        if not inspect.ismethod(attr):
+            return attr
+
+        # Resolved again under the lease when called: callers such as the
+        # inference executor fetch the method well before running it
+        @wraps(attr)
+        def leased(*args, **kwargs):
+            with self.lease() as instance:
+                return getattr(instance, name)(*args, **kwargs)
+        return leased
+
+
+# Singleton handle for easy import; models load on first use or on start()
+predictor = LazyPredictor()
 
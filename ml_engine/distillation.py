@@ -0,0 +1,198 @@
+"""
+Knowledge distillation of the PlantVillage model into a small student, with
+optional magnitude pruning (`manage.py distill_disease_model`).
+
+Unlike the serving modules, this one imports TensorFlow at module level:
+it is only imported by the training command.
+"""
+import os
+import random
+
+import numpy as np
+import tensorflow as tf
+
+from .backends import IMAGE_EXTENSIONS, class_directories
+
+UNLABELLED = -1
+
+
+def list_images(data_dir, class_mapping, seed=0):
+    """
+    (paths, labels) of the images under `data_dir`, shuffled. Sub-directories
+    named after a class are labelled with its index; loose images and other
+    sub-directories are UNLABELLED (distilled from the teacher only).
+    """
+    directories, _ = class_directories(data_dir, class_mapping)
+    labelled = {path: idx for path, idx in directories}
+    paths, labels = [], []
+    for root, _, files in os.walk(data_dir):
+        label = labelled.get(root, UNLABELLED)
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+                labels.append(label)
+    order = list(range(len(paths)))
+    random.Random(seed).shuffle(order)
+    return [paths[i] for i in order], [labels[i] for i in order]
+
+
+def make_dataset(paths, labels, teacher, teacher_size, student_size, batch_size,
+                 cache='', shuffle=True, seed=0):
+    """
+    tf.data pipeline of (student image, label, teacher probabilities) batches.
+
+    Files are decoded and resized in parallel and the teacher runs once per
+    image; the small uint8 student-size images and the teacher outputs are
+    then cached (in memory, or in the `cache` file prefix), so later epochs
+    only shuffle, batch and prefetch. Images are reduced to the student
+    size with area averaging, like the cascade's first-stage input.
+    """
+    autotune = tf.data.AUTOTUNE
+
+    def load(path, label):
+        data = tf.io.read_file(path)
+        image = tf.io.decode_image(data, channels=3, expand_animations=False)
+        image = tf.image.resize(image, teacher_size, method='bicubic')
+        return tf.clip_by_value(image, 0.0, 255.0) / 255.0, label
+
+    def with_teacher(images, batch_labels):
+        probabilities = teacher(images, training=False)
+        small = tf.image.resize(images, student_size, method='area')
+        return tf.cast(tf.round(small * 255.0), tf.uint8), batch_labels, probabilities
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), np.asarray(labels, dtype=np.int32)))
+    ds = ds.map(load, num_parallel_calls=autotune)
+    ds = ds.batch(batch_size).map(with_teacher).unbatch()
+    ds = ds.cache(cache) if cache else ds.cache()
+    if shuffle:
+        ds = ds.shuffle(4 * batch_size, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(
+        lambda image, label, probabilities: (tf.cast(image, tf.float32) / 255.0, label, probabilities),
+        num_parallel_calls=autotune,
+    )
+    return ds.prefetch(autotune)
+
+
+def build_student(input_size, n_classes, width=1.0):
+    """
+    Small depthwise-separable CNN. It ends in Dense + softmax like the
+    teacher, so the served model returns probabilities and the Dense input
+    is its embedding.
+    """
+    layers = tf.keras.layers
+
+    def channels(n):
+        return max(8, int(n * width))
+
+    inputs = tf.keras.Input((*input_size, 3))
+    x = layers.Conv2D(channels(32), 3, strides=2, padding='same', use_bias=False)(inputs)
+    x = layers.BatchNormalization()(x)
+    x = layers.ReLU(6.0)(x)
+    for filters, strides in ((64, 1), (128, 2), (128, 1), (256, 2), (256, 1), (512, 2)):
+        x = layers.DepthwiseConv2D(3, strides=strides, padding='same', use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU(6.0)(x)
+        x = layers.Conv2D(channels(filters), 1, use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU(6.0)(x)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    logits = layers.Dense(n_classes, name='logits')(x)
+    outputs = layers.Activation('softmax', name='probabilities')(logits)
+    return tf.keras.Model(inputs, outputs, name='student')
+
+
+class Distiller:
+    """
+    Trains a student against the teacher's softened probabilities
+    (temperature `temperature`) and, for labelled images, the true class
+    (weight `alpha`). Kernels listed in `masks` are re-masked after every
+    step, so pruned weights stay zero while the rest fine-tune.
+    """
+
+    def __init__(self, student, learning_rate=1e-3, temperature=4.0, alpha=0.3):
+        self.student = student
+        self.logits_model = tf.keras.Model(student.input, student.get_layer('logits').output)
+        self.optimizer = tf.keras.optimizers.Adam(learning_rate)
+        self.temperature = float(temperature)
+        self.alpha = float(alpha)
+        self.masks = []     # [(variable, mask)]
+
+    def _loss(self, logits, labels, teacher_probabilities):
+        t = self.temperature
+        # Teacher softmax outputs softened as softmax(log p / T)
+        soft_targets = tf.nn.softmax(tf.math.log(teacher_probabilities + 1e-8) / t)
+        distill = tf.reduce_mean(
+            tf.nn.softmax_cross_entropy_with_logits(soft_targets, logits / t)
+        ) * (t * t)
+
+        labelled = labels >= 0
+        hard = tf.nn.sparse_softmax_cross_entropy_with_logits(
+            tf.where(labelled, labels, tf.zeros_like(labels)), logits
+        )
+        n_labelled = tf.reduce_sum(tf.cast(labelled, tf.float32))
+        hard = tf.reduce_sum(tf.where(labelled, hard, tf.zeros_like(hard))) / tf.maximum(n_labelled, 1.0)
+        return (1.0 - self.alpha) * distill + self.alpha * hard
+
+    def _train_step(self, images, labels, teacher_probabilities):
+        with tf.GradientTape() as tape:
+            logits = self.logits_model(images, training=True)
+            loss = self._loss(logits, labels, teacher_probabilities)
+        variables = self.logits_model.trainable_variables
+        self.optimizer.apply_gradients(zip(tape.gradient(loss, variables), variables))
+        for variable, mask in self.masks:
+            variable.assign(variable * mask)
+        return loss
+
+    def fit(self, dataset, epochs, log=print):
+        # Traced per fit() so the step picks up masks added by prune()
+        step = tf.function(self._train_step)
+        for epoch in range(epochs):
+            losses = [float(step(*batch)) for batch in dataset]
+            log(f"  epoch {epoch + 1}/{epochs}: loss {np.mean(losses):.4f}")
+
+    def prune(self, sparsity):
+        """
+        Zero the smallest-magnitude `sparsity` fraction of every conv and
+        dense kernel and keep them zero during further training.
+        """
+        self.masks = []
+        for layer in self.student.layers:
+            kernel = getattr(layer, 'depthwise_kernel', None)
+            if kernel is None:
+                kernel = getattr(layer, 'kernel', None)
+            if kernel is None:
+                continue
+            values = np.abs(kernel.numpy())
+            threshold = np.quantile(values, sparsity)
+            mask = tf.constant((values > threshold).astype(np.float32))
+            kernel.assign(kernel * mask)
+            self.masks.append((kernel, mask))
+        return self.sparsity()
+
+    def sparsity(self):
+        total = sum(int(np.prod(v.shape)) for v, _ in self.masks)
+        zeros = sum(int(np.sum(v.numpy() == 0)) for v, _ in self.masks)
+        return zeros / total if total else 0.0
+
+
+def evaluate(student, dataset):
+    """Top-1 agreement with the teacher and (student, teacher) accuracy on labelled images."""
+    agree = correct = teacher_correct = n = n_labelled = 0
+    for images, labels, teacher_probabilities in dataset:
+        predicted = np.argmax(student(images, training=False).numpy(), axis=1)
+        teacher = np.argmax(teacher_probabilities.numpy(), axis=1)
+        labels = labels.numpy()
+        agree += int(np.sum(predicted == teacher))
+        labelled = labels >= 0
+        correct += int(np.sum(predicted[labelled] == labels[labelled]))
+        teacher_correct += int(np.sum(teacher[labelled] == labels[labelled]))
+        n_labelled += int(np.sum(labelled))
+        n += len(labels)
+    return {
+        "images": n,
+        "top1_agreement": agree / n if n else None,
+        "labelled_images": n_labelled,
+        "accuracy": correct / n_labelled if n_labelled else None,
+        "teacher_accuracy": teacher_correct / n_labelled if n_labelled else None,
+    }
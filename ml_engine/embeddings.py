@@ -0,0 +1,324 @@
+import base64
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# Files of an embedding directory (rows are aligned across the three columns):
+#
+#   vectors.f16    (capacity, dim) float16, L2-normalized embeddings
+#   ids.i64        (capacity,) DiseaseLog id of each row
+#   lists.i32      (capacity,) IVF list of each row, -1 = not assigned yet
+#   meta.json      {"dim": ..., "count": ...}; rows past `count` are unused
+#   centroids.npy  IVF coarse centroids, written by IVFIndex.train
+#
+# Appends from any process take an exclusive flock on `.lock`, so gunicorn
+# workers can share one directory.
+VECTORS = 'vectors.f16'
+IDS = 'ids.i64'
+LISTS = 'lists.i32'
+META = 'meta.json'
+CENTROIDS = 'centroids.npy'
+LOCK = '.lock'
+
+
+def encode_embedding(vector):
+    """Compact JSON-safe form of an embedding: base64 of its float16 bytes."""
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode('ascii')
+
+
+def decode_embedding(text):
+    return np.frombuffer(base64.b64decode(text), dtype=np.float16).astype(np.float32)
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingStore:
+    """
+    Append-only float16 matrix of image embeddings keyed by DiseaseLog id,
+    memory-mapped so millions of rows cost page cache, not process memory.
+    Files grow `grow_rows` rows at a time; `refresh()` picks up rows that
+    other processes appended.
+    """
+
+    def __init__(self, directory, grow_rows=65536):
+        self.directory = directory
+        self.grow_rows = grow_rows
+        self.dim = None
+        self.count = 0
+        self.vectors = None     # read-only memmaps sized to the file capacity
+        self.ids = None
+        self.lists = None
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(LOCK), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        tmp = self._path(META + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(META))
+
+    def refresh(self):
+        """Re-map the files if another process has appended since the last look."""
+        try:
+            mtime = os.stat(self._path(META)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        meta = self._read_meta()
+        if not meta:
+            return
+        dim, count = meta['dim'], meta['count']
+        capacity = os.path.getsize(self._path(VECTORS)) // (2 * dim)
+        with self._lock:
+            self.vectors = np.memmap(self._path(VECTORS), np.float16, 'r', shape=(capacity, dim))
+            self.ids = np.memmap(self._path(IDS), np.int64, 'r', shape=(capacity,))
+            self.lists = np.memmap(self._path(LISTS), np.int32, 'r', shape=(capacity,))
+            self.dim, self.count, self._meta_mtime = dim, count, mtime
+
+    def _ensure_capacity(self, rows, dim):
+        """Grow the column files (zero/-1 filled) to hold at least `rows` rows."""
+        path = self._path(VECTORS)
+        capacity = os.path.getsize(path) // (2 * dim) if os.path.exists(path) else 0
+        if rows <= capacity:
+            return
+        new_capacity = capacity + max(self.grow_rows, rows - capacity)
+        for name, itemsize in ((VECTORS, 2 * dim), (IDS, 8)):
+            with open(self._path(name), 'ab') as f:
+                f.truncate(new_capacity * itemsize)
+        with open(self._path(LISTS), 'ab') as f:
+            f.write(np.full(new_capacity - capacity, -1, dtype=np.int32).tobytes())
+
+    def _write_row(self, name, dtype, row, value, width=1):
+        column = np.memmap(
+            self._path(name), dtype, 'r+',
+            offset=row * width * np.dtype(dtype).itemsize, shape=(width,),
+        )
+        column[:] = value
+        column.flush()
+        del column
+
+    def append(self, log_id, vector, assign=None):
+        """
+        Append one embedding and return its row. `assign`, if given, maps
+        the normalized vector to its IVF list while the lock is held.
+        """
+        vector = _normalize(np.asarray(vector, dtype=np.float32).ravel())
+        with self.file_lock():
+            meta = self._read_meta()
+            dim = meta.get('dim') or len(vector)
+            if len(vector) != dim:
+                raise ValueError(f"Embedding has {len(vector)} dimensions, store has {dim}")
+            row = meta.get('count', 0)
+            self._ensure_capacity(row + 1, dim)
+            self._write_row(VECTORS, np.float16, row, vector.astype(np.float16), width=dim)
+            self._write_row(IDS, np.int64, row, log_id)
+            if assign is not None:
+                self._write_row(LISTS, np.int32, row, assign(vector))
+            self._write_meta({'dim': dim, 'count': row + 1})
+        self.refresh()
+        return row
+
+    def write_lists(self, start, values):
+        """Overwrite IVF list assignments from row `start` (caller holds the file lock)."""
+        column = np.memmap(self._path(LISTS), np.int32, 'r+', offset=start * 4, shape=(len(values),))
+        column[:] = values
+        column.flush()
+        del column
+
+    def row_of(self, log_id):
+        """Row holding a log's embedding, or None."""
+        self.refresh()
+        if not self.count:
+            return None
+        rows = np.flatnonzero(self.ids[:self.count] == log_id)
+        return int(rows[-1]) if len(rows) else None
+
+    def get(self, log_id):
+        row = self.row_of(log_id)
+        return None if row is None else np.asarray(self.vectors[row], dtype=np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index (cosine similarity)
+    over an EmbeddingStore.
+
+    `train` runs k-means over a sample to get `n_lists` coarse centroids and
+    assigns every row to its nearest one. A query then scores only the rows
+    of its `nprobe` nearest lists, so a search touches roughly
+    nprobe / n_lists of the matrix. New rows are assigned as they are
+    appended; the per-list row arrays are rebuilt lazily once enough of them
+    have accumulated. Until the index is trained, search is exact.
+    """
+
+    def __init__(self, store, nprobe=8, rebuild_fraction=0.1):
+        self.store = store
+        self.nprobe = nprobe
+        self.rebuild_fraction = rebuild_fraction
+        self.centroids = None
+        self._centroids_mtime = None
+        self._order = None          # rows sorted by list
+        self._offsets = None        # list i occupies _order[_offsets[i]:_offsets[i + 1]]
+        self._built_count = 0
+        self._lock = threading.Lock()
+        self._load_centroids()
+
+    # Training
+
+    def _load_centroids(self):
+        path = self.store._path(CENTROIDS)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._centroids_mtime:
+            self.centroids = np.load(path)
+            self._centroids_mtime = mtime
+            self._order = None  # assignments changed with the centroids
+
+    def _assign(self, vectors, block=8192):
+        vectors = np.atleast_2d(vectors)
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            chunk = np.asarray(vectors[start:start + block], dtype=np.float32)
+            out[start:start + block] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return out
+
+    def train(self, n_lists=None, sample=100_000, iterations=10, seed=0):
+        """
+        Fit centroids on up to `sample` rows and (re)assign every row.
+        Appends are only blocked while the assignments are written.
+        """
+        store = self.store
+        store.refresh()
+        n = store.count
+        if n == 0:
+            raise ValueError("No embeddings to train on")
+        n_lists = int(n_lists or max(1, min(4096, round(np.sqrt(n)))))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(n, size=min(sample, n), replace=False))
+        data = np.asarray(store.vectors[picked], dtype=np.float32)
+        centroids = data[rng.choice(len(data), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            counts = np.bincount(labels, minlength=n_lists)
+            filled = counts > 0
+            centroids[filled] = _normalize(sums[filled])
+            # Re-seed empty lists with random points
+            if not filled.all():
+                centroids[~filled] = data[rng.choice(len(data), size=int((~filled).sum()))]
+
+        self.centroids = centroids
+        assignments = self._assign(store.vectors[:n])
+        with store.file_lock():
+            store.refresh()
+            extra = self._assign(store.vectors[n:store.count]) if store.count > n else np.empty(0, np.int32)
+            store.write_lists(0, np.concatenate([assignments, extra]))
+            path = store._path(CENTROIDS)
+            np.save(path + '.tmp.npy', centroids)
+            os.replace(path + '.tmp.npy', path)
+            # Touch meta so other processes re-map the updated lists
+            store._write_meta({'dim': store.dim, 'count': store.count})
+        store.refresh()
+        self._load_centroids()
+        self._order = None
+        return n_lists
+
+    # Updates and search
+
+    def add(self, log_id, vector):
+        self._load_centroids()
+        assign = (lambda v: int(self._assign(v)[0])) if self.centroids is not None else None
+        return self.store.append(log_id, vector, assign=assign)
+
+    def _build(self, count):
+        lists = np.asarray(self.store.lists[:count])
+        order = np.argsort(lists, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+        # Unassigned rows (-1) sort first, before offsets[0]; they are always scanned
+        self._order, self._offsets, self._built_count = order, offsets, count
+
+    def _candidates(self, query, nprobe):
+        count = self.store.count
+        if self.centroids is None:
+            return np.arange(count)
+        with self._lock:
+            stale = count - self._built_count
+            if self._order is None or stale > max(1024, self.rebuild_fraction * self._built_count):
+                self._build(count)
+            order, offsets, built = self._order, self._offsets, self._built_count
+
+        probes = np.argsort(query @ self.centroids.T)[::-1][:nprobe]
+        parts = [order[:offsets[0]]]  # unassigned rows
+        parts += [order[offsets[i]:offsets[i + 1]] for i in probes]
+        if built < count:
+            # Rows appended since the last build, filtered by their list
+            tail = np.arange(built, count)
+            tail_lists = np.asarray(self.store.lists[built:count])
+            parts.append(tail[np.isin(tail_lists, np.append(probes, -1))])
+        return np.sort(np.concatenate(parts))
+
+    def search(self, vector, k=5, nprobe=None, exclude_id=None):
+        """Up to `k` (log id, cosine similarity) pairs, most similar first."""
+        self.store.refresh()
+        self._load_centroids()
+        if not self.store.count:
+            return []
+        query = _normalize(np.asarray(vector, dtype=np.float32).ravel())
+        rows = self._candidates(query, nprobe or self.nprobe)
+        if not len(rows):
+            return []
+
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), 65536):
+            block = rows[start:start + 65536]
+            scores[start:start + 65536] = np.asarray(self.store.vectors[block], dtype=np.float32) @ query
+        ids = np.asarray(self.store.ids[rows])
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -np.inf
+
+        top = np.argsort(scores)[::-1][:k]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def stats(self):
+        return {
+            "rows": self.store.count,
+            "dim": self.store.dim,
+            "lists": 0 if self.centroids is None else len(self.centroids),
+            "nprobe": self.nprobe,
+            "trained": self.centroids is not None,
+        }
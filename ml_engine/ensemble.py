@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .metrics import Histogram, LATENCY_BUCKETS_MS
+
+
+class EnsembleMember:
+    """One model taking part in the ensemble vote."""
+
+    def __init__(self, name, infer_fn, class_names, source, crop=None, required=False):
+        self.name = name
+        self.infer_fn = infer_fn          # (N, H, W, 3) -> (N, classes)
+        self.class_names = class_names    # index -> label
+        self.source = source              # label shown as model_source
+        self.crop = crop                  # only votes on this crop's requests; None = all
+        self.required = required          # waited for without a deadline
+        self.latency_hist = Histogram(LATENCY_BUCKETS_MS)
+        self.timeouts = 0
+        self.errors = 0
+
+    def __call__(self, batch):
+        start = time.perf_counter()
+        try:
+            return self.infer_fn(batch)
+        finally:
+            self.latency_hist.observe((time.perf_counter() - start) * 1000.0)
+
+
+class EnsembleRunner:
+    """
+    Runs every ensemble member on the same preprocessed batch concurrently.
+
+    Members are submitted to a bounded thread pool and collected against a
+    shared deadline of `timeout_ms`; a member that is late or raises is left
+    out of the vote instead of holding up the request. Required members
+    (the primary model) are never timed out: a big batch or a slow call
+    must not leave the vote to the optional members alone. Late members keep
+    their pool thread until they finish, so the pool size also bounds how
+    many stuck calls can pile up. With a single member, it is called inline.
+    Crop-specific members only run when the request is for their crop.
+    """
+
+    def __init__(self, members=(), max_workers=4, timeout_ms=2000):
+        self.members = list(members)
+        self.timeout_ms = timeout_ms
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ensemble")
+        self._lock = threading.Lock()
+
+    def add(self, member):
+        self.members.append(member)
+
+    def member(self, name):
+        return next(m for m in self.members if m.name == name)
+
+    def run(self, batch, crop=None):
+        """
+        Return ({member name: output rows}, {member name: reason}) for the
+        members that answered and those that were dropped.
+        """
+        outputs, dropped = {}, {}
+        members = [m for m in self.members if m.crop is None or m.crop == crop]
+        if len(members) == 1:
+            member = members[0]
+            try:
+                outputs[member.name] = member(batch)
+            except Exception as e:
+                self._count_error(member, e)
+                dropped[member.name] = "error"
+            return outputs, dropped
+
+        futures = []
+        for member in members:
+            try:
+                futures.append((member, self._pool.submit(member, batch)))
+            except Exception as e:
+                # e.g. the pool was shut down by a model swap
+                self._count_error(member, e)
+                dropped[member.name] = "error"
+        deadline = time.perf_counter() + self.timeout_ms / 1000.0
+        # Required members first, so optional ones get whatever is left of
+        # the deadline while they wait
+        for member, future in sorted(futures, key=lambda item: not item[0].required):
+            remaining = None if member.required else max(0.0, deadline - time.perf_counter())
+            try:
+                outputs[member.name] = future.result(timeout=remaining)
+            except FutureTimeout:
+                with self._lock:
+                    member.timeouts += 1
+                print(f"Ensemble member {member.name} timed out after {self.timeout_ms} ms; dropped from vote.")
+                dropped[member.name] = "timeout"
+            except Exception as e:
+                self._count_error(member, e)
+                dropped[member.name] = "error"
+        return outputs, dropped
+
+    def _count_error(self, member, error):
+        with self._lock:
+            member.errors += 1
+        print(f"Ensemble member {member.name} failed: {error}")
+
+    def stats(self):
+        """Per-member latency (ms) histograms, timeouts and errors."""
+        return {
+            "timeout_ms": self.timeout_ms,
+            "members": {
+                member.name: {
+                    "latency_ms": member.latency_hist.snapshot(),
+                    "timeouts": member.timeouts,
+                    "errors": member.errors,
+                }
+                for member in self.members
+            },
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,346 @@
+import atexit
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .prediction_cache import content_hash
+from .preprocessing import decode_image, read_bytes, stage_timer
+
+# Wire format: 4-byte big-endian length prefix followed by a UTF-8 JSON body.
+# Image tensors never go over the socket; they are written into a shared
+# memory segment and only its name, shape and dtype are sent.
+_HEADER = struct.Struct('!I')
+
+
+def _send(sock, payload):
+    body = json.dumps(payload, default=float).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Inference socket closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode('utf-8'))
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attach with the resource tracker,
+        # which would unlink the client's segment when the server exits.
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        predictor = self.server.predictor
+        while True:
+            try:
+                message = _recv(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                response = self.server.dispatch(predictor, message)
+            except Exception as e:
+                print(f"Inference server error: {e}")
+                response = {"ok": False, "error": str(e)}
+            _send(self.request, response)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves an EnsembleDiseasePredictor to web workers over a Unix socket.
+
+    One process holds TensorFlow and the models; each connection is handled
+    on its own thread, so the predictor's micro-batcher can group requests
+    coming from different gunicorn workers.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, predictor):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.predictor = predictor
+        self.socket_path = socket_path
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o660)
+
+    def dispatch(self, predictor, message):
+        op = message.get("op")
+        crop_name = message.get("crop_name")
+
+        if op == "ping":
+            response = {"ok": True}
+            # Reported once loaded, so clients decode at the model's size
+            if predictor.is_ready():
+                response["input_size"] = list(predictor.input_size)
+            return response
+
+        if op == "lookup":
+            cached = predictor.cached_result(message.get("digest"), crop_name)
+            return {"ok": True, "result": cached}
+
+        if op in ("predict", "predict_batch"):
+            shm = _attach(message["shm"])
+            try:
+                # Copied out before inference: no view into the segment can
+                # outlive close(), and a client that gave up on this request
+                # cannot overwrite the pixels mid-prediction
+                img_array = np.array(np.ndarray(
+                    tuple(message["shape"]), dtype=np.dtype(message["dtype"]), buffer=shm.buf
+                ))
+            finally:
+                shm.close()
+            if op == "predict_batch":
+                return {"ok": True, "results": predictor.predict_batch(img_array, crop_name)}
+            result = predictor.predict_from_array(img_array, crop_name)
+            predictor.store_result(message.get("digest"), crop_name, result)
+            return {"ok": True, "result": result}
+
+        if op == "symptoms":
+            result = predictor.predict_from_symptoms(message.get("text", ""), crop_name)
+            return {"ok": True, "result": result}
+
+        if op == "stats":
+            return {
+                "ok": True,
+                "batching": predictor.batching_stats(),
+                "cache": predictor.cache_stats(),
+                "tta": predictor.tta_stats(),
+                "ensemble": predictor.ensemble_stats(),
+                "cascade": predictor.cascade_stats(),
+                "specialists": predictor.specialist_stats(),
+                "model": predictor.model_info(),
+            }
+
+        return {"ok": False, "error": f"Unknown op {op!r}"}
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class InferenceClient:
+    """
+    Thin predictor used by the web workers.
+
+    Images are decoded locally and handed to the inference server through
+    shared memory. If the server is unreachable, calls fall back to the
+    in-process `fallback` predictor and the server is retried after
+    `retry_after` seconds. A successful ping is trusted for `ready_ttl`
+    seconds.
+    """
+
+    def __init__(self, socket_path, fallback, timeout=30.0, retry_after=5.0, ready_ttl=2.0):
+        self.socket_path = socket_path
+        self.fallback = fallback
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.ready_ttl = ready_ttl
+        self._down_until = 0.0
+        self._ready_until = 0.0
+        self._input_size = None
+        self._local = threading.local()
+        self._segments = []
+        self._segments_lock = threading.Lock()
+        atexit.register(self._release_segments)
+
+    # Connection handling
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, payload):
+        """Send one request; returns None (and marks the server down) on failure."""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            sock = self._connection()
+            _send(sock, payload)
+            response = _recv(sock)
+        except (OSError, ConnectionError, ValueError) as e:
+            print(f"Inference server unavailable ({e}), using in-process predictor.")
+            self._reset_connection()
+            self._down_until = time.monotonic() + self.retry_after
+            self._ready_until = 0.0
+            return None
+        if not response.get("ok"):
+            print(f"Inference server error: {response.get('error')}")
+            return None
+        return response
+
+    def _reset_connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _segment(self, nbytes):
+        """Per-thread shared memory segment, reused across requests."""
+        shm = getattr(self._local, 'shm', None)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                self._unlink(shm)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            with self._segments_lock:
+                self._segments.append(shm)
+            self._local.shm = shm
+        return shm
+
+    def _discard_segment(self):
+        """Drop this thread's segment so the next request gets a fresh one."""
+        shm = getattr(self._local, 'shm', None)
+        self._local.shm = None
+        if shm is not None:
+            self._unlink(shm)
+
+    def _unlink(self, shm):
+        with self._segments_lock:
+            if shm in self._segments:
+                self._segments.remove(shm)
+        try:
+            shm.close()
+            shm.unlink()
+        except (OSError, BufferError):
+            pass
+
+    def _release_segments(self):
+        with self._segments_lock:
+            for shm in self._segments:
+                try:
+                    shm.close()
+                    shm.unlink()
+                except (OSError, BufferError):
+                    pass
+            self._segments = []
+
+    # Predictor interface used by crops.views
+
+    def _ping(self):
+        response = self._call({"op": "ping"})
+        if response is None:
+            return False
+        if response.get("input_size"):
+            self._input_size = tuple(response["input_size"])
+        self._ready_until = time.monotonic() + self.ready_ttl
+        return True
+
+    def is_ready(self):
+        if time.monotonic() < self._ready_until or self._ping():
+            return True
+        return self.fallback.is_ready()
+
+    def start(self):
+        if not self._ping():
+            self.fallback.start()
+
+    @property
+    def input_size(self):
+        """
+        Input size of the server's model from its last ping; the fallback's
+        while the server is down, and the usual 256x256 while it is loading.
+        """
+        if time.monotonic() < self._down_until or (self._input_size is None and not self._ping()):
+            return self.fallback.input_size
+        return self._input_size or (256, 256)
+
+    def _send_tensor(self, op, img_array, **fields):
+        if time.monotonic() < self._down_until:
+            return None
+        img_array = np.ascontiguousarray(img_array, dtype=np.float32)
+        shm = self._segment(img_array.nbytes)
+        np.ndarray(img_array.shape, dtype=img_array.dtype, buffer=shm.buf)[...] = img_array
+        response = self._call({
+            "op": op,
+            "shm": shm.name,
+            "shape": list(img_array.shape),
+            "dtype": img_array.dtype.str,
+            **fields,
+        })
+        if response is None:
+            # The server may still be reading a segment it timed out on;
+            # the next request must not write into it
+            self._discard_segment()
+        return response
+
+    def predict_from_array(self, img_array, crop_name=None, digest=None, timings=None):
+        with stage_timer(timings, 'inference'):
+            response = self._send_tensor("predict", img_array, crop_name=crop_name, digest=digest)
+        if response is None:
+            return self.fallback.predict_from_array(img_array, crop_name, timings=timings)
+        return response["result"]
+
+    def predict_batch(self, img_batch, crop_name=None):
+        response = self._send_tensor("predict_batch", img_batch, crop_name=crop_name)
+        if response is None:
+            return self.fallback.predict_batch(img_batch, crop_name)
+        return response["results"]
+
+    def predict_from_image(self, image, crop_name=None, timings=None):
+        timings = {} if timings is None else timings
+        try:
+            with stage_timer(timings, 'read'):
+                data = read_bytes(image)
+        except OSError as e:
+            print(f"Error reading image: {e}")
+            return {"error": "Invalid image"}
+
+        digest = content_hash(data)
+        response = self._call({"op": "lookup", "digest": digest, "crop_name": crop_name})
+        if response is None:
+            return self.fallback.predict_from_image(data, crop_name, timings=timings)
+
+        result = response.get("result")
+        if result is None:
+            try:
+                img_array = decode_image(data, self.input_size, timings=timings)
+            except Exception as e:
+                print(f"Error preprocessing image: {e}")
+                return {"error": "Invalid image"}
+            result = self.predict_from_array(img_array, crop_name, digest=digest, timings=timings)
+
+        result['timings_ms'] = {stage: round(ms, 2) for stage, ms in timings.items()}
+        return result
+
+    def predict_from_symptoms(self, text_description, crop_name=None):
+        response = self._call({"op": "symptoms", "text": text_description, "crop_name": crop_name})
+        if response is None:
+            return self.fallback.predict_from_symptoms(text_description, crop_name)
+        return response["result"]
+
+    def stats(self):
+        response = self._call({"op": "stats"})
+        return response if response is not None else None
@@ -0,0 +1,92 @@
+import threading
+
+from . import config
+from .metrics import Histogram, LATENCY_BUCKETS_MS
+
+# Instrumentation is opt-in. When disabled, requests carry `timings=None`
+# and every `stage_timer` block is a bare `yield`.
+ENABLED = config.METRICS_ENABLED
+
+STAGE_METRIC = 'agromind_stage_duration_ms'
+REQUEST_METRIC = 'agromind_request_duration_ms'
+
+_HELP = {
+    STAGE_METRIC: 'Time spent in one stage of a request (read, decode, resize, inference, db, render, ...)',
+    REQUEST_METRIC: 'Total time spent in a view, including all of its stages',
+}
+
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and label set, rendered as Prometheus text."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v)))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(self.buckets))
+        return hist
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+
+        lines = []
+        current = None
+        for (name, labels), hist in items:
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            snap = hist.snapshot()
+            for edge, count in snap['buckets']:
+                le = '+Inf' if edge == float('inf') else repr(float(edge))
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {snap['sum']}")
+            lines.append(f"{name}_count{_labels(labels)} {snap['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def record_request(view, timings, total_ms, model_version=None, inference_path=None):
+    """Observe every stage of one request plus its total duration."""
+    for stage, ms in timings.items():
+        registry.observe(
+            STAGE_METRIC, ms, view=view, stage=stage, model_version=model_version, inference_path=inference_path
+        )
+    registry.observe(REQUEST_METRIC, total_ms, view=view, model_version=model_version, inference_path=inference_path)
+
+
+def server_timing(timings, total_ms=None):
+    """`Server-Timing` header value, e.g. "read;dur=1.2, inference;dur=35.0"."""
+    parts = [f"{stage};dur={ms:.2f}" for stage, ms in timings.items()]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
@@ -0,0 +1,158 @@
+import json
+import os
+import re
+import threading
+import time
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name):
+    """
+    Canonical lookup key: lowercase alphanumeric words separated by single
+    spaces. "Corn_(maize)___Common_rust_" and "Corn (maize) - Common rust "
+    both become "corn maize common rust".
+    """
+    return _NON_ALNUM.sub(" ", (name or "").lower()).strip()
+
+
+def split_name(name):
+    """Split "Crop - Disease" into (crop, disease); crop is None if absent."""
+    name = name.replace("___", " - ")
+    if " - " in name:
+        crop, disease = name.split(" - ", 1)
+        return crop, disease
+    return None, name
+
+
+class _Index:
+    """Immutable set of lookup tables built from one version of the data file."""
+
+    def __init__(self, data):
+        self.entries = []
+        self.by_key = {}        # normalized full name or alias -> entry
+        self.by_crop = {}       # crop key -> {normalized disease part -> entry}
+        self.by_disease = {}    # normalized disease part -> first entry seen
+        self.crop_aliases = {normalize(k): normalize(v) for k, v in data.get("crop_aliases", {}).items()}
+
+        for raw in data.get("diseases", []):
+            entry = {
+                "name": raw["name"].strip(),
+                "crop": raw.get("crop"),
+                "description": raw.get("description", ""),
+                "treatment": raw.get("treatment", ""),
+                "precautions": list(raw.get("precautions", [])),
+            }
+            self.entries.append(entry)
+
+            _, disease_part = split_name(entry["name"])
+            names = [entry["name"]] + list(raw.get("aliases", []))
+            for name in names:
+                self.by_key.setdefault(normalize(name), entry)
+
+            disease_keys = {normalize(disease_part)} | {normalize(a) for a in raw.get("aliases", [])}
+            crop_key = normalize(entry["crop"]) if entry["crop"] else None
+            for key in disease_keys:
+                self.by_disease.setdefault(key, entry)
+                if crop_key:
+                    self.by_crop.setdefault(crop_key, {})[key] = entry
+
+    def crop_key(self, crop_name):
+        key = normalize(crop_name)
+        return self.crop_aliases.get(key, key)
+
+
+class DiseaseKnowledgeBase:
+    """
+    Disease descriptions, treatments and precautions loaded from a JSON file.
+
+    Lookups go through indexes built once per load (normalized names,
+    aliases and per-crop disease names), so they are O(1) dict hits. The file
+    is re-read when its mtime changes, checked at most every
+    `reload_interval` seconds, so agronomists can edit it without a deploy.
+    """
+
+    def __init__(self, path, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = _Index({})
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """(Re)build the indexes from disk; keeps the old ones on error."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    index = _Index(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading disease knowledge base: {e}")
+                return False
+            self._index = index  # atomic swap; readers keep the old index
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+        print(f"Disease knowledge base loaded ({len(index.entries)} entries).")
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def find(self, disease_name, crop_name=None):
+        """Return the matching entry, or None."""
+        self._maybe_reload()
+        index = self._index
+        key = normalize(disease_name)
+
+        crop_part, disease_part = split_name(disease_name)
+        if crop_part is not None:
+            # A full "Crop - Disease" name names its own crop; only a bare
+            # disease name is looked up under the request's crop
+            entry = index.by_key.get(key)
+            if entry is not None:
+                return entry
+            crop_name = crop_part
+
+        if crop_name:
+            crop_entries = index.by_crop.get(index.crop_key(crop_name))
+            if crop_entries:
+                entry = crop_entries.get(key) or crop_entries.get(normalize(disease_part))
+                if entry is not None:
+                    return entry
+
+        return index.by_key.get(key) or index.by_disease.get(key)
+
+    def get(self, disease_name, crop_name=None, default=None):
+        """Description/treatment/precautions dict for a disease, or `default`."""
+        entry = self.find(disease_name, crop_name)
+        if entry is None:
+            return default
+        return {
+            "description": entry["description"],
+            "treatment": entry["treatment"],
+            "precautions": list(entry["precautions"]),
+        }
+
+    def diseases_for_crop(self, crop_name):
+        """All distinct entries indexed under a crop."""
+        index = self._index
+        entries = index.by_crop.get(index.crop_key(crop_name), {}).values()
+        return list({id(e): e for e in entries}.values())
+
+    def crop_aliases(self):
+        """Normalized crop alias -> normalized canonical crop name."""
+        return dict(self._index.crop_aliases)
+
+    def __len__(self):
+        return len(self._index.entries)
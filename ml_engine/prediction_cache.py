@@ -0,0 +1,150 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """SHA-256 hex digest of raw image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_fingerprint(*paths):
+    """Cheap version string for model files, based on size and mtime."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of prediction results.
+
+    Entries are keyed by image hash + model version + crop name, kept in an
+    in-memory LRU with a TTL and optionally mirrored to a directory shared by
+    all workers. The model version is derived from the watched model files,
+    so replacing a model automatically invalidates every cached entry.
+    """
+
+    def __init__(self, watch_paths=(), max_entries=1024, ttl=86400, disk_dir=None):
+        self.watch_paths = tuple(watch_paths)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.model_version = file_fingerprint(*self.watch_paths)
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _check_version(self):
+        version = file_fingerprint(*self.watch_paths)
+        if version != self.model_version:
+            with self._lock:
+                self._entries.clear()
+            self.model_version = version
+            self.invalidations += 1
+            print(f"Model files changed, prediction cache invalidated (version {version}).")
+
+    def make_key(self, image_bytes, crop_name=None):
+        return self.key_for_digest(content_hash(image_bytes), crop_name)
+
+    def key_for_digest(self, digest, crop_name=None):
+        """Key for an image whose content hash was computed elsewhere (e.g. by a client)."""
+        self._check_version()
+        crop = (crop_name or "").strip().lower()
+        raw = f"{digest}:{self.model_version}:{crop}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.disk_dir:
+            value = self._disk_get(key, now)
+            if value is not None:
+                self._remember(key, value, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return copy.deepcopy(value)
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        now = time.time()
+        self._remember(key, copy.deepcopy(value), now)
+        if self.disk_dir:
+            self._disk_set(key, value)
+
+    def _remember(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_set(self, key, value):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so other workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Error writing prediction cache entry: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "model_version": self.model_version,
+        }
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Layout of a registry directory:
+#
+#   <root>/CURRENT                     name of the active version
+#   <root>/<version>/manifest.json     checksums and metadata
+#   <root>/<version>/<artifact files>  models and class map
+#
+# Versions are immutable once published; activating one only rewrites the
+# CURRENT pointer (atomically), so workers can poll it cheaply.
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+
+# Artifact roles understood by the disease predictor
+PRIMARY = 'primary'
+RECENT_DISEASES = 'recent_diseases'
+FIRST_STAGE = 'first_stage'
+CLASSES = 'classes'
+
+
+class RegistryError(Exception):
+    """A version is missing, malformed or fails checksum verification."""
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ModelVersion:
+    """One published version: its directory and manifest."""
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+
+    @property
+    def input_size(self):
+        return tuple(self.manifest.get('input_size') or (256, 256))
+
+    @property
+    def created_at(self):
+        return self.manifest.get('created_at', 0)
+
+    def artifact(self, role):
+        """Absolute path of an artifact, or None if the version lacks it."""
+        entry = self.manifest.get('artifacts', {}).get(role)
+        return os.path.join(self.path, entry['file']) if entry else None
+
+    def verify(self):
+        """List of problems (missing files, size or checksum mismatches); empty if intact."""
+        problems = []
+        for role, entry in self.manifest.get('artifacts', {}).items():
+            path = os.path.join(self.path, entry['file'])
+            if not os.path.exists(path):
+                problems.append(f"{role}: {entry['file']} is missing")
+            elif os.path.getsize(path) != entry['size']:
+                problems.append(f"{role}: size mismatch")
+            elif sha256_file(path) != entry['sha256']:
+                problems.append(f"{role}: checksum mismatch")
+        return problems
+
+    def summary(self):
+        return {
+            'version': self.version,
+            'created_at': self.created_at,
+            'input_size': list(self.input_size),
+            'artifacts': sorted(self.manifest.get('artifacts', {})),
+            'notes': self.manifest.get('notes', ''),
+        }
+
+
+class ModelRegistry:
+    """
+    Local store of versioned disease-model artifacts.
+
+    `register` copies the files into a new version directory with their
+    SHA-256 checksums, input size and class map; `activate` verifies a
+    version and points CURRENT at it. An empty registry means "no registry":
+    the predictor then loads the legacy files under ml_engine/models.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _version_dir(self, version):
+        if not version or os.sep in version or version.startswith('.') or version == CURRENT:
+            raise RegistryError(f"Invalid version name {version!r}")
+        return os.path.join(self.root, version)
+
+    def get(self, version):
+        path = self._version_dir(version)
+        try:
+            with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f"Unknown model version {version!r}")
+        except ValueError as e:
+            raise RegistryError(f"Corrupt manifest for {version!r}: {e}")
+        return ModelVersion(path, manifest)
+
+    def versions(self):
+        """All published versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            if os.path.exists(os.path.join(self.root, name, MANIFEST)):
+                try:
+                    found.append(self.get(name))
+                except RegistryError as e:
+                    print(f"Skipping model version {name}: {e}")
+        return sorted(found, key=lambda v: (v.created_at, v.version))
+
+    def current_version(self):
+        """Name of the active version, or None. Cheap enough to poll."""
+        try:
+            with open(os.path.join(self.root, CURRENT), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def current(self):
+        version = self.current_version()
+        return self.get(version) if version else None
+
+    def register(self, version, artifacts, input_size=(256, 256), notes='', activate=False):
+        """
+        Publish `artifacts` ({role: source path}) as `version`. Files are
+        staged in a temporary directory and renamed into place, so a
+        half-copied version is never visible.
+        """
+        final = self._version_dir(version)
+        if os.path.exists(final):
+            raise RegistryError(f"Model version {version!r} already exists")
+        roles_by_name = {}
+        for role, source in artifacts.items():
+            if not os.path.isfile(source):
+                raise RegistryError(f"{role}: {source} not found")
+            # Files keep their names (backends find converted variants next
+            # to them), so two artifacts may not share one
+            name = os.path.basename(source)
+            if name in roles_by_name:
+                raise RegistryError(f"{roles_by_name[name]} and {role} are both named {name}; rename one")
+            roles_by_name[name] = role
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+        try:
+            entries = {}
+            for role, source in artifacts.items():
+                name = os.path.basename(source)
+                target = os.path.join(staging, name)
+                shutil.copy2(source, target)
+                entries[role] = {
+                    'file': name,
+                    'sha256': sha256_file(target),
+                    'size': os.path.getsize(target),
+                }
+            manifest = {
+                'version': version,
+                'created_at': time.time(),
+                'input_size': list(input_size),
+                'notes': notes,
+                'artifacts': entries,
+            }
+            with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            # mkdtemp creates the directory private to this user
+            os.chmod(staging, 0o755)
+            os.rename(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return ModelVersion(final, manifest)
+
+    def activate(self, version):
+        """Verify `version` and make it current."""
+        model_version = self.get(version)
+        problems = model_version.verify()
+        if problems:
+            raise RegistryError(f"Model version {version!r} failed verification: {'; '.join(problems)}")
+        _write_atomic(os.path.join(self.root, CURRENT), version + "\n")
+        return model_version
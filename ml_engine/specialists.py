@@ -0,0 +1,243 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .metrics import Histogram, LATENCY_BUCKETS_MS, resident_bytes
+
+# Class maps of specialists live in classes.json under "<crop>_model", next
+# to "plant_village" and "recent_diseases"; the legacy weights are
+# ml_engine/models/<crop>_model.h5.
+CLASS_MAP_SUFFIX = '_model'
+
+# Model loads take seconds, not milliseconds
+LOAD_BUCKETS_MS = LATENCY_BUCKETS_MS + (10000, 30000, 60000)
+
+
+def specialist_crops(class_mappings):
+    """{crop: class names by index} for every specialist class map in classes.json."""
+    crops = {}
+    for key, mapping in class_mappings.items():
+        if not key.endswith(CLASS_MAP_SUFFIX) or not mapping:
+            continue
+        n_classes = max(int(k) for k in mapping) + 1
+        crops[key[:-len(CLASS_MAP_SUFFIX)]] = [mapping.get(str(i), "Unknown") for i in range(n_classes)]
+    return crops
+
+
+class SpecialistPool:
+    """
+    Per-crop specialist models, loaded on first use and kept in an LRU.
+
+    `paths` maps a crop to its model file. Each loaded model is charged the
+    resident memory the process gained while loading it (at least its file
+    size, which is also the charge where RSS can't be read). Loads of two
+    crops at once may each be charged some of the other's memory, which
+    errs towards evicting. When the total goes past `memory_budget_mb`, the
+    least recently used models are evicted; a model bigger than the whole
+    budget is still loaded, on its own. An evicted model is closed (graphs
+    and weights dropped) as soon as no request is predicting with it.
+
+    Loads of different crops run in parallel; concurrent first requests for
+    the same crop wait for a single load.
+    """
+
+    def __init__(self, paths, loader, memory_budget_mb=1024):
+        self.paths = dict(paths)
+        self.loader = loader                # path -> backend with .predict(batch)
+        self.budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self._models = OrderedDict()        # crop -> (backend, bytes), oldest first
+        self._resident_bytes = 0
+        self._charges = {}                  # crop -> bytes charged at its last load
+        self._users = {}                    # id(backend) -> predict calls running on it
+        self._retired = {}                  # id(backend) -> evicted backend still in use
+        self._lock = threading.Lock()
+        self._load_locks = {crop: threading.Lock() for crop in self.paths}
+        self._failed = {}                   # crop -> file mtime that failed to load
+        self.load_hist = Histogram(LOAD_BUCKETS_MS)
+        self.hits = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    def crops(self):
+        return sorted(self.paths)
+
+    def get(self, crop):
+        """Backend of `crop`'s specialist, loading it if needed; None if unavailable."""
+        return self._get(crop, lease=False)
+
+    def _get(self, crop, lease):
+        if crop not in self.paths:
+            return None
+        with self._lock:
+            backend = self._hit(crop, lease)
+        if backend is not None:
+            return backend
+
+        with self._load_locks[crop]:
+            with self._lock:
+                # Loaded by the request we waited for
+                backend = self._hit(crop, lease)
+            if backend is not None:
+                return backend
+            return self._load(crop, lease)
+
+    def _hit(self, crop, lease):
+        """Resident backend of `crop` or None; the caller holds the lock."""
+        entry = self._models.get(crop)
+        if entry is None:
+            return None
+        self._models.move_to_end(crop)
+        self.hits += 1
+        if lease:
+            self._acquire(entry[0])
+        return entry[0]
+
+    def _acquire(self, backend):
+        self._users[id(backend)] = self._users.get(id(backend), 0) + 1
+
+    def _release(self, backend):
+        with self._lock:
+            key = id(backend)
+            self._users[key] -= 1
+            if self._users[key]:
+                return
+            del self._users[key]
+            retired = self._retired.pop(key, None)
+        if retired is not None:
+            self._close_backends([retired])
+
+    def _load(self, crop, lease):
+        path = self.paths[crop]
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if self._failed.get(crop) == mtime:
+            return None  # don't retry a broken file on every request
+
+        size = os.path.getsize(path) if mtime is not None else 0
+        # A reload is expected to cost what this crop cost last time
+        self._make_room(self._charges.get(crop, size), crop)
+        rss_before = resident_bytes()
+        start = time.perf_counter()
+        try:
+            backend = self.loader(path)
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+            self._failed[crop] = mtime
+            print(f"Error loading {crop} specialist model: {e}")
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.load_hist.observe(elapsed_ms)
+        rss_after = resident_bytes()
+        charge = size
+        if rss_before is not None and rss_after is not None:
+            charge = max(size, rss_after - rss_before)
+
+        with self._lock:
+            self._models[crop] = (backend, charge)
+            self._resident_bytes += charge
+            self._charges[crop] = charge
+            self.loads += 1
+            if lease:
+                self._acquire(backend)
+        self._failed.pop(crop, None)
+        # The measured charge may be more than the room made for the estimate
+        self._make_room(0, crop)
+        print(
+            f"Loaded {crop} specialist model in {elapsed_ms:.0f} ms "
+            f"({charge / (1024 * 1024):.1f}MB, {self._resident_bytes / (1024 * 1024):.1f}MB resident)."
+        )
+        return backend
+
+    def _make_room(self, size, crop):
+        """Evict least recently used models (never `crop`) until `size` more bytes fit the budget."""
+        evicted, to_close = [], []
+        with self._lock:
+            while self._resident_bytes + size > self.budget_bytes:
+                oldest = next(iter(self._models), None)
+                if oldest is None or oldest == crop:
+                    break
+                backend, freed = self._models.pop(oldest)
+                self._resident_bytes -= freed
+                self.evictions += 1
+                evicted.append((oldest, freed))
+                # Requests predicting with it finish first; the last one closes it
+                if self._users.get(id(backend)):
+                    self._retired[id(backend)] = backend
+                else:
+                    to_close.append(backend)
+        if size > self.budget_bytes:
+            print(
+                f"{crop} specialist model ({size / (1024 * 1024):.1f}MB) exceeds the "
+                f"{self.budget_bytes / (1024 * 1024):.0f}MB specialist budget; loading it alone."
+            )
+        for name, freed in evicted:
+            print(f"Evicted {name} specialist model ({freed / (1024 * 1024):.1f}MB) to make room for {crop}.")
+        self._close_backends(to_close)
+
+    @staticmethod
+    def _close_backends(backends):
+        for backend in backends:
+            close = getattr(backend, 'close', None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing specialist model: {e}")
+        if backends:
+            gc.collect()
+
+    @contextmanager
+    def lease(self, crop):
+        """
+        Yield `crop`'s backend (None if unavailable), loading it if needed;
+        it is not closed before the block exits, even if evicted.
+        """
+        backend = self._get(crop, lease=True)
+        try:
+            yield backend
+        finally:
+            if backend is not None:
+                self._release(backend)
+
+    def predict(self, crop, batch):
+        with self.lease(crop) as backend:
+            if backend is None:
+                raise RuntimeError(f"{crop} specialist model is unavailable")
+            return backend.predict(batch)
+
+    def stats(self):
+        with self._lock:
+            resident = list(self._models)
+            resident_bytes = self._resident_bytes
+        return {
+            "available": self.crops(),
+            "resident": resident,
+            "resident_mb": round(resident_bytes / (1024 * 1024), 1),
+            "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+            "hits": self.hits,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "load_ms": self.load_hist.snapshot(),
+        }
+
+    def close(self):
+        """Close every resident model; those still predicting close when they finish."""
+        with self._lock:
+            to_close = []
+            for backend, _ in self._models.values():
+                if self._users.get(id(backend)):
+                    self._retired[id(backend)] = backend
+                else:
+                    to_close.append(backend)
+            self._models.clear()
+            self._resident_bytes = 0
+        self._close_backends(to_close)
@@ -0,0 +1,137 @@
+import json
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed set of patterns.
+
+    Built once; `iter_matches` then finds every occurrence of every pattern
+    in a single left-to-right pass over the text, independent of how many
+    patterns there are.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for pattern, payload in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(pattern), payload))
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """Yield (start, end, payload) for every pattern occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i - length + 1, i + 1, payload
+
+    def __len__(self):
+        return len(self._goto)
+
+
+def _normalize_text(text):
+    return " ".join((text or "").casefold().split())
+
+
+# Endings a phrase may take and still be the same word ("spots", "rotten",
+# "curly"); any other letters after a match mean it is part of another word
+_SUFFIXES = frozenset({"s", "es", "d", "ed", "ing", "en", "ened", "y", "ish", "ness"})
+
+
+def _ends_word(text, end):
+    """True if a match ending at `end` ends a word, allowing common inflections."""
+    word_end = end
+    while word_end < len(text) and text[word_end].isalnum():
+        word_end += 1
+    tail = text[end:word_end]
+    if not tail:
+        return True
+    # Doubled final consonant: "rot" -> "rotting", "spot" -> "spotted"
+    if len(tail) > 1 and tail[0] == text[end - 1]:
+        tail = tail[1:]
+    return tail in _SUFFIXES
+
+
+class SymptomMatcher:
+    """
+    Weighted symptom-phrase scorer.
+
+    Phrases (in any language) are compiled into one Aho-Corasick automaton.
+    A description is scanned once; every phrase occurrence that is a whole
+    word (give or take an inflection) adds its weight to its disease, phrases
+    restricted to other crops are ignored, and diseases are ranked by total
+    score. Phrases marked `"stem": true` only need to start a word, for
+    verb stems such as "murjha" that take arbitrary endings.
+    """
+
+    def __init__(self, phrases):
+        patterns = []
+        for entry in phrases:
+            phrase = _normalize_text(entry["phrase"])
+            if not phrase:
+                continue
+            payload = (
+                entry["disease"],
+                float(entry.get("weight", len(phrase.split()))),
+                frozenset(c.casefold() for c in entry.get("crops", [])),
+                bool(entry.get("stem")),
+            )
+            patterns.append((phrase, payload))
+        self.phrase_count = len(patterns)
+        self.automaton = AhoCorasick(patterns)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get("phrases", []))
+
+    def score(self, text, crop_name=None, top_k=3):
+        """Return up to `top_k` (disease, score) pairs, best first."""
+        text = _normalize_text(text)
+        crop = (crop_name or "").strip().casefold()
+        scores = {}
+
+        for start, end, (disease, weight, crops, stem) in self.automaton.iter_matches(text):
+            # Phrases must be whole words: "rot" matches "rotting" but not
+            # "carrot", "white" does not match "whitefly"
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if not stem and not _ends_word(text, end):
+                continue
+            if crops and crop and crop not in crops:
+                continue
+            scores[disease] = scores.get(disease, 0.0) + weight
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def score_batch(self, texts, crop_name=None, top_k=3):
+        """Score many descriptions with the same compiled automaton."""
+        return [self.score(text, crop_name, top_k) for text in texts]
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import numpy as np
+
+from .metrics import Histogram, LATENCY_BUCKETS_MS
+
+# Views in priority order; when the latency budget only allows some of them,
+# the first ones are kept. The identity view is the first-pass prediction.
+VIEWS = ('hflip', 'vflip', 'rot90', 'rot270', 'center_crop')
+
+# Fraction of each side kept by the center crop before resizing back
+CENTER_CROP = 0.875
+
+
+def _center_crop_indices(size, fraction=CENTER_CROP):
+    """Nearest-neighbour source indices that zoom the central `fraction` back to `size`."""
+    keep = max(1, int(round(size * fraction)))
+    offset = (size - keep) // 2
+    return offset + (np.arange(size) * keep // size)
+
+
+def augment(batch, views=VIEWS):
+    """
+    Build every view of every image in a (N, H, W, 3) batch as one
+    (N * len(views), H, W, 3) array, image-major (all views of image 0 first).
+    """
+    batch = np.asarray(batch, dtype=np.float32)
+    n, h, w = batch.shape[:3]
+    out = np.empty((n, len(views)) + batch.shape[1:], dtype=np.float32)
+
+    for v, view in enumerate(views):
+        if view == 'hflip':
+            out[:, v] = batch[:, :, ::-1]
+        elif view == 'vflip':
+            out[:, v] = batch[:, ::-1]
+        elif view in ('rot90', 'rot270') and h == w:
+            out[:, v] = np.rot90(batch, k=1 if view == 'rot90' else 3, axes=(1, 2))
+        elif view == 'center_crop':
+            rows, cols = _center_crop_indices(h), _center_crop_indices(w)
+            out[:, v] = batch[:, rows][:, :, cols]
+        else:
+            # Rotations of non-square inputs would change the shape
+            out[:, v] = batch
+
+    return out.reshape((n * len(views),) + batch.shape[1:])
+
+
+def merge(first_pass, view_probs, n_views):
+    """
+    Combine the first-pass softmax rows (N, C) with the augmented rows
+    (N * n_views, C). Averaging log-probabilities is averaging the logits up
+    to a per-view constant, so the result is re-normalised with a softmax.
+    """
+    first_pass = np.asarray(first_pass, dtype=np.float32).reshape(-1, 1, view_probs.shape[-1])
+    views = np.asarray(view_probs, dtype=np.float32).reshape(first_pass.shape[0], n_views, -1)
+    logits = np.log(np.clip(np.concatenate([first_pass, views], axis=1), 1e-7, 1.0)).mean(axis=1)
+    logits -= logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+class TestTimeAugmenter:
+    """
+    Second, augmented forward pass for low-confidence predictions.
+
+    When the first-pass confidence is below `threshold`, flipped, rotated and
+    cropped copies of the image are run through `infer_fn` as a single batch
+    and their logits averaged with the first pass. The number of views is
+    trimmed so the added latency stays within `budget_ms`, based on the
+    measured cost per view (0 disables the budget); while the budget allows
+    no views, that estimate decays until one view is tried again.
+    """
+
+    def __init__(self, infer_fn, threshold=0.5, budget_ms=200.0, views=VIEWS):
+        self.infer_fn = infer_fn
+        self.threshold = threshold
+        self.budget_ms = budget_ms
+        self.views = tuple(views)
+
+        self.checked = 0
+        self.triggered = 0
+        self.skipped_budget = 0
+        self.changed = 0
+        self.added_latency_hist = Histogram(LATENCY_BUCKETS_MS)
+        self._ms_per_view = None
+        self._lock = threading.Lock()
+
+    def wants(self, confidence):
+        """Count a first-pass prediction and say whether it needs TTA."""
+        with self._lock:
+            self.checked += 1
+        return confidence < self.threshold
+
+    def _view_count(self, n_images):
+        if not self.budget_ms or self._ms_per_view is None:
+            return len(self.views)
+        affordable = int(self.budget_ms // (self._ms_per_view * n_images))
+        return min(len(self.views), affordable)
+
+    def run(self, batch, first_pass):
+        """
+        Return refined softmax rows for a (N, H, W, 3) batch and its first-pass
+        rows, or None when the budget does not allow a single view.
+        """
+        n_views = self._view_count(len(batch))
+        if n_views < 1:
+            with self._lock:
+                self.skipped_budget += len(batch)
+                # The estimate is only measured when TTA runs; decaying it
+                # while skipped makes a view affordable again soon, so one
+                # slow run cannot switch TTA off for good
+                self._ms_per_view *= 0.8
+            return None
+
+        start = time.perf_counter()
+        view_probs = self.infer_fn(augment(batch, self.views[:n_views]))
+        refined = merge(first_pass, np.asarray(view_probs), n_views)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        changed = int(np.sum(np.argmax(refined, axis=1) != np.argmax(first_pass, axis=1)))
+        per_view = elapsed_ms / (n_views * len(batch))
+        with self._lock:
+            self.triggered += len(batch)
+            self.changed += changed
+            # Smoothed cost per view-image, used to fit the next run in the budget
+            if self._ms_per_view is None:
+                self._ms_per_view = per_view
+            else:
+                self._ms_per_view = 0.8 * self._ms_per_view + 0.2 * per_view
+        self.added_latency_hist.observe(elapsed_ms)
+        return refined
+
+    def stats(self):
+        """Trigger counters and the added-latency (ms) histogram."""
+        return {
+            "threshold": self.threshold,
+            "budget_ms": self.budget_ms,
+            "checked": self.checked,
+            "triggered": self.triggered,
+            "trigger_rate": (self.triggered / self.checked) if self.checked else 0.0,
+            "skipped_budget": self.skipped_budget,
+            "changed_prediction": self.changed,
+            "ms_per_view": self._ms_per_view,
+            "added_latency_ms": self.added_latency_hist.snapshot(),
+        }
@@ -1,22 +1,10 @@
 import os
 import zipfile
 
-MAX_ZIP_SIZE = 90 * 1024 * 1024 # 90MB limit per zip file
+from ml_engine import config
+from ml_engine.artifact_store import CHUNK_SIZE, ArtifactStore
 
-def split_file(file_path, chunk_size=50 * 1024 * 1024): # 50MB chunks
-    parts = []
-    with open(file_path, 'rb') as f:
-        part_num = 0
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            part_name = f"{file_path}.part{part_num}"
-            with open(part_name, 'wb') as part_file:
-                part_file.write(chunk)
-            parts.append(part_name)
-            part_num += 1
-    return parts
+MAX_ZIP_SIZE = 90 * 1024 * 1024 # 90MB limit per zip file
 
 def get_current_zip(zip_num):
     return f"deploy_part_{zip_num}.zip"
@@ -27,15 +15,16 @@ def prepare_deployment():
     excludes = {
         '__pycache__', '.git', '.gitignore', '.env', 'venv', 'env', 
         '.idea', '.vscode', 'db.sqlite3', 'staticfiles', 
-        'zip_project.py', 'prepare_deployment.py', 'reassemble.py', '.gemini'
+        'zip_project.py', 'prepare_deployment.py', '.gemini'
     }
+    store_dir = os.path.abspath(config.MODEL_ARTIFACT_STORE)
 
-    temp_files = []
+    large_files = []
     files_to_zip = []
 
-    # 1. Collect all files and split large ones
+    # 1. Collect all files; large ones travel as artifact-store chunks
     for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if d not in excludes]
+        dirs[:] = [d for d in dirs if d not in excludes and os.path.join(root, d) != store_dir]
         
         for file in files:
             if file in excludes or file.endswith('.pyc') or file.startswith('deploy_part_'):
@@ -44,19 +33,21 @@ def prepare_deployment():
             file_path = os.path.join(root, file)
             file_size = os.path.getsize(file_path)
             
-            if file_size > 50 * 1024 * 1024:
-                print(f"Splitting large file: {file}")
-                parts = split_file(file_path)
-                temp_files.extend(parts)
-                for part in parts:
-                    arcname = os.path.relpath(part, project_root)
-                    files_to_zip.append((part, arcname, os.path.getsize(part)))
+            if file_size > CHUNK_SIZE:
+                large_files.append(file_path)
             else:
                 arcname = os.path.relpath(file_path, project_root)
                 files_to_zip.append((file_path, arcname, file_size))
-    
-    # Add reassemble.py manually to the first zip
-    files_to_zip.insert(0, ('reassemble.py', 'reassemble.py', os.path.getsize('reassemble.py')))
+
+    if large_files:
+        store = ArtifactStore(store_dir, project_root)
+        for relpath, outcome in store.pack(large_files).items():
+            print(f"Large file {relpath}: {outcome}")
+    for root, dirs, files in os.walk(store_dir):
+        for file in files:
+            file_path = os.path.join(root, file)
+            arcname = os.path.relpath(file_path, project_root)
+            files_to_zip.append((file_path, arcname, os.path.getsize(file_path)))
 
     # 2. Create multiple zip files
     zip_num = 1
@@ -82,12 +73,7 @@ def prepare_deployment():
 
     zipf.close()
 
-    # Clean up temp files
-    print("Cleaning up temporary split files...")
-    for f in temp_files:
-        if os.path.exists(f):
-            os.remove(f)
-
 if __name__ == "__main__":
     prepare_deployment()
-    print("Deployment files created! Upload ALL deploy_part_*.zip files to PythonAnywhere.")
+    print("Deployment files created! Upload ALL deploy_part_*.zip files to PythonAnywhere,")
+    print("then run `python manage.py model_artifacts restore` to rebuild the large models.")